@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Ограниченный LRU-кэш в памяти процесса с временем жизни записей"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Возвращает свежее значение или None"""
+        value, expired = self.get_entry(key)
+        return None if expired else value
+
+    def get_entry(self, key):
+        """Возвращает (значение, истек ли TTL); просроченные записи не удаляются"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, True
+
+        self._data.move_to_end(key)
+        value, expires_at = entry
+        expired = expires_at <= time.monotonic()
+        if expired:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value, expired
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def touch(self, key):
+        """Продлевает TTL записи, если она есть"""
+        entry = self._data.get(key)
+        if entry is not None:
+            self.set(key, entry[0])
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
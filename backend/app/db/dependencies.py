@@ -1,5 +1,7 @@
-from fastapi import Depends, HTTPException, Query
-from .supabase_client import supabase_client
+import hashlib
+from datetime import date
+from fastapi import Depends, HTTPException, Query, Request, Response
+from .supabase_client import supabase_client, DataUnavailableError
 
 def get_supabase_client():
     """Dependency для получения клиента Supabase"""
@@ -14,8 +16,53 @@ async def get_current_user_data(
         raise HTTPException(status_code=400, detail="UID is required")
     
     # Проверяем, что пользователь существует в Authentication
-    user = db.get_user_by_uid(uid)
+    user = await db.get_user_by_uid(uid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found in Authentication")
     
-    return {"uid": uid, "user": user}
\ No newline at end of file
+    return {"uid": uid, "user": user}
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, поддержка списка и *)"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+async def check_user_data_etag(
+    request: Request,
+    response: Response,
+    uid: str = Query(..., description="UID пользователя"),
+    db = Depends(get_supabase_client)
+):
+    """Dependency для условного GET по версии строки user_data.
+
+    ETag строится из пути, параметров запроса, версии строки и текущей даты
+    (ответы расписания зависят от "сегодня"). Если клиент прислал совпадающий
+    If-None-Match, отвечаем 304 без загрузки JSON-колонок и сборки тела.
+    Пока БД недоступна, версию не проверить - ответ строится из устаревших данных без ETag.
+    """
+    try:
+        version = await db.get_user_version(uid)
+    except DataUnavailableError:
+        return
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error checking user data version: {str(e)}")
+    if version is None:
+        return
+
+    fingerprint = "|".join((
+        request.url.path,
+        str(sorted(request.query_params.multi_items())),
+        repr(version),
+        date.today().isoformat()
+    ))
+    etag = 'W/"' + hashlib.sha1(fingerprint.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
+
+    response.headers.update(headers)
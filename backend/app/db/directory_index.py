@@ -0,0 +1,407 @@
+import hashlib
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from .schedule_index import ScheduleIndex, DAY_NAMES
+from .search_index import normalize
+
+_NAME_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+
+# Занятие в недельной сетке: без конкретной даты, с днем недели и четностью недели.
+# Одинаковые занятия из расписаний студентов одной группы совпадают и считаются один раз.
+WeeklyClass = namedtuple("WeeklyClass", (
+    "weekday", "parity", "pair_number", "time_range", "type", "subject",
+    "teacher", "teacher_info", "group", "building", "location"
+))
+
+
+def week_parity(day) -> str:
+    """Четность недели даты: "even" или "odd" по номеру недели ISO"""
+    return "even" if day.isocalendar()[1] % 2 == 0 else "odd"
+
+
+def weekly_classes(week_schedule) -> frozenset:
+    """Занятия week_schedule в виде недельной сетки"""
+    classes = set()
+    for day_date, entry in ScheduleIndex.compile(week_schedule).days.items():
+        weekday = day_date.isoweekday()
+        parity = week_parity(day_date)
+        for record in entry.classes:
+            classes.add(WeeklyClass(
+                weekday, parity, str(record.pairNumber or ''), record.timeRange or '', record.type or '',
+                record.subject or '', (record.teacher or '').strip(), record.teacherInfo or '',
+                record.group or '', record.building or '', str(record.location or '')
+            ))
+    return frozenset(classes)
+
+
+def _class_sort_key(item: WeeklyClass):
+    pair = int(item.pair_number) if item.pair_number.isdigit() else 99
+    return (item.weekday, item.parity, pair, item.time_range, item.subject, item.group)
+
+
+def weekly_timetable(classes) -> list:
+    """Недельная сетка: занятия в одном слоте у разных групп (поток) объединяются"""
+    slots = {}
+    for item in classes:
+        key = item._replace(group='')
+        slots.setdefault(key, set()).add(item.group)
+    return [
+        {
+            "weekday": key.weekday,
+            "day_name": DAY_NAMES[key.weekday - 1],
+            "week_parity": key.parity,
+            "pairNumber": key.pair_number,
+            "timeRange": key.time_range,
+            "type": key.type,
+            "subject": key.subject,
+            "teacher": key.teacher,
+            "groups": sorted(group for group in groups if group),
+            "building": key.building,
+            "location": key.location,
+        }
+        for key, groups in sorted(slots.items(), key=lambda slot: _class_sort_key(slot[0]))
+    ]
+
+
+# Время пар ГУАП: используется, если у занятия нет timeRange
+PAIR_TIMES = {
+    "1": "9:30-11:00", "2": "11:10-12:40", "3": "13:00-14:30",
+    "4": "15:00-16:30", "5": "16:40-18:10", "6": "18:30-20:00",
+}
+_TIME_RANGE_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})")
+
+
+def class_interval(item: WeeklyClass):
+    """(начало, конец) занятия в минутах от полуночи или None"""
+    match = _TIME_RANGE_RE.search(item.time_range or PAIR_TIMES.get(item.pair_number, ""))
+    if not match:
+        return None
+    start_h, start_m, end_h, end_m = map(int, match.groups())
+    start, end = start_h * 60 + start_m, end_h * 60 + end_m
+    return (start, end) if start < end else None
+
+
+def teacher_id(name: str) -> str:
+    """Стабильный идентификатор преподавателя по нормализованному ФИО"""
+    return hashlib.sha1(" ".join(_NAME_TOKEN_RE.findall(normalize(name))).encode()).hexdigest()[:12]
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна с отсечением: больше limit - возвращается limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _fuzzy_limit(token: str) -> int:
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+
+class TeacherEntry:
+    """Преподаватель в справочнике: занятия с числом расписаний, где они встречаются"""
+
+    __slots__ = ("id", "name", "tokens", "classes", "_summary")
+
+    def __init__(self, name: str):
+        self.id = teacher_id(name)
+        self.name = name
+        self.tokens = tuple(dict.fromkeys(_NAME_TOKEN_RE.findall(normalize(name))))
+        self.classes = Counter()
+        self._summary = None
+
+    def summary(self) -> dict:
+        if self._summary is None:
+            infos = Counter(item.teacher_info for item in self.classes if item.teacher_info)
+            self._summary = {
+                "id": self.id,
+                "name": self.name,
+                "info": infos.most_common(1)[0][0] if infos else None,
+                "subjects": sorted({item.subject for item in self.classes if item.subject}),
+                "groups": sorted({item.group for item in self.classes if item.group}),
+                "classes_per_week": len({item._replace(group='') for item in self.classes}),
+            }
+        return self._summary
+
+    def details(self) -> dict:
+        return {**self.summary(), "timetable": weekly_timetable(self.classes)}
+
+
+class TeacherIndex:
+    """Справочник преподавателей с префиксным и нечетким поиском по ФИО.
+
+    Обновляется по одному занятию (add/remove), поэтому изменение расписания
+    одного пользователя не требует пересборки. Слова ФИО хранятся в
+    отсортированном списке (слово, id): префиксный поиск - bisect, нечеткий -
+    проход по различным словам с отсечением по длине и расстоянию.
+    """
+
+    def __init__(self):
+        self.teachers = {}
+        self._tokens = []  # [(слово ФИО, teacher_id)] по возрастанию
+
+    def __len__(self):
+        return len(self.teachers)
+
+    def add(self, item: WeeklyClass):
+        if not item.teacher:
+            return
+        key = teacher_id(item.teacher)
+        entry = self.teachers.get(key)
+        if entry is None:
+            entry = self.teachers[key] = TeacherEntry(item.teacher)
+            for token in entry.tokens:
+                insort(self._tokens, (token, key))
+        entry.classes[item] += 1
+        entry._summary = None
+
+    def remove(self, item: WeeklyClass):
+        if not item.teacher:
+            return
+        key = teacher_id(item.teacher)
+        entry = self.teachers.get(key)
+        if entry is None or not entry.classes[item]:
+            return
+        entry.classes[item] -= 1
+        if not entry.classes[item]:
+            del entry.classes[item]
+        entry._summary = None
+        if not entry.classes:
+            del self.teachers[key]
+            for token in entry.tokens:
+                position = bisect_left(self._tokens, (token, key))
+                if position < len(self._tokens) and self._tokens[position] == (token, key):
+                    del self._tokens[position]
+
+    def get(self, key: str):
+        return self.teachers.get(key)
+
+    def _prefix(self, token: str) -> set:
+        matched = set()
+        for position in range(bisect_left(self._tokens, (token, "")), len(self._tokens)):
+            term, key = self._tokens[position]
+            if not term.startswith(token):
+                break
+            matched.add(key)
+        return matched
+
+    def _fuzzy(self, token: str) -> dict:
+        """{teacher_id: расстояние} для слов ФИО, префикс которых близок к токену"""
+        limit = _fuzzy_limit(token)
+        if not limit:
+            return {}
+        matched = {}
+        previous = None
+        for term, key in self._tokens:
+            if term != previous:
+                distance = _edit_distance(token, term[:len(token)], limit) if len(term) >= len(token) - limit else limit + 1
+                previous = term
+            if distance <= limit and distance < matched.get(key, limit + 1):
+                matched[key] = distance
+        return matched
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Каждое слово запроса - префикс слова ФИО; при опечатках - ближайшие по расстоянию"""
+        tokens = list(dict.fromkeys(_NAME_TOKEN_RE.findall(normalize(query))))
+        if not tokens:
+            return []
+
+        exact = None
+        fuzzy = None
+        for token in tokens:
+            prefix = self._prefix(token)
+            exact = prefix if exact is None else exact & prefix
+            matched = self._fuzzy(token)
+            for key in prefix:
+                matched[key] = 0
+            fuzzy = matched if fuzzy is None else {
+                key: distance + matched[key] for key, distance in fuzzy.items() if key in matched
+            }
+
+        ranked = sorted(exact, key=lambda key: self.teachers[key].name)
+        if len(ranked) < limit:
+            ranked += sorted(
+                (key for key in fuzzy if key not in exact),
+                key=lambda key: (fuzzy[key], self.teachers[key].name)
+            )
+        return [self.teachers[key].summary() for key in ranked[:limit]]
+
+    def all(self, offset: int = 0, limit: int = None) -> list:
+        entries = sorted(self.teachers.values(), key=lambda entry: entry.name)
+        end = None if limit is None else offset + limit
+        return [entry.summary() for entry in entries[offset:end]]
+
+
+def room_id(building: str, location: str) -> str:
+    return hashlib.sha1(f"{normalize(building).strip()}|{normalize(location).strip()}".encode()).hexdigest()[:12]
+
+
+class RoomEntry:
+    __slots__ = ("id", "building", "location", "classes")
+
+    def __init__(self, building: str, location: str):
+        self.id = room_id(building, location)
+        self.building = building
+        self.location = location
+        self.classes = Counter()
+
+    def summary(self) -> dict:
+        return {"id": self.id, "building": self.building, "location": self.location}
+
+    def details(self) -> dict:
+        return {
+            **self.summary(),
+            "classes_per_week": len({item._replace(group='') for item in self.classes}),
+            "timetable": weekly_timetable(self.classes),
+        }
+
+
+class Timeline:
+    """Занятость аудиторий за один день недели одной четности.
+
+    Точки - отсортированные границы интервалов; occupied[i] - аудитории,
+    занятые на отрезке [points[i], points[i + 1]). Ответ на "что свободно
+    в момент t" - один bisect и разность множеств.
+    """
+
+    __slots__ = ("points", "occupied")
+
+    def __init__(self, intervals: Counter):
+        boundaries = sorted({point for (_, start, end) in intervals for point in (start, end)})
+        self.points = boundaries
+        self.occupied = [set() for _ in boundaries]
+        for (key, start, end) in intervals:
+            for position in range(bisect_left(boundaries, start), bisect_left(boundaries, end)):
+                self.occupied[position].add(key)
+
+    def occupied_between(self, start: int, end: int) -> set:
+        """Аудитории, занятые хотя бы часть интервала [start, end)"""
+        result = set()
+        first = max(bisect_right(self.points, start) - 1, 0)
+        for position in range(first, bisect_left(self.points, end)):
+            if self.points[position] < end and (position + 1 >= len(self.points) or self.points[position + 1] > start):
+                result |= self.occupied[position]
+        return result
+
+
+class RoomIndex:
+    """Аудитории и их занятость по дням недели и четности недели.
+
+    Интервалы занятий хранятся со счетчиком по (четность, день недели);
+    Timeline для дня пересобирается лениво, только если в этот день
+    добавилось или пропало занятие. Число занятий по четности показывает,
+    есть ли вообще расписания на неделю этой четности: в week_schedule
+    обычно только текущая неделя.
+    """
+
+    def __init__(self):
+        self.rooms = {}
+        self._intervals = {}  # (четность, день недели) -> Counter((room_id, начало, конец))
+        self._timelines = {}
+        self._parities = Counter()  # четность -> число занятий
+
+    def __len__(self):
+        return len(self.rooms)
+
+    @staticmethod
+    def _key(item: WeeklyClass):
+        if not item.location:
+            return None
+        return room_id(item.building, item.location)
+
+    def _change_interval(self, key: str, item: WeeklyClass, delta: int):
+        interval = class_interval(item)
+        if interval is None:
+            return
+        day = (item.parity, item.weekday)
+        intervals = self._intervals.setdefault(day, Counter())
+        intervals[(key, *interval)] += delta
+        if intervals[(key, *interval)] <= 0:
+            del intervals[(key, *interval)]
+            self._timelines.pop(day, None)
+        elif delta > 0 and intervals[(key, *interval)] == 1:
+            self._timelines.pop(day, None)
+
+    def add(self, item: WeeklyClass):
+        self._parities[item.parity] += 1
+        key = self._key(item)
+        if key is None:
+            return
+        entry = self.rooms.get(key)
+        if entry is None:
+            entry = self.rooms[key] = RoomEntry(item.building, item.location)
+        entry.classes[item] += 1
+        self._change_interval(key, item, 1)
+
+    def remove(self, item: WeeklyClass):
+        if self._parities[item.parity] > 0:
+            self._parities[item.parity] -= 1
+        if not self._parities[item.parity]:
+            del self._parities[item.parity]
+        key = self._key(item)
+        entry = self.rooms.get(key) if key else None
+        if entry is None or not entry.classes[item]:
+            return
+        entry.classes[item] -= 1
+        if not entry.classes[item]:
+            del entry.classes[item]
+        self._change_interval(key, item, -1)
+        if not entry.classes:
+            del self.rooms[key]
+
+    def get(self, key: str):
+        return self.rooms.get(key)
+
+    def _timeline(self, parity: str, weekday: int) -> Timeline:
+        day = (parity, weekday)
+        timeline = self._timelines.get(day)
+        if timeline is None:
+            timeline = self._timelines[day] = Timeline(self._intervals.get(day, ()))
+        return timeline
+
+    def free(self, at: datetime, duration: int = 1, building: str = None) -> dict:
+        """Аудитории, свободные в интервале [at, at + duration минут).
+
+        Если расписаний на неделю этой четности нет, занятость берется из недели
+        другой четности (estimated); без расписаний вообще ответ неизвестен
+        (known = False) и список пуст, а не "свободно все".
+        """
+        parity = week_parity(at)
+        basis = parity if self._parities[parity] else next(
+            (other for other in ("odd", "even") if self._parities[other]), None
+        )
+        result = {"week_parity": parity, "schedule_parity": basis, "known": basis is not None, "estimated": False}
+        if basis is None:
+            return {**result, "rooms": []}
+
+        start = at.hour * 60 + at.minute
+        occupied = self._timeline(basis, at.isoweekday()).occupied_between(start, start + max(duration, 1))
+        building = normalize(building).strip() if building else None
+        rooms = [
+            entry for key, entry in self.rooms.items()
+            if key not in occupied and (building is None or normalize(entry.building).strip() == building)
+        ]
+        rooms.sort(key=lambda entry: (entry.building, entry.location))
+        return {**result, "estimated": basis != parity, "rooms": [entry.summary() for entry in rooms]}
+
+    def all(self, search: str = None) -> list:
+        query = normalize(search).strip() if search else None
+        rooms = [
+            entry for entry in self.rooms.values()
+            if query is None or normalize(entry.location).startswith(query)
+            or query in normalize(f"{entry.building} {entry.location}")
+        ]
+        rooms.sort(key=lambda entry: (entry.building, entry.location))
+        return [entry.summary() for entry in rooms]
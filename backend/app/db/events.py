@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict, deque, namedtuple
+
+from utils.metrics import PUSH_EVENTS
+from .models import normalize_stamp
+
+logger = logging.getLogger(__name__)
+
+# Изменение раздела данных пользователя (tasks, marks, schedule, ...)
+SectionChange = namedtuple("SectionChange", ["uid", "section", "hash", "changed_at"])
+
+
+class EventBus:
+    """Шина событий внутри процесса.
+
+    Подписчики - обычные функции или корутины; исключения подписчиков
+    логируются и не мешают записи данных и другим подписчикам.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._pending = set()
+
+    def subscribe(self, callback, sections=None):
+        """sections - разделы, на которые подписываемся; None - все"""
+        self._subscribers.append((callback, frozenset(sections) if sections else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [item for item in self._subscribers if item[0] is not callback]
+
+    def publish(self, event: SectionChange):
+        for callback, sections in self._subscribers:
+            if sections is not None and event.section not in sections:
+                continue
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self._pending.add(task)
+                    task.add_done_callback(self._done)
+            except Exception as e:
+                logger.error("Event subscriber error: %s", e, extra={"uid": event.uid, "section": event.section})
+
+    def _done(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Event subscriber error: %s", task.exception())
+
+
+# События изменения разделов user_data
+user_data_events = EventBus()
+
+
+class Subscription:
+    """Очередь событий одного подписчика; при переполнении старые события вытесняются"""
+
+    __slots__ = ("uid", "sections", "queue", "overflowed")
+
+    def __init__(self, uid: str, sections, maxsize: int):
+        self.uid = uid
+        self.sections = frozenset(sections) if sections else None
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.queue.full():
+            # Медленный клиент не держит память и не тормозит остальных: он получит
+            # только свежие события и флаг, что часть пропущена и данные стоит перечитать
+            self.queue.get_nowait()
+            self.overflowed = True
+            PUSH_EVENTS.labels("dropped").inc()
+        self.queue.put_nowait(event)
+        PUSH_EVENTS.labels("delivered").inc()
+
+
+class UserEventHub:
+    """Раздача изменений user_data подписчикам по UID (pub/sub внутри процесса).
+
+    Подписчики сгруппированы по UID, поэтому событие стоит столько, сколько
+    потоков открыто у этого пользователя. Каждому событию присваивается
+    возрастающий id; последние события UID хранятся (LRU по UID) для досылки
+    после переподключения по Last-Event-ID. Если досылка невозможна (история
+    обрезана или процесс перезапущен), подписка помечается overflowed -
+    клиенту нужно перечитать данные.
+
+    Изменения приходят из двух источников - записей этого процесса и опроса
+    версий строк (записи миниаппа и других процессов); повтор того же
+    изменения раздела (та же отметка changed_at) не рассылается.
+    """
+
+    def __init__(self, queue_size: int = 100, history_size: int = 50, history_uids: int = 10000,
+                 max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self.history_uids = history_uids
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}  # uid -> set(Subscription)
+        # uid -> [deque[(id, SectionChange)], id последнего вытесненного, {раздел: последняя отметка}]
+        self._history = OrderedDict()
+        self._count = 0
+        self._last_id = 0
+
+    def __len__(self):
+        return self._count
+
+    def _uid_history(self, uid: str):
+        history = self._history.get(uid)
+        if history is None:
+            history = self._history[uid] = [deque(maxlen=self.history_size), 0, {}]
+            while len(self._history) > self.history_uids:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(uid)
+        return history
+
+    def subscribe(self, uid: str, sections=None, last_event_id: int = None):
+        """Подписка на события UID; None - достигнут лимит подписчиков процесса"""
+        if self._count >= self.max_subscribers:
+            return None
+        subscription = Subscription(uid, sections, self.queue_size)
+        if last_event_id is not None:
+            history = self._history.get(uid)
+            if history is None or last_event_id < history[1] or last_event_id > self._last_id:
+                subscription.overflowed = True
+            else:
+                for event_id, event in history[0]:
+                    if event_id > last_event_id and (
+                        subscription.sections is None or event.section in subscription.sections
+                    ):
+                        subscription.put((event_id, event))
+        self._uid_history(uid)
+        self._subscribers.setdefault(uid, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.uid)
+        if not subscribers or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        self._count -= 1
+        if not subscribers:
+            del self._subscribers[subscription.uid]
+
+    def publish(self, event: SectionChange):
+        subscribers = self._subscribers.get(event.uid)
+        history = self._history.get(event.uid) if not subscribers else self._uid_history(event.uid)
+        if history is None:
+            # Пользователь не подключался: хранить историю незачем
+            return
+        stamp = normalize_stamp(event.changed_at)
+        if stamp is not None:
+            if history[2].get(event.section) == stamp:
+                return
+            history[2][event.section] = stamp
+        self._last_id += 1
+        item = (self._last_id, event)
+        events = history[0]
+        if len(events) == events.maxlen:
+            history[1] = events[0][0]
+        events.append(item)
+        for subscription in subscribers or ():
+            if subscription.sections is not None and event.section not in subscription.sections:
+                continue
+            subscription.put(item)
+
+    def active_uids(self) -> list:
+        """UID с открытыми потоками"""
+        return list(self._subscribers)
+
+    def has_capacity(self) -> bool:
+        return self._count < self.max_subscribers
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "uids": len(self._subscribers),
+            "history_uids": len(self._history),
+            "last_event_id": self._last_id
+        }
+
+
+user_event_hub = UserEventHub(
+    queue_size=int(os.getenv("PUSH_QUEUE_SIZE", "100")),
+    max_subscribers=int(os.getenv("PUSH_MAX_SUBSCRIBERS", "10000"))
+)
+user_data_events.subscribe(user_event_hub.publish)
@@ -0,0 +1,49 @@
+from collections import Counter
+
+from .schedule_index import ScheduleIndex
+
+# Таблица общих недельных расписаний: одна строка на содержимое (хэш раздела schedule)
+GROUP_SCHEDULES_TABLE = "group_schedules"
+
+
+def schedule_group(week_schedule) -> str:
+    """Группа, которой принадлежит расписание: самая частая в его занятиях"""
+    groups = Counter()
+    if isinstance(week_schedule, dict):
+        for day in week_schedule.get('days') or []:
+            for class_item in (day.get('classes') or []) if isinstance(day, dict) else []:
+                if isinstance(class_item, dict) and class_item.get('group'):
+                    groups[class_item['group']] += 1
+    return groups.most_common(1)[0][0] if groups else None
+
+
+def group_schedule_row(digest: str, week_schedule: dict) -> dict:
+    metadata = week_schedule.get('metadata') or {} if isinstance(week_schedule, dict) else {}
+    return {
+        "hash": digest,
+        "group_name": schedule_group(week_schedule),
+        "year": metadata.get('year'),
+        "week_number": metadata.get('week_number'),
+        "schedule": week_schedule,
+    }
+
+
+class GroupSchedule:
+    """Неизменяемое расписание, общее для всех студентов группы.
+
+    Содержимое адресуется хэшем, поэтому запись в кэше никогда не устаревает,
+    а скомпилированный ScheduleIndex строится один раз на всю группу.
+    """
+
+    __slots__ = ("hash", "schedule", "_index")
+
+    def __init__(self, digest: str, schedule):
+        self.hash = digest
+        self.schedule = schedule if schedule is not None else {}
+        self._index = None
+
+    @property
+    def index(self) -> ScheduleIndex:
+        if self._index is None:
+            self._index = ScheduleIndex.compile(self.schedule)
+        return self._index
@@ -0,0 +1,303 @@
+import base64
+import binascii
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import date, datetime
+
+import orjson
+
+
+def parse_date(value):
+    """Дата из ISO (2025-11-06...) или формата ЛК (06.11.2025 17:10:16); иначе None"""
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text.split()[0], "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def _get(item, *path):
+    for key in path:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+
+def _task_deadline(task):
+    deadline = task.get('deadline')
+    if isinstance(deadline, dict):
+        return parse_date(deadline.get('date')) or parse_date(deadline.get('text'))
+    return parse_date(deadline)
+
+
+def _report_date(report):
+    load_date = report.get('load_date')
+    if isinstance(load_date, dict):
+        return parse_date(load_date.get('date')) or parse_date(load_date.get('text'))
+    return parse_date(load_date)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Поля индекса для каждого вида списка: извлечение из элемента.
+# Сортировка position - порядок, в котором список сохранен парсером.
+ListSpec = namedtuple("ListSpec", ["status", "subject", "semester", "date", "sort_fields", "default_sort"])
+
+LIST_SPECS = {
+    "tasks": ListSpec(
+        status=lambda item: _get(item, 'status', 'code'),
+        subject=lambda item: _get(item, 'subject', 'name'),
+        semester=lambda item: None,
+        date=_task_deadline,
+        sort_fields={
+            "position": None,
+            "deadline": lambda item: _task_deadline(item),
+            "name": lambda item: _get(item, 'task', 'name') or item.get('name'),
+            "number": lambda item: _int(_get(item, 'task', 'number')),
+            "status": lambda item: _get(item, 'status', 'code'),
+            "subject": lambda item: _get(item, 'subject', 'name'),
+        },
+        default_sort="position"
+    ),
+    "marks": ListSpec(
+        status=lambda item: _get(item, 'control', 'status'),
+        subject=lambda item: _get(item, 'subject', 'name'),
+        semester=lambda item: _int(_get(item, 'semester', 'number')),
+        date=lambda item: None,
+        sort_fields={
+            "position": None,
+            "semester": lambda item: _int(_get(item, 'semester', 'number')),
+            "subject": lambda item: _get(item, 'subject', 'name'),
+            "value": lambda item: _int(_get(item, 'control', 'value')),
+        },
+        default_sort="position"
+    ),
+    "reports": ListSpec(
+        status=lambda item: _get(item, 'status', 'code'),
+        subject=lambda item: _get(item, 'subject', 'name'),
+        semester=lambda item: None,
+        date=_report_date,
+        sort_fields={
+            "position": None,
+            "load_date": _report_date,
+            "name": lambda item: _get(item, 'task', 'name'),
+            "status": lambda item: _get(item, 'status', 'code'),
+        },
+        default_sort="position"
+    ),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _sort_value(value):
+    """Значение для сравнения: None в конце, даты - строкой ISO, строки без учета регистра"""
+    if value is None:
+        return (1, "")
+    if isinstance(value, date):
+        return (0, value.isoformat())
+    if isinstance(value, str):
+        return (0, value.casefold())
+    return (0, value)
+
+
+def _identities(items: list) -> list:
+    """Идентичность элемента, не зависящая от его позиции: хэш содержимого и номер
+    среди одинаковых элементов. Разрывает равенство ключей сортировки, поэтому
+    курсор остается верным после вставки элементов в список."""
+    seen = {}
+    identities = []
+    for item in items:
+        digest = hashlib.sha1(orjson.dumps(item, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)).hexdigest()[:16]
+        seen[digest] = seen.get(digest, -1) + 1
+        identities.append(f"{digest}:{seen[digest]}")
+    return identities
+
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([sort, key])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        cursor_sort, key = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key = ((key[0][0], key[0][1]), key[1])
+    except (ValueError, TypeError, IndexError, binascii.Error, orjson.JSONDecodeError):
+        raise InvalidCursor("Некорректный cursor")
+    if cursor_sort != sort:
+        raise InvalidCursor("cursor получен для другой сортировки")
+    return key
+
+
+class ListIndex:
+    """Индекс списка задач/оценок/отчетов одной версии данных пользователя.
+
+    Строится один раз: значения фильтров по позициям, обратные списки по
+    статусу, предмету и семестру. Отсортированные порядки строятся лениво
+    для каждого поля сортировки. Курсор - ключ сортировки последнего элемента
+    страницы (значение поля и идентичность элемента), поэтому страницы
+    стабильны и без OFFSET, в том числе после добавления элементов.
+    """
+
+    def __init__(self, kind: str, items: list):
+        self.kind = kind
+        self.spec = LIST_SPECS[kind]
+        self.items = items
+        self.dates = []
+        self.by_status = {}
+        self.by_subject = {}
+        self.by_semester = {}
+        self._orders = {}
+        self._identities = None
+        self._identity_positions = None
+
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                item = {}
+            self.dates.append(self.spec.date(item))
+            for postings, value in (
+                (self.by_status, self.spec.status(item)),
+                (self.by_subject, self.spec.subject(item)),
+                (self.by_semester, self.spec.semester(item)),
+            ):
+                if value is not None:
+                    key = value.casefold() if isinstance(value, str) else value
+                    postings.setdefault(key, []).append(position)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def identities(self) -> list:
+        if self._identities is None:
+            self._identities = _identities(self.items)
+        return self._identities
+
+    def _position_key(self, key: tuple) -> tuple:
+        """Ключ курсора сортировки position с текущей позицией того же элемента.
+
+        Позиция из курсора после вставок в начало списка указывает на другой
+        элемент, поэтому элемент ищется по идентичности; если его больше нет,
+        остается позиция из курсора.
+        """
+        if self._identity_positions is None:
+            self._identity_positions = {identity: position for position, identity in enumerate(self.identities)}
+        position = self._identity_positions.get(key[1])
+        return key if position is None else ((0, position), key[1])
+
+    def _order(self, sort: str) -> list:
+        """[(ключ сортировки, позиция)] по возрастанию; ключ - (значение, идентичность)"""
+        order = self._orders.get(sort)
+        if order is None:
+            extract = self.spec.sort_fields[sort]
+            identities = self.identities
+            if extract is None:
+                order = [(((0, position), identities[position]), position) for position in range(len(self.items))]
+                self._orders[sort] = order
+                return order
+            order = sorted(
+                ((_sort_value(extract(item) if isinstance(item, dict) else None), identities[position]), position)
+                for position, item in enumerate(self.items)
+            )
+            self._orders[sort] = order
+        return order
+
+    def _candidates(self, status=None, subject=None, semester=None):
+        """Позиции, подходящие под фильтры равенства; None - без ограничений"""
+        candidates = None
+        for postings, values in (
+            (self.by_status, status),
+            (self.by_subject, subject),
+            (self.by_semester, semester),
+        ):
+            if not values:
+                continue
+            matched = set()
+            for value in values:
+                key = value.casefold() if isinstance(value, str) else value
+                matched.update(postings.get(key, ()))
+            candidates = matched if candidates is None else candidates & matched
+        return candidates
+
+    def query(
+        self,
+        status: list = None,
+        subject: list = None,
+        semester: list = None,
+        date_from: date = None,
+        date_to: date = None,
+        sort: str = None,
+        descending: bool = False,
+        cursor: str = None,
+        limit: int = None
+    ) -> dict:
+        """Страница отфильтрованного и отсортированного списка"""
+        sort = sort or self.spec.default_sort
+        order = self._order(sort)
+        candidates = self._candidates(status, subject, semester)
+
+        def matches(position):
+            if candidates is not None and position not in candidates:
+                return False
+            if date_from or date_to:
+                value = self.dates[position]
+                if value is None or (date_from and value < date_from) or (date_to and value > date_to):
+                    return False
+            return True
+
+        if cursor:
+            last = decode_cursor(cursor, sort)
+            if self.spec.sort_fields[sort] is None:
+                last = self._position_key(last)
+            try:
+                # Позиция в курсор не входит: после вставок она у того же элемента другая
+                start = bisect_left(order, (last, -1)) - 1 if descending else bisect_right(order, (last, float("inf")))
+            except TypeError:
+                raise InvalidCursor("Некорректный cursor")
+        else:
+            start = len(order) - 1 if descending else 0
+        step = -1 if descending else 1
+        stop = -1 if descending else len(order)
+
+        page = []
+        total = 0
+        last = None
+        next_cursor = None
+        for index in range(start, stop, step):
+            key, position = order[index]
+            if not matches(position):
+                continue
+            total += 1
+            if limit is None or len(page) < limit:
+                page.append(position)
+                last = key
+            elif next_cursor is None:
+                next_cursor = encode_cursor(sort, last)
+                if cursor:
+                    # Общее количество считается только для первой страницы
+                    break
+
+        result = {
+            "items": [self.items[position] for position in page],
+            "next_cursor": next_cursor,
+            "sort": sort,
+            "order": "desc" if descending else "asc"
+        }
+        if not cursor:
+            result["total"] = total
+        return result
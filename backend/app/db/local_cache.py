@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSnapshotStore:
+    """Последние известные строки БД на локальном диске (SQLite), по ключу.
+
+    Используется только как запасной источник, когда Supabase недоступен:
+    строки переживают перезапуск процесса. Запись идет в фоне через
+    пул потоков и пропускается, если строка с той же отметкой уже сохранена.
+    Колонки новой строки дописываются к сохраненной: частичные снимки
+    (проекции) накапливаются в одну строку.
+    В файле персональные данные студентов - он создается с правами 0600.
+    """
+
+    def __init__(self, path: str, max_entries: int = 20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._saved = OrderedDict()  # ключ -> отметка строки, уже записанной на диск
+        self._writes = 0
+        self._pending = set()
+        self._has_data = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "key TEXT PRIMARY KEY, row BLOB NOT NULL, saved_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_saved_at ON snapshots (saved_at)")
+            if os.path.exists(self.path):
+                os.chmod(self.path, 0o600)
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT row, saved_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return orjson.loads(row[0]), row[1]
+
+    def _put(self, key: str, row: dict):
+        with self._lock:
+            conn = self._connect()
+            stored = conn.execute("SELECT row FROM snapshots WHERE key = ?", (key,)).fetchone()
+            if stored is not None:
+                row = {**orjson.loads(stored[0]), **row}
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (key, row, saved_at) VALUES (?, ?, ?)",
+                (key, orjson.dumps(row, option=orjson.OPT_NON_STR_KEYS), time.time())
+            )
+            self._writes += 1
+            if self._writes % 500 == 0:
+                # Ограничиваем размер файла: удаляем самые давно обновленные строки
+                conn.execute(
+                    "DELETE FROM snapshots WHERE key IN ("
+                    "SELECT key FROM snapshots ORDER BY saved_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    @property
+    def has_data(self) -> bool:
+        """В кэше есть хотя бы одна строка (в том числе сохраненная прошлым процессом)"""
+        if self._has_data is None:
+            try:
+                with self._lock:
+                    if self._conn is None and not os.path.exists(self.path):
+                        return False
+                    self._has_data = self._connect().execute("SELECT 1 FROM snapshots LIMIT 1").fetchone() is not None
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Local snapshot store check failed: %s", e)
+                return False
+        return self._has_data
+
+    async def get(self, key: str):
+        """(строка, время сохранения) или None"""
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except (sqlite3.Error, OSError, orjson.JSONDecodeError) as e:
+            logger.error("Local snapshot read failed: %s", e, extra={"key": key})
+            return None
+
+    def save(self, key: str, marker, make_row):
+        """Сохраняет строку в фоне.
+
+        marker - отметка содержимого (например, версия и число колонок): строка
+        с той же отметкой повторно не пишется, а make_row тогда не вызывается.
+        """
+        if key in self._saved and self._saved[key] == marker:
+            self._saved.move_to_end(key)
+            return
+        self._saved[key] = marker
+        while len(self._saved) > self.max_entries:
+            self._saved.popitem(last=False)
+
+        task = asyncio.create_task(self._save(key, make_row()))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _save(self, key: str, row: dict):
+        try:
+            await asyncio.to_thread(self._put, key, row)
+            self._has_data = True
+        except (sqlite3.Error, OSError, TypeError, orjson.JSONDecodeError) as e:
+            self._saved.pop(key, None)
+            logger.error("Local snapshot write failed: %s", e, extra={"key": key})
+
+    async def aclose(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_local_store():
+    """LOCAL_CACHE_PATH=off отключает локальный кэш"""
+    default_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "snapshots.sqlite3")
+    path = os.getenv("LOCAL_CACHE_PATH", default_path)
+    if path.lower() in ("", "off", "none"):
+        return None
+    return LocalSnapshotStore(path, max_entries=int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "20000")))
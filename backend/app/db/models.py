@@ -0,0 +1,255 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+import orjson
+
+from .schedule_index import ScheduleIndex
+from .list_index import ListIndex
+from .search_index import SearchIndex, SEARCH_SOURCES
+
+# Колонки user_data, по которым определяется версия строки.
+# Миниапп обновляет их при каждой записи соответствующих разделов.
+VERSION_COLUMNS = ("updated_at", "schedule_updated_at", "tasks_updated_at", "reports_updated_at")
+
+# Тяжелые JSON-колонки user_data; каждый аксессор запрашивает только нужные ему
+PROFILE_COLUMNS = ("profile",)
+TASKS_COLUMNS = ("tasks",)
+MARKS_COLUMNS = ("marks",)
+REPORTS_COLUMNS = ("reports",)
+MATERIALS_COLUMNS = ("materials",)
+# week_schedule_ref - хэш общего расписания группы в group_schedules; сам week_schedule
+# в строке при этом пустой (старые строки и записи миниаппа хранят его целиком)
+WEEK_SCHEDULE_REF_COLUMN = "week_schedule_ref"
+WEEK_SCHEDULE_COLUMNS = ("week_schedule", WEEK_SCHEDULE_REF_COLUMN)
+TODAY_SCHEDULE_COLUMNS = ("today_schedule",)
+USER_DATA_COLUMNS = (
+    PROFILE_COLUMNS + TASKS_COLUMNS + MARKS_COLUMNS + REPORTS_COLUMNS
+    + MATERIALS_COLUMNS + WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS
+)
+
+# Разделы данных пользователя: основная колонка раздела и его отметка времени
+SECTION_COLUMNS = {
+    "profile": "profile",
+    "tasks": "tasks",
+    "marks": "marks",
+    "reports": "reports",
+    "materials": "materials",
+    "schedule": "week_schedule",
+}
+SECTION_TIMESTAMPS = {
+    "tasks": "tasks_updated_at",
+    "reports": "reports_updated_at",
+    "schedule": "schedule_updated_at",
+}
+# Хэши содержимого разделов {раздел: {"hash": sha1, "stamp": отметка времени раздела}}.
+# stamp - значение колонки section_stamp_column() при записи хэша: миниапп пишет
+# разделы напрямую, не трогая хэши, но всегда сдвигает эту отметку
+SECTION_HASHES_COLUMN = "section_hashes"
+
+
+def section_stamp_column(section: str) -> str:
+    """Колонка времени, которую сдвигает любая запись раздела (миниаппом или бэкендом)"""
+    return SECTION_TIMESTAMPS.get(section, "updated_at")
+
+
+def normalize_stamp(value):
+    """Отметка времени в едином виде для сравнения.
+
+    Бэкенд пишет время без зоны, миниапп - toISOString() с Z, а timestamptz
+    возвращается с +00:00: одно и то же время приводится к UTC без зоны
+    (время без зоны PostgreSQL считает временем сессии - UTC в Supabase).
+    Нераспознанные значения возвращаются как есть.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def trusted_section_hash(row: dict, section: str):
+    """Хэш раздела из section_hashes, если после его записи раздел никто не перезаписывал.
+
+    Записи в обход бэкенда (миниапп) не обновляют section_hashes, но сдвигают
+    отметку времени раздела - такой хэш уже не описывает содержимое строки.
+    Хэши старого формата (строка без отметки) тоже не считаются достоверными.
+    """
+    entry = (row.get(SECTION_HASHES_COLUMN) or {}).get(section)
+    if isinstance(entry, dict) and (
+        normalize_stamp(entry.get("stamp")) == normalize_stamp(row.get(section_stamp_column(section)))
+    ):
+        return entry.get("hash")
+    return None
+
+
+# Служебные поля, которые меняются при каждой синхронизации и не влияют на содержимое
+_VOLATILE_METADATA = ("schedule_updated_at",)
+
+
+def section_hash(section: str, value) -> str:
+    """Хэш содержимого раздела; не зависит от порядка ключей и служебных отметок времени"""
+    if section == "schedule" and isinstance(value, dict) and isinstance(value.get("metadata"), dict):
+        metadata = {k: v for k, v in value["metadata"].items() if k not in _VOLATILE_METADATA}
+        value = {**value, "metadata": metadata}
+    return hashlib.sha1(orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)).hexdigest()
+
+
+def row_version(row: dict) -> tuple:
+    """Версия строки user_data - кортеж из отметок времени обновления"""
+    return tuple(row.get(column) for column in VERSION_COLUMNS)
+
+
+class UserSnapshot:
+    """Снимок строки user_data, загруженный один раз и общий для всех аксессоров.
+
+    Снимок может содержать только часть колонок: недостающие догружаются
+    через merge(), пока версия строки не изменилась.
+    """
+
+    __slots__ = (
+        "uid", "row", "version", "fetched_at", "_schedule_index", "_list_indexes", "_search_index",
+        "_group_schedule"
+    )
+
+    def __init__(self, uid: str, row: dict):
+        self.uid = uid
+        self.row = row
+        self.version = row_version(row)
+        self.fetched_at = time.time()
+        self._schedule_index = None
+        self._list_indexes = {}
+        self._search_index = None
+        self._group_schedule = None
+
+    def missing_columns(self, columns) -> tuple:
+        return tuple(column for column in columns if column not in self.row)
+
+    def merge(self, row: dict):
+        """Добавляет догруженные колонки той же версии строки"""
+        self.row = {**self.row, **row}
+        if any(column in row for column in WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS):
+            self._schedule_index = None
+            if self.schedule_ref != getattr(self._group_schedule, "hash", None):
+                self._group_schedule = None
+        for kind in list(self._list_indexes):
+            if kind in row:
+                del self._list_indexes[kind]
+        if any(column in row for column in SEARCH_SOURCES):
+            self._search_index = None
+
+    @property
+    def updated_at(self):
+        return self.row.get("updated_at")
+
+    def _as_list(self, column: str) -> list:
+        value = self.row.get(column)
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            return [value]
+        return value
+
+    @property
+    def tasks(self) -> list:
+        return self._as_list("tasks")
+
+    @property
+    def marks(self) -> list:
+        return self._as_list("marks")
+
+    @property
+    def reports(self) -> list:
+        return self._as_list("reports")
+
+    @property
+    def materials(self) -> list:
+        return self._as_list("materials")
+
+    @property
+    def profile(self) -> dict:
+        return self.row.get("profile") or {}
+
+    @property
+    def schedule_ref(self):
+        """Хэш общего расписания группы, если week_schedule не хранится в строке"""
+        if self.row.get("week_schedule") is None:
+            return self.row.get(WEEK_SCHEDULE_REF_COLUMN)
+        return None
+
+    @property
+    def needs_group_schedule(self) -> bool:
+        return self.schedule_ref is not None and self._group_schedule is None
+
+    def attach_group_schedule(self, group_schedule):
+        """Подключает общее расписание группы из кэша SupabaseClient"""
+        self._group_schedule = group_schedule
+        self._schedule_index = None
+
+    def self_contained_row(self) -> dict:
+        """Строка с подставленным общим расписанием группы вместо ссылки на него
+        (для локального кэша, который читается, когда group_schedules недоступна)"""
+        if self._group_schedule is None or self.row.get("week_schedule") is not None:
+            return self.row
+        return {**self.row, "week_schedule": self._group_schedule.schedule, WEEK_SCHEDULE_REF_COLUMN: None}
+
+    @property
+    def week_schedule(self):
+        schedule = self.row.get("week_schedule")
+        if schedule is None and self._group_schedule is not None:
+            return self._group_schedule.schedule
+        return {} if schedule is None else schedule
+
+    @property
+    def today_schedule(self):
+        return self.row.get("today_schedule")
+
+    @property
+    def schedule_index(self) -> ScheduleIndex:
+        """Индекс расписания по датам, компилируется один раз на версию снимка"""
+        if self._schedule_index is None:
+            if self._group_schedule is not None and not self.today_schedule:
+                # Без отдельного today_schedule индекс одинаков для всей группы
+                self._schedule_index = self._group_schedule.index
+            else:
+                self._schedule_index = ScheduleIndex.compile(self.week_schedule, self.today_schedule)
+        return self._schedule_index
+
+    def list_index(self, kind: str) -> ListIndex:
+        """Индекс задач, оценок или отчетов (kind - имя колонки), один раз на версию снимка"""
+        index = self._list_indexes.get(kind)
+        if index is None:
+            index = ListIndex(kind, self._as_list(kind))
+            self._list_indexes[kind] = index
+        return index
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Полнотекстовый индекс задач, отчетов и материалов, один раз на версию снимка"""
+        if self._search_index is None:
+            self._search_index = SearchIndex.build({kind: self._as_list(kind) for kind in SEARCH_SOURCES})
+        return self._search_index
+
+    @property
+    def extra_classes(self) -> list:
+        schedule = self.week_schedule
+        if not isinstance(schedule, dict):
+            return []
+
+        return [
+            {
+                "type": class_item.get('type', ''),
+                "group": class_item.get('group', ''),
+                "subject": class_item.get('subject', ''),
+                "teacher": class_item.get('teacher', ''),
+                "building": class_item.get('building', ''),
+                "location": class_item.get('location', ''),
+                "teacherInfo": class_item.get('teacherInfo', '')
+            }
+            for class_item in schedule.get('extraClasses', [])
+            if isinstance(class_item, dict)
+        ]
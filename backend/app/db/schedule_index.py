@@ -0,0 +1,127 @@
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+DAY_NAMES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+CLASS_FIELDS = (
+    "type", "group", "subject", "teacher", "building",
+    "location", "timeRange", "pairNumber", "teacherInfo"
+)
+
+# Компактная запись занятия: кортеж вместо словаря на каждый класс
+ClassRecord = namedtuple("ClassRecord", CLASS_FIELDS)
+
+# День расписания: занятия плюс служебные поля исходного документа
+DayEntry = namedtuple("DayEntry", ("classes", "order", "full_date", "metadata"))
+
+
+def _class_record(class_item: dict) -> ClassRecord:
+    return ClassRecord(*(class_item.get(field, '') for field in CLASS_FIELDS))
+
+
+def _parse_iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _resolve_day_date(day_data: dict, year: int):
+    """Дата дня: fullDate (YYYY-MM-DD) или "dd.mm" + год из метаданных"""
+    resolved = _parse_iso_date(day_data.get('fullDate'))
+    if resolved:
+        return resolved
+    try:
+        return datetime.strptime(f"{day_data.get('date')}.{year}", "%d.%m.%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduleIndex:
+    """Расписание, скомпилированное в индекс по датам.
+
+    Строится один раз на версию week_schedule/today_schedule и отвечает на
+    запросы по любому дню или диапазону дней без повторного разбора JSON.
+    """
+
+    __slots__ = ("days",)
+
+    def __init__(self, days: dict = None):
+        self.days = days or {}
+
+    @classmethod
+    def compile(cls, week_schedule, today_schedule=None):
+        days = {}
+
+        if isinstance(week_schedule, dict):
+            metadata = week_schedule.get('metadata') or {}
+            year = metadata.get('year') or date.today().year
+            for day_data in week_schedule.get('days', []):
+                if not isinstance(day_data, dict):
+                    continue
+                day_date = _resolve_day_date(day_data, year)
+                if day_date is None:
+                    continue
+                days[day_date] = DayEntry(
+                    classes=tuple(
+                        _class_record(class_item)
+                        for class_item in day_data.get('classes', [])
+                        if isinstance(class_item, dict)
+                    ),
+                    order=day_data.get('order'),
+                    full_date=day_data.get('fullDate'),
+                    metadata=metadata
+                )
+
+        # Расписание на день из отдельного парсера точнее недельного для своей даты
+        if isinstance(today_schedule, dict):
+            today_date = _parse_iso_date(today_schedule.get('date'))
+            if today_date is not None:
+                week_entry = days.get(today_date)
+                days[today_date] = DayEntry(
+                    classes=tuple(
+                        _class_record(class_item)
+                        for class_item in today_schedule.get('schedule') or []
+                        if isinstance(class_item, dict)
+                    ),
+                    order=week_entry.order if week_entry else None,
+                    full_date=week_entry.full_date if week_entry else None,
+                    metadata=today_schedule.get('metadata') or {}
+                )
+
+        return cls(days)
+
+    def day(self, target: date) -> dict:
+        """Расписание на дату в формате ответов API"""
+        result = {
+            "date": target.strftime("%Y-%m-%d"),
+            "date_dd_mm": target.strftime("%d.%m"),
+            "day_name": DAY_NAMES[target.weekday()],
+            "day_of_week": target.weekday(),
+            "schedule": [],
+            "has_schedule": False
+        }
+
+        entry = self.days.get(target)
+        if entry is None:
+            return result
+
+        result["schedule"] = [record._asdict() for record in entry.classes]
+        result["has_schedule"] = bool(entry.classes)
+        result["order"] = entry.order
+        result["fullDate"] = entry.full_date
+        result["metadata"] = entry.metadata
+        return result
+
+    def day_by_offset(self, day_offset: int) -> dict:
+        return self.day(date.today() + timedelta(days=day_offset))
+
+    def range(self, date_from: date, date_to: date) -> list:
+        """Расписание на каждый день диапазона включительно"""
+        return [
+            self.day(date_from + timedelta(days=offset))
+            for offset in range((date_to - date_from).days + 1)
+        ]
+
+    def __len__(self):
+        return len(self.days)
@@ -0,0 +1,162 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+
+# Окончания для облегченного стемминга русских слов (самые длинные - первыми)
+_ENDINGS = tuple(sorted((
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ой", "ей", "ий", "ый", "ая", "яя",
+    "ое", "ее", "ые", "ие", "ую", "юю", "ов", "ев", "ах", "ях", "ом", "ем", "ам", "ям", "ию", "ия", "ии",
+    "а", "я", "ы", "и", "о", "е", "у", "ю", "ь", "й",
+), key=len, reverse=True))
+_MIN_STEM = 3
+
+# Вес поля в ранжировании: совпадение в названии важнее, чем в ФИО преподавателя
+FIELD_WEIGHTS = {"title": 3.0, "subject": 2.0, "teacher": 1.5, "type": 1.0}
+# Множитель для совпадения только по префиксу (а не всего слова)
+PREFIX_FACTOR = 0.6
+
+SearchDocument = namedtuple("SearchDocument", ["kind", "position", "item"])
+
+
+def normalize(text: str) -> str:
+    return str(text).casefold().replace("ё", "е")
+
+
+def stem(token: str) -> str:
+    """Отбрасывает типичное окончание, оставляя основу не короче _MIN_STEM"""
+    if token.isdigit() or not ("а" <= token[0] <= "я"):
+        return token
+    for ending in _ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= _MIN_STEM:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text) -> list:
+    """Токены с учетом русского: регистр, ё/е, окончания"""
+    if not text:
+        return []
+    return [stem(token) for token in _TOKEN_RE.findall(normalize(text))]
+
+
+def _text(value, *keys):
+    if isinstance(value, dict):
+        for key in keys:
+            if value.get(key):
+                return str(value[key])
+        return ""
+    return str(value) if value else ""
+
+
+def _task_fields(task: dict) -> dict:
+    return {
+        "title": _text(task.get('task'), 'name') or _text(task.get('name')),
+        "type": _text(task.get('task'), 'type') or _text(task.get('type')),
+        "subject": _text(task.get('subject'), 'name'),
+        "teacher": _text(task.get('teacher'), 'full_name', 'name'),
+    }
+
+
+def _report_fields(report: dict) -> dict:
+    return {
+        "title": _text(report.get('task'), 'name'),
+        "type": _text(report.get('task'), 'type'),
+        "subject": _text(report.get('subject'), 'name'),
+        "teacher": _text(report.get('teacher'), 'full_name', 'name'),
+    }
+
+
+def _material_fields(material: dict) -> dict:
+    return {
+        "title": _text(material.get('name') or material.get('title')),
+        "subject": _text(material.get('subject'), 'name'),
+        "teacher": _text(material.get('teacher'), 'full_name', 'name'),
+        "type": _text(material.get('type')),
+    }
+
+
+SEARCH_SOURCES = {"tasks": _task_fields, "reports": _report_fields, "materials": _material_fields}
+
+
+class SearchIndex:
+    """Обратный индекс по задачам, отчетам и материалам одной версии данных.
+
+    Термы хранятся отсортированными, поэтому префиксный поиск - это bisect
+    по списку термов. Документ попадает в результат, если совпали все слова
+    запроса; ранжирование - сумма весов полей с понижением за префиксные совпадения.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.postings = {}  # терм -> {doc_id: вес}
+        self.terms = []
+
+    @classmethod
+    def build(cls, lists: dict) -> "SearchIndex":
+        """lists - {"tasks": [...], "reports": [...], "materials": [...]}"""
+        index = cls()
+        for kind, items in lists.items():
+            extract = SEARCH_SOURCES[kind]
+            for position, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                doc_id = len(index.documents)
+                index.documents.append(SearchDocument(kind, position, item))
+                for field, text in extract(item).items():
+                    weight = FIELD_WEIGHTS[field]
+                    for term in tokenize(text):
+                        postings = index.postings.setdefault(term, {})
+                        if postings.get(doc_id, 0) < weight:
+                            postings[doc_id] = weight
+        index.terms = sorted(index.postings)
+        return index
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _match_token(self, token: str) -> dict:
+        """{doc_id: вес} для токена запроса: точное совпадение терма и термы с этим префиксом"""
+        scores = {}
+        for index in range(bisect_left(self.terms, token), len(self.terms)):
+            term = self.terms[index]
+            if not term.startswith(token):
+                break
+            factor = 1.0 if term == token else PREFIX_FACTOR
+            for doc_id, weight in self.postings[term].items():
+                score = weight * factor
+                if scores.get(doc_id, 0) < score:
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query: str, kinds=None, limit: int = 20) -> list:
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        scores = None
+        # Сначала длинные токены: у них меньше совпадений, пересечение быстрее сужается
+        for token in sorted(tokens, key=len, reverse=True):
+            matched = self._match_token(token)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {doc_id: score + matched[doc_id] for doc_id, score in scores.items() if doc_id in matched}
+            if not scores:
+                return []
+
+        results = [
+            (score, doc_id) for doc_id, score in scores.items()
+            if kinds is None or self.documents[doc_id].kind in kinds
+        ]
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {
+                "kind": self.documents[doc_id].kind,
+                "position": self.documents[doc_id].position,
+                "score": round(score, 3),
+                "item": self.documents[doc_id].item
+            }
+            for score, doc_id in results[:limit]
+        ]
@@ -1,185 +1,700 @@
 import os
-from supabase import create_client, Client
-from datetime import datetime, timedelta
+import time
+import asyncio
+import logging
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from datetime import date, datetime
+
+from utils.metrics import timed_execute, register_cache, STALE_RESPONSES
+from utils.singleflight import SingleFlight
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.staleness import mark_stale
+from .cache import TTLCache
+from .local_cache import create_local_store
+from .schedule_index import ScheduleIndex
+from .models import (
+    UserSnapshot, VERSION_COLUMNS, row_version,
+    PROFILE_COLUMNS, TASKS_COLUMNS, MARKS_COLUMNS, REPORTS_COLUMNS,
+    MATERIALS_COLUMNS, WEEK_SCHEDULE_COLUMNS, TODAY_SCHEDULE_COLUMNS, USER_DATA_COLUMNS,
+    SECTION_COLUMNS, SECTION_HASHES_COLUMN, section_hash, section_stamp_column, trusted_section_hash,
+    WEEK_SCHEDULE_REF_COLUMN
+)
+from .group_schedules import GROUP_SCHEDULES_TABLE, GroupSchedule, group_schedule_row
+from .events import user_data_events, SectionChange
+
+logger = logging.getLogger(__name__)
+
+# Сколько UID передавать в одном фильтре in.(...): ограничение длины URL PostgREST
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "100"))
+# Хранить week_schedule в строке user_data, а не ссылкой на group_schedules.
+# Включено по умолчанию: миниапп (schedule-service.js) читает колонку напрямую;
+# выключать только после перевода миниаппа на week_schedule_ref. Пока включено,
+# group_schedules не пишется - дедупликация (меньше хранения, записи и чтения)
+# начинает работать только при SCHEDULE_INLINE_COPY=0
+SCHEDULE_INLINE_COPY = os.getenv("SCHEDULE_INLINE_COPY", "1") == "1"
+
+
+class DataUnavailableError(Exception):
+    """БД недоступна, а в кэшах нет данных, которыми можно ответить"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _tasks_summary(snapshot: UserSnapshot) -> dict:
+    by_status = {}
+    for task in snapshot.tasks:
+        status = task.get('status') if isinstance(task, dict) else None
+        code = status.get('code', 'unknown') if isinstance(status, dict) else 'unknown'
+        by_status[code] = by_status.get(code, 0) + 1
+    return {"tasks_count": len(snapshot.tasks), "by_status": by_status}
+
+
+# Поля пакетного ответа: нужные колонки user_data и вычисление по снимку
+BATCH_FIELDS = {
+    "profile": (PROFILE_COLUMNS, lambda snapshot: snapshot.profile),
+    "today_schedule": (
+        WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS,
+        lambda snapshot: snapshot.schedule_index.day_by_offset(0)
+    ),
+    "tomorrow_schedule": (
+        WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS,
+        lambda snapshot: snapshot.schedule_index.day_by_offset(1)
+    ),
+    "tasks": (TASKS_COLUMNS, _tasks_summary),
+    "marks_count": (MARKS_COLUMNS, lambda snapshot: len(snapshot.marks)),
+    "reports_count": (REPORTS_COLUMNS, lambda snapshot: len(snapshot.reports)),
+}
+
+
+def create_http_client(transport=None) -> httpx.AsyncClient:
+    """Общий пул keep-alive соединений к Supabase (PostgREST)"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(float(os.getenv("SUPABASE_TIMEOUT", "10"))),
+        transport=transport
+    )
+
 
 class SupabaseClient:
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient = None):
+        # Учетные данные проверяются при создании клиента, а не при импорте:
+        # без них приложение запускается, но проба готовности не проходит
         self.url = os.getenv("SUPABASE_URL")
         self.key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        
-        if not self.url or not self.key:
-            raise ValueError(f"Supabase credentials not found. URL: {self.url}, Key: {self.key}")
-        
-        self.client: Client = create_client(self.url, self.key)
-        print("✅ Supabase client initialized successfully")
 
-    def get_user_by_uid(self, uid: str):
-        """Получаем пользователя из Authentication.users по UID"""
+        # Асинхронный клиент создается лениво при первом запросе (или в lifespan),
+        # т.к. acreate_client требует запущенного event loop
+        self.client: AsyncClient = None
+        self._http_client = http_client
+        self._client_lock = asyncio.Lock()
+        self._snapshots = TTLCache(
+            maxsize=int(os.getenv("USER_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("USER_CACHE_TTL", "30"))
+        )
+        register_cache("user_snapshots", self._snapshots)
+        # Общие расписания групп адресуются хэшем содержимого и не устаревают
+        self._group_schedules = TTLCache(
+            maxsize=int(os.getenv("GROUP_SCHEDULE_CACHE_SIZE", "1024")),
+            ttl=float("inf")
+        )
+        register_cache("group_schedules", self._group_schedules)
+        # Одновременные одинаковые чтения (вся группа открыла приложение после пары)
+        # выполняются одним запросом к БД
+        self._flights = SingleFlight("supabase")
+        # Недоступная БД не держит запросы: после серии отказов вызовы сразу
+        # отклоняются, и ответы собираются из последних известных данных
+        self._breaker = CircuitBreaker(
+            "supabase",
+            failure_threshold=int(os.getenv("SUPABASE_BREAKER_THRESHOLD", "5")),
+            recovery_timeout=float(os.getenv("SUPABASE_BREAKER_RECOVERY", "30")),
+            call_timeout=float(os.getenv("SUPABASE_CALL_TIMEOUT", "5"))
+        )
+        # Последние строки пользователей на диске - переживают перезапуск во время сбоя
+        self._local = create_local_store()
+        logger.info("Supabase client initialized")
+
+    async def _get_client(self) -> AsyncClient:
+        if self.client is None:
+            async with self._client_lock:
+                if self.client is None:
+                    self.url = self.url or os.getenv("SUPABASE_URL")
+                    self.key = self.key or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+                    if not self.url or not self.key:
+                        raise ValueError(f"Supabase credentials not found. URL: {self.url}, Key set: {bool(self.key)}")
+                    if self._http_client is None:
+                        self._http_client = create_http_client()
+                    self.client = await acreate_client(
+                        self.url,
+                        self.key,
+                        options=AsyncClientOptions(httpx_client=self._http_client)
+                    )
+        return self.client
+
+    async def _execute(self, query, table: str, operation: str):
+        """Запрос к PostgREST через предохранитель; отказ БД - DataUnavailableError"""
         try:
-            response = self.client.table("users").select("*").eq("UID", uid).execute()
+            return await self._breaker.call(timed_execute, query, table, operation)
+        except CircuitOpenError as e:
+            raise DataUnavailableError(str(e), retry_after=e.retry_after) from e
+        except Exception as e:
+            if self._breaker.is_failure(e):
+                raise DataUnavailableError(
+                    f"{table}.{operation}: {type(e).__name__}: {e}", retry_after=self._breaker.retry_after()
+                ) from e
+            raise
+
+    async def connect(self):
+        """Создает клиент заранее (при старте приложения), чтобы первый запрос не ждал"""
+        await self._get_client()
+
+    async def ping(self):
+        """Проверка доступности БД для health checker: одна строка, одна колонка"""
+        client = await self._get_client()
+        await self._execute(client.table("user_data").select("user_id").limit(1), "user_data", "ping")
+
+    def breaker_stats(self) -> dict:
+        return self._breaker.stats()
+
+    @property
+    def has_local_data(self) -> bool:
+        """Есть ли в локальном кэше строки, которыми можно отвечать без БД"""
+        return self._local is not None and self._local.has_data
+
+    async def aclose(self):
+        """Закрываем пул соединений при остановке приложения"""
+        if self._local is not None:
+            await self._local.aclose()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self.client = None
+        self._http_client = None
+
+    async def get_user_by_uid(self, uid: str):
+        """Получаем пользователя из Authentication.users по UID.
+
+        Пока БД недоступна, существование пользователя подтверждается
+        локальным кэшем (в нем хранится только UID, без остальных полей).
+        """
+        try:
+            user = await self._flights.do(("users", uid), self._load_user_by_uid, uid)
+        except DataUnavailableError:
+            entry = await self._local.get("users:" + uid) if self._local is not None else None
+            if entry is None:
+                raise
+            row, saved_at = entry
+            self._mark_stale(time.time() - saved_at, "local")
+            return row
+        if user and self._local is not None:
+            self._local.save("users:" + uid, True, lambda: {"UID": uid})
+        return user
+
+    async def _load_user_by_uid(self, uid: str):
+        client = await self._get_client()
+        try:
+            response = await self._execute(
+                client.table("users").select("*").eq("UID", uid), "users", "select"
+            )
             
             if response.data:
-                print(f"✅ Found user with UID: {uid}")
+                logger.debug("Found user", extra={"uid": uid})
                 return response.data[0]
             else:
-                print(f"❌ No user found with UID: {uid}")
+                logger.info("No user found", extra={"uid": uid})
                 return None
                 
         except Exception as e:
-            print(f"❌ Error getting user by UID: {e}")
-            return None
+            # Ошибки не глотаются: пустой ответ выглядел бы как отсутствие данных
+            logger.error("Error getting user by UID: %s", e, extra={"uid": uid})
+            raise
 
-    def get_user_data_by_uid(self, uid: str):
-        """Получаем данные пользователя из user_data по UID"""
+    async def get_user_data_by_uid(self, uid: str, columns=None):
+        """Получаем данные пользователя из user_data по UID.
+
+        columns - проекция: только перечисленные колонки плюс колонки версии.
+        Без проекции возвращается вся строка.
+        """
+        columns = tuple(columns) if columns else None
+        return await self._flights.do(("user_data", uid, columns), self._load_user_data, uid, columns)
+
+    async def _load_user_data(self, uid: str, columns):
+        select = ",".join(("user_id",) + VERSION_COLUMNS + columns) if columns else "*"
+        client = await self._get_client()
         try:
-            response = self.client.table("user_data")\
-                .select("*")\
-                .eq("user_id", uid)\
-                .execute()
+            response = await self._execute(
+                client.table("user_data").select(select).eq("user_id", uid),
+                "user_data", "select"
+            )
             
             if response.data:
-                print(f"✅ Found user data for UID: {uid}")
+                logger.info("Fetched user_data", extra={"uid": uid, "columns": select, "sampled": True})
                 return response.data[0]
             else:
-                print(f"❌ No user data found for UID: {uid}")
+                logger.info("No user data found", extra={"uid": uid})
                 return None
                 
         except Exception as e:
-            print(f"❌ Error getting user data by UID: {e}")
+            # Ошибки не глотаются: пустой ответ выглядел бы как отсутствие данных
+            logger.error("Error getting user data by UID: %s", e, extra={"uid": uid})
+            raise
+
+    async def _fetch_user_version(self, uid: str):
+        """Легкий запрос только колонок версии, без JSON-полей"""
+        return await self._flights.do(("version", uid), self._load_user_version, uid)
+
+    async def _load_user_version(self, uid: str):
+        client = await self._get_client()
+        try:
+            response = await self._execute(
+                client.table("user_data").select(",".join(VERSION_COLUMNS)).eq("user_id", uid),
+                "user_data", "select_version"
+            )
+            return row_version(response.data[0]) if response.data else None
+        except Exception as e:
+            # Ошибки не глотаются: пустой ответ выглядел бы как отсутствие данных
+            logger.error("Error getting user data version by UID: %s", e, extra={"uid": uid})
+            raise
+
+    async def get_user_snapshot(self, uid: str, columns=USER_DATA_COLUMNS):
+        """Снимок user_data из LRU-кэша с нужными колонками.
+
+        После истечения TTL сверяем версию строки; недостающие колонки
+        догружаются отдельным запросом только по ним. Если БД недоступна,
+        отвечаем последним известным снимком (см. _stale_snapshot).
+        """
+        try:
+            snapshot = await self._load_user_snapshot(uid, columns)
+        except DataUnavailableError:
+            snapshot = await self._stale_snapshot(uid, columns)
+            if snapshot is None:
+                raise
+            return snapshot
+        self._persist_snapshot(snapshot)
+        return snapshot
+
+    async def _load_user_snapshot(self, uid: str, columns):
+        snapshot, expired = self._snapshots.get_entry(uid)
+        if snapshot is not None and expired:
+            if await self._fetch_user_version(uid) == snapshot.version:
+                self._snapshots.touch(uid)
+            else:
+                snapshot = None
+
+        missing = snapshot.missing_columns(columns) if snapshot is not None else columns
+        if not missing:
+            if snapshot.needs_group_schedule:
+                # Общее расписание не загрузилось раньше (например, при сбое БД)
+                await self._resolve_group_schedules([snapshot])
+            return snapshot
+
+        user_data = await self.get_user_data_by_uid(uid, missing)
+        if user_data and snapshot is not None:
+            if row_version(user_data) == snapshot.version:
+                snapshot.merge(user_data)
+                await self._resolve_group_schedules([snapshot])
+                return snapshot
+            # Строка изменилась между запросами - перечитываем все запрошенные колонки
+            user_data = await self.get_user_data_by_uid(uid, columns)
+
+        if not user_data:
+            self._snapshots.invalidate(uid)
             return None
 
-    def get_schedule_by_uid(self, uid: str):
+        snapshot = UserSnapshot(uid, user_data)
+        await self._resolve_group_schedules([snapshot])
+        self._snapshots.set(uid, snapshot)
+        return snapshot
+
+    def _persist_snapshot(self, snapshot):
+        """Сохраняет снимок в локальный кэш (в фоне, только новую версию или новые колонки)"""
+        if snapshot is not None and self._local is not None and not snapshot.needs_group_schedule:
+            self._local.save(
+                "user_data:" + snapshot.uid, (snapshot.version, len(snapshot.row)), snapshot.self_contained_row
+            )
+
+    def _mark_stale(self, age: float, source: str):
+        mark_stale(age, source)
+        STALE_RESPONSES.labels(source).inc()
+
+    async def _stale_snapshot(self, uid: str, columns):
+        """Последний известный снимок с нужными колонками, пока БД недоступна.
+
+        Сначала истекший снимок из памяти, затем строка из локального кэша.
+        Ответ помечается как устаревший (заголовки ставит StaleMarkerMiddleware).
+        Снимок из локального кэша не кладется в LRU-кэш: после восстановления БД
+        следующий запрос прочитает свежие данные. None - данных нет ни там, ни там.
+        """
+        snapshot, _ = self._snapshots.get_entry(uid)
+        source = "memory"
+        if snapshot is None or snapshot.missing_columns(columns) or snapshot.needs_group_schedule:
+            entry = await self._local.get("user_data:" + uid) if self._local is not None else None
+            if entry is None:
+                return None
+            row, saved_at = entry
+            snapshot = UserSnapshot(uid, row)
+            snapshot.fetched_at = saved_at
+            if snapshot.needs_group_schedule:
+                cached = self._group_schedules.get(snapshot.schedule_ref)
+                if cached is not None:
+                    snapshot.attach_group_schedule(cached)
+            if snapshot.missing_columns(columns) or snapshot.needs_group_schedule:
+                # Неполные данные выглядели бы как пустое расписание - лучше честная ошибка
+                return None
+            source = "local"
+        age = time.time() - snapshot.fetched_at
+        self._mark_stale(age, source)
+        logger.warning("Serving stale user data", extra={"uid": uid, "source": source, "age": round(age, 1)})
+        return snapshot
+
+    async def _fetch_group_schedules(self, hashes: list) -> list:
+        client = await self._get_client()
+        try:
+            response = await self._execute(
+                client.table(GROUP_SCHEDULES_TABLE).select("hash,schedule").in_("hash", hashes),
+                GROUP_SCHEDULES_TABLE, "select"
+            )
+            return response.data or []
+        except Exception as e:
+            # Ошибки не глотаются: пустой ответ выглядел бы как отсутствие данных
+            logger.error("Error getting group schedules: %s", e, extra={"hashes_count": len(hashes)})
+            raise
+
+    async def _resolve_group_schedules(self, snapshots):
+        """Подключает к снимкам общие расписания групп по week_schedule_ref.
+
+        Одна запись кэша (и один скомпилированный индекс) обслуживает всех
+        студентов группы; из БД догружаются только хэши, которых нет в кэше.
+        """
+        pending = {}
+        for snapshot in snapshots:
+            if snapshot is None or not snapshot.needs_group_schedule:
+                continue
+            cached = self._group_schedules.get(snapshot.schedule_ref)
+            if cached is not None:
+                snapshot.attach_group_schedule(cached)
+            else:
+                pending.setdefault(snapshot.schedule_ref, []).append(snapshot)
+        if not pending:
+            return
+
+        hashes = list(pending)
+        chunks = [hashes[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(hashes), BATCH_CHUNK_SIZE)]
+        for rows in await asyncio.gather(*(self._fetch_group_schedules(chunk) for chunk in chunks)):
+            for row in rows:
+                group_schedule = GroupSchedule(row["hash"], row.get("schedule"))
+                self._group_schedules.set(row["hash"], group_schedule)
+                for snapshot in pending.pop(row["hash"], ()):
+                    snapshot.attach_group_schedule(group_schedule)
+        if pending:
+            logger.warning("Group schedules not found", extra={"hashes": list(pending)})
+
+    async def _store_group_schedule(self, digest: str, week_schedule: dict):
+        """Сохраняет общее расписание, если его еще нет (строки с таким хэшем неизменяемы)"""
+        if self._group_schedules.get(digest) is not None:
+            return
+        client = await self._get_client()
+        await self._execute(
+            client.table(GROUP_SCHEDULES_TABLE).upsert(
+                group_schedule_row(digest, week_schedule), on_conflict="hash", ignore_duplicates=True
+            ),
+            GROUP_SCHEDULES_TABLE, "upsert"
+        )
+        self._group_schedules.set(digest, GroupSchedule(digest, week_schedule))
+
+    async def prune_group_schedules(self, keep_days: int) -> int:
+        """Удаляет общие расписания старше keep_days без ссылок из user_data (миграция 003)"""
+        client = await self._get_client()
+        response = await self._execute(
+            client.rpc("prune_group_schedules", {"keep_days": keep_days}), GROUP_SCHEDULES_TABLE, "prune"
+        )
+        return response.data or 0
+
+    async def _fetch_user_data_chunk(self, uids: list, columns) -> list:
+        """Строки user_data для группы UID одним запросом с фильтром in"""
+        select = ",".join(("user_id",) + VERSION_COLUMNS + tuple(columns))
+        client = await self._get_client()
+        try:
+            response = await self._execute(
+                client.table("user_data").select(select).in_("user_id", uids),
+                "user_data", "select_batch"
+            )
+            return response.data or []
+        except Exception as e:
+            # Ошибки не глотаются: пустой ответ выглядел бы как отсутствие данных
+            logger.error("Error getting user data batch: %s", e, extra={"uids_count": len(uids)})
+            raise
+
+    async def get_section_stamps(self, uids: list) -> dict:
+        """Отметки времени разделов и section_hashes по списку UID, без JSON-колонок разделов"""
+        select = ",".join(("user_id",) + VERSION_COLUMNS + (SECTION_HASHES_COLUMN,))
+        client = await self._get_client()
+        chunks = [uids[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(uids), BATCH_CHUNK_SIZE)]
+        responses = await asyncio.gather(*(
+            self._execute(client.table("user_data").select(select).in_("user_id", chunk), "user_data", "select_stamps")
+            for chunk in chunks
+        ))
+        return {row["user_id"]: row for response in responses for row in response.data or []}
+
+    async def get_user_snapshots(self, uids: list, columns=USER_DATA_COLUMNS) -> dict:
+        """Снимки для списка UID: {uid: UserSnapshot | None}.
+
+        Свежие снимки с нужными колонками берутся из кэша, остальные
+        загружаются пачками по BATCH_CHUNK_SIZE параллельными запросами.
+        UID из пачек, не загруженных из-за недоступности БД и без последнего
+        известного снимка, в результат не попадают (None - строки нет).
+        """
+        columns = tuple(dict.fromkeys(columns))
+        result = {}
+        to_fetch = []
+        for uid in dict.fromkeys(uids):
+            snapshot = self._snapshots.get(uid)
+            if snapshot is not None and not snapshot.missing_columns(columns):
+                result[uid] = snapshot
+            else:
+                to_fetch.append(uid)
+
+        chunks = [to_fetch[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(to_fetch), BATCH_CHUNK_SIZE)]
+        rows_by_chunk = await asyncio.gather(
+            *(self._fetch_user_data_chunk(chunk, columns) for chunk in chunks), return_exceptions=True
+        )
+
+        unavailable = set()
+        for chunk, rows in zip(chunks, rows_by_chunk):
+            if isinstance(rows, DataUnavailableError):
+                unavailable.update(chunk)
+                continue
+            if isinstance(rows, BaseException):
+                raise rows
+            for row in rows:
+                uid = row["user_id"]
+                cached = self._snapshots.get(uid)
+                if cached is not None and cached.version == row_version(row):
+                    cached.merge(row)
+                    snapshot = cached
+                else:
+                    snapshot = UserSnapshot(uid, row)
+                self._snapshots.set(uid, snapshot)
+                result[uid] = snapshot
+        fetched = [result[uid] for uid in to_fetch if uid in result]
+        await self._resolve_group_schedules(list(result.values()))
+        for snapshot in fetched:
+            self._persist_snapshot(snapshot)
+
+        for uid in unavailable:
+            # Часть пачки не загрузилась: для каждого UID - последний известный снимок
+            snapshot = await self._stale_snapshot(uid, columns)
+            if snapshot is not None:
+                result[uid] = snapshot
+        if unavailable and not result:
+            raise DataUnavailableError("user_data unavailable", retry_after=self._breaker.retry_after())
+
+        for uid in to_fetch:
+            if uid not in unavailable:
+                result.setdefault(uid, None)
+        logger.info(
+            "Fetched user_data batch",
+            extra={"uids_count": len(result), "fetched": len(to_fetch), "chunks": len(chunks)}
+        )
+        return result
+
+    async def iter_user_data_pages(self, columns=USER_DATA_COLUMNS, page_size: int = 500):
+        """Обход всей таблицы user_data страницами (keyset по user_id).
+
+        Снимки не кладутся в кэш: полный обход вытеснил бы горячие записи.
+        """
+        select = ",".join(("user_id",) + VERSION_COLUMNS + tuple(dict.fromkeys(columns)))
+        client = await self._get_client()
+        last_uid = None
+        while True:
+            query = client.table("user_data").select(select).order("user_id").limit(page_size)
+            if last_uid is not None:
+                query = query.gt("user_id", last_uid)
+            response = await self._execute(query, "user_data", "select_page")
+            rows = response.data or []
+            if rows:
+                snapshots = [UserSnapshot(row["user_id"], row) for row in rows]
+                await self._resolve_group_schedules(snapshots)
+                yield snapshots
+            if len(rows) < page_size:
+                return
+            last_uid = rows[-1]["user_id"]
+
+    async def get_users_batch_by_uids(self, uids: list, fields: list) -> dict:
+        """Данные по списку UID за один проход: {uid: {поле: значение} | None}"""
+        columns = tuple(column for field in fields for column in BATCH_FIELDS[field][0])
+        snapshots = await self.get_user_snapshots(uids, columns)
+        return {
+            uid: {field: BATCH_FIELDS[field][1](snapshot) for field in fields} if snapshot else None
+            for uid, snapshot in snapshots.items()
+        }
+
+    async def get_user_version(self, uid: str):
+        """Версия строки user_data без загрузки JSON-колонок.
+
+        Берется из свежего снимка в кэше, иначе - легким запросом колонок версии.
+        """
+        snapshot, expired = self._snapshots.get_entry(uid)
+        if snapshot is not None and not expired:
+            return snapshot.version
+
+        version = await self._fetch_user_version(uid)
+        if snapshot is not None:
+            if version == snapshot.version:
+                self._snapshots.touch(uid)
+            else:
+                self._snapshots.invalidate(uid)
+        return version
+
+    async def save_user_data(self, uid: str, data: dict):
+        """Обновляем колонки user_data пользователя (создаем строку, если ее нет)"""
+        client = await self._get_client()
+        try:
+            response = await self._execute(
+                client.table("user_data").update(data).eq("user_id", uid), "user_data", "update"
+            )
+            if not response.data:
+                response = await self._execute(
+                    client.table("user_data").insert({"user_id": uid, **data}), "user_data", "insert"
+                )
+            return response.data[0] if response.data else None
+        finally:
+            self.invalidate_user(uid)
+
+    async def _fetch_section_state(self, uid: str, sections) -> dict:
+        """section_hashes и колонки отметок времени разделов; {} - строки user_data еще нет"""
+        stamp_columns = tuple(dict.fromkeys(section_stamp_column(section) for section in sections))
+        client = await self._get_client()
+        response = await self._execute(
+            client.table("user_data").select(",".join((SECTION_HASHES_COLUMN,) + stamp_columns)).eq("user_id", uid),
+            "user_data", "select_hashes"
+        )
+        return response.data[0] if response.data else {}
+
+    async def save_user_sections(self, uid: str, sections: dict) -> list:
+        """Записываем только изменившиеся разделы.
+
+        sections - {раздел: колонки user_data для записи}, содержимое раздела
+        берется из его основной колонки (SECTION_COLUMNS). Неизменившиеся
+        разделы не пишутся и не сдвигают отметки времени; по каждому
+        изменившемуся публикуется SectionChange. Возвращает список изменившихся.
+        """
+        # Чтение-изменение-запись section_hashes не атомарно: параллельные
+        # синхронизации одного UID исключает оркестратор (одна задача на UID)
+        state = await self._fetch_section_state(uid, SECTION_COLUMNS)
+        hashes = state.get(SECTION_HASHES_COLUMN) or {}
+        changed = {}
+        data = {}
+        for section, columns in sections.items():
+            digest = section_hash(section, columns[SECTION_COLUMNS[section]])
+            if trusted_section_hash(state, section) == digest:
+                continue
+            changed[section] = digest
+            data.update(columns)
+
+        schedule = data.get("week_schedule") if "schedule" in changed else None
+        if isinstance(schedule, dict) and not SCHEDULE_INLINE_COPY:
+            # Расписание группы хранится один раз, в строке пользователя - только ссылка
+            await self._store_group_schedule(changed["schedule"], schedule)
+            data[WEEK_SCHEDULE_REF_COLUMN] = changed["schedule"]
+            data["week_schedule"] = None
+        elif "schedule" in changed:
+            # Расписание в строке; старая ссылка не должна удерживать строку group_schedules от очистки
+            data[WEEK_SCHEDULE_REF_COLUMN] = None
+
+        if not changed:
+            logger.debug("User data unchanged", extra={"uid": uid, "sections": list(sections)})
+            return []
+
+        new_hashes = dict(hashes)
+        for section in SECTION_COLUMNS:
+            stamp_column = section_stamp_column(section)
+            if section in changed:
+                new_hashes[section] = {
+                    "hash": changed[section], "stamp": data.get(stamp_column, state.get(stamp_column))
+                }
+            elif stamp_column in data and trusted_section_hash(state, section) is not None:
+                # Эта запись сдвигает и отметку неизменившегося раздела (общий updated_at):
+                # его хэш остается верным, переносим отметку
+                new_hashes[section] = {**hashes[section], "stamp": data[stamp_column]}
+        data[SECTION_HASHES_COLUMN] = new_hashes
+        await self.save_user_data(uid, data)
+
+        for section, digest in changed.items():
+            # Время изменения - отметка раздела: по ней поток событий отличает эту запись
+            # от той же, замеченной опросом версий строк (services/event_poller.py)
+            changed_at = data.get(section_stamp_column(section)) or data.get("updated_at") or datetime.now().isoformat()
+            user_data_events.publish(SectionChange(uid, section, digest, changed_at))
+        logger.info("User data sections updated", extra={"uid": uid, "sections": list(changed)})
+        return list(changed)
+
+    def invalidate_user(self, uid: str):
+        """Сбрасываем кэшированный снимок пользователя (например, после записи)"""
+        self._snapshots.invalidate(uid)
+        # Чтения, начатые до записи, не должны отдавать старые данные новым вызовам
+        self._flights.forget(lambda key: key[1] == uid)
+
+    def cache_stats(self) -> dict:
+        return self._snapshots.stats()
+
+    async def get_schedule_by_uid(self, uid: str):
         """Получаем расписание пользователя по UID из поля week_schedule"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data and 'week_schedule' in user_data:
-            schedule = user_data['week_schedule']
+        snapshot = await self.get_user_snapshot(uid, WEEK_SCHEDULE_COLUMNS)
+        return self._schedule_from_snapshot(snapshot)
+
+    def _schedule_from_snapshot(self, snapshot):
+        if snapshot and 'week_schedule' in snapshot.row:
+            schedule = snapshot.week_schedule
             
             if isinstance(schedule, dict) and 'days' in schedule:
-                print(f"✅ Found week_schedule with {len(schedule['days'])} days for UID: {uid}")
-                return schedule
-            elif schedule is None:
-                schedule = {}
-            else:
-                print(f"✅ Found week_schedule as {type(schedule).__name__} for UID: {uid}")
+                logger.debug("Found week_schedule with %d days", len(schedule['days']), extra={"uid": snapshot.uid})
+            elif schedule:
+                logger.debug("Found week_schedule as %s", type(schedule).__name__, extra={"uid": snapshot.uid})
             
             return schedule
-        print(f"❌ No week_schedule found for UID: {uid}")
+        logger.debug("No week_schedule found")
         return {}
 
-    def get_today_schedule_by_uid(self, uid: str):
-            """Получаем расписание на сегодня из колонки today_schedule с метаданными внутри JSON"""
-            user_data = self.get_user_data_by_uid(uid)
-    
-            # Базовый результат на случай отсутствия данных
-            base_result = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "date_dd_mm": datetime.now().strftime("%d.%m"),
-                "day_name": ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс'][datetime.now().weekday()],
-                "day_of_week": datetime.now().weekday(),
-                "schedule": [],
-                "has_schedule": False
-            }
-    
-            if user_data and 'today_schedule' in user_data:
-                today_schedule = user_data['today_schedule']
-        
-                # Проверяем, что today_schedule не None и содержит данные
-                if today_schedule is not None and isinstance(today_schedule, dict):
-                    # Извлекаем метаданные из today_schedule
-                    metadata = today_schedule.get('metadata', {})
-                
-                    print(f"📅 Метаданные из today_schedule: неделя {metadata.get('week_number')}, четная: {metadata.get('is_even_week')}")
-                
-                    # Форматируем результат с метаданными
-                    result = {
-                        "date": today_schedule.get('date', base_result['date']),
-                        "date_dd_mm": today_schedule.get('date_dd_mm', base_result['date_dd_mm']),
-                        "day_name": today_schedule.get('day_name', base_result['day_name']),
-                        "day_of_week": today_schedule.get('day_of_week', base_result['day_of_week']),
-                        "schedule": today_schedule.get('schedule', []),
-                        "has_schedule": today_schedule.get('has_schedule', False),
-                        "metadata": metadata
-                    }
-                
-                    print(f"✅ Found today_schedule with {len(result['schedule'])} classes for UID: {uid}")
-                    return result
-                else:
-                    print(f"⚠️ today_schedule is None or not a dict for UID: {uid}")
-    
-            print(f"❌ No valid today_schedule found for UID: {uid}")
-            return base_result
-
-    def get_tomorrow_schedule_by_uid(self, uid: str):
-        """Получаем расписание на завтра из week_schedule"""
-        schedule = self.get_schedule_by_uid(uid)
-        return self._extract_day_schedule(schedule, 1)  # Завтра
-
-    def get_yesterday_schedule_by_uid(self, uid: str):
-        """Получаем расписание на вчера из week_schedule"""
-        schedule = self.get_schedule_by_uid(uid)
-        return self._extract_day_schedule(schedule, -1)  # Вчера
-
-    def _extract_day_schedule(self, schedule, day_offset: int):
-        """Извлекаем расписание для конкретного дня из week_schedule по полю date"""
-        # Определяем целевую дату
-        target_date = datetime.now() + timedelta(days=day_offset)
-        
-        # Форматируем дату в формате "день.месяц" (например: "10.11")
-        target_date_str = target_date.strftime("%d.%m")
-        
-        # Русские названия дней недели
-        day_names = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
-        day_name = day_names[target_date.weekday()]
-        
-        # Базовый результат
-        result = {
-            "date": target_date.strftime("%Y-%m-%d"),
-            "date_dd_mm": target_date_str,
-            "day_name": day_name,
-            "day_of_week": target_date.weekday(),
-            "schedule": []
-        }
-        
-        if not schedule or not isinstance(schedule, dict) or 'days' not in schedule:
-            return result
-        
-        days_list = schedule.get('days', [])
-        
-        # Ищем день с нужной датой
-        for day_data in days_list:
-            if isinstance(day_data, dict) and day_data.get('date') == target_date_str:
-                # Нашли нужный день!
-                classes = day_data.get('classes', [])
-                
-                # Форматируем занятия для единообразия
-                formatted_classes = []
-                for class_item in classes:
-                    if isinstance(class_item, dict):
-                        formatted_class = {
-                            "type": class_item.get('type', ''),
-                            "group": class_item.get('group', ''),
-                            "subject": class_item.get('subject', ''),
-                            "teacher": class_item.get('teacher', ''),
-                            "building": class_item.get('building', ''),
-                            "location": class_item.get('location', ''),
-                            "timeRange": class_item.get('timeRange', ''),
-                            "pairNumber": class_item.get('pairNumber', ''),
-                            "teacherInfo": class_item.get('teacherInfo', '')
-                        }
-                        formatted_classes.append(formatted_class)
-                
-                result["schedule"] = formatted_classes
-                result["order"] = day_data.get('order')
-                result["fullDate"] = day_data.get('fullDate')
-                print(f"✅ Found {len(formatted_classes)} classes for date {target_date_str}")
-                return result
-        
-        print(f"❌ No schedule found for date {target_date_str}")
+    async def get_schedule_index_by_uid(self, uid: str) -> ScheduleIndex:
+        """Индекс расписания по датам из week_schedule и today_schedule"""
+        snapshot = await self.get_user_snapshot(uid, WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS)
+        if not snapshot:
+            logger.debug("No schedule found", extra={"uid": uid})
+            return ScheduleIndex()
+        return snapshot.schedule_index
+
+    async def get_day_schedule_by_uid(self, uid: str, day_offset: int):
+        """Расписание на день со смещением от сегодняшнего"""
+        schedule_index = await self.get_schedule_index_by_uid(uid)
+        result = schedule_index.day_by_offset(day_offset)
+        logger.debug("Found %d classes for date %s", len(result['schedule']), result['date_dd_mm'], extra={"uid": uid})
         return result
 
-    def get_schedule_week_by_uid(self, uid: str, week: int = None):
+    async def get_today_schedule_by_uid(self, uid: str):
+        """Получаем расписание на сегодня"""
+        return await self.get_day_schedule_by_uid(uid, 0)
+
+    async def get_tomorrow_schedule_by_uid(self, uid: str):
+        """Получаем расписание на завтра"""
+        return await self.get_day_schedule_by_uid(uid, 1)
+
+    async def get_yesterday_schedule_by_uid(self, uid: str):
+        """Получаем расписание на вчера"""
+        return await self.get_day_schedule_by_uid(uid, -1)
+
+    async def get_schedule_range_by_uid(self, uid: str, date_from: date, date_to: date):
+        """Получаем расписание на каждый день диапазона из одного снимка"""
+        schedule_index = await self.get_schedule_index_by_uid(uid)
+        return schedule_index.range(date_from, date_to)
+
+    async def get_schedule_week_by_uid(self, uid: str, week: int = None):
         """Получаем недельное расписание пользователя из week_schedule"""
-        schedule = self.get_schedule_by_uid(uid)
+        schedule = await self.get_schedule_by_uid(uid)
         
         if not schedule or not isinstance(schedule, dict):
             return {}
@@ -199,143 +714,125 @@ class SupabaseClient:
             "metadata": schedule.get('metadata', {})
         }
 
-    def get_extra_classes_by_uid(self, uid: str):
+    async def get_extra_classes_by_uid(self, uid: str):
         """Получаем дополнительные занятия из week_schedule"""
-        schedule = self.get_schedule_by_uid(uid)
-        
-        if not schedule or not isinstance(schedule, dict):
-            return []
-        
-        extra_classes = schedule.get('extraClasses', [])
-        
-        # Форматируем дополнительные занятия
-        formatted_extra_classes = []
-        for class_item in extra_classes:
-            if isinstance(class_item, dict):
-                formatted_class = {
-                    "type": class_item.get('type', ''),
-                    "group": class_item.get('group', ''),
-                    "subject": class_item.get('subject', ''),
-                    "teacher": class_item.get('teacher', ''),
-                    "building": class_item.get('building', ''),
-                    "location": class_item.get('location', ''),
-                    "teacherInfo": class_item.get('teacherInfo', '')
-                }
-                formatted_extra_classes.append(formatted_class)
-        
-        print(f"✅ Found {len(formatted_extra_classes)} extra classes for UID: {uid}")
-        return formatted_extra_classes
+        snapshot = await self.get_user_snapshot(uid, WEEK_SCHEDULE_COLUMNS)
+        extra_classes = snapshot.extra_classes if snapshot else []
+        logger.debug("Found %d extra classes", len(extra_classes), extra={"uid": uid})
+        return extra_classes
 
-    def get_tasks_by_uid(self, uid: str):
+    async def get_tasks_by_uid(self, uid: str):
         """Получаем задачи пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data and 'tasks' in user_data:
-            tasks = user_data['tasks']
-            if tasks is None:
-                tasks = []
-            elif not isinstance(tasks, list):
-                tasks = [tasks]
-            print(f"✅ Found {len(tasks)} tasks for UID: {uid}")
+        snapshot = await self.get_user_snapshot(uid, TASKS_COLUMNS)
+        if snapshot and 'tasks' in snapshot.row:
+            tasks = snapshot.tasks
+            logger.debug("Found %d tasks", len(tasks), extra={"uid": uid})
             return tasks
-        print(f"❌ No tasks found for UID: {uid}")
+        logger.debug("No tasks found", extra={"uid": uid})
         return []
 
-    def get_profile_by_uid(self, uid: str):
+    async def get_profile_by_uid(self, uid: str):
         """Получаем профиль пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data:
-            profile = user_data.get('profile', {})
-            if profile is None:
-                profile = {}
-            print(f"✅ Found profile for UID: {uid}")
-            return profile
-        print(f"❌ No profile found for UID: {uid}")
+        snapshot = await self.get_user_snapshot(uid, PROFILE_COLUMNS)
+        if snapshot:
+            logger.debug("Found profile", extra={"uid": uid})
+            return snapshot.profile
+        logger.debug("No profile found", extra={"uid": uid})
         return {}
 
-    def get_marks_by_uid(self, uid: str):
+    async def get_marks_by_uid(self, uid: str):
         """Получаем оценки пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data and 'marks' in user_data:
-            marks = user_data['marks']
-            if marks is None:
-                marks = []
-            elif not isinstance(marks, list):
-                marks = [marks]
-            print(f"✅ Found {len(marks)} marks for UID: {uid}")
+        snapshot = await self.get_user_snapshot(uid, MARKS_COLUMNS)
+        if snapshot and 'marks' in snapshot.row:
+            marks = snapshot.marks
+            logger.debug("Found %d marks", len(marks), extra={"uid": uid})
             return marks
-        print(f"❌ No marks found for UID: {uid}")
+        logger.debug("No marks found", extra={"uid": uid})
         return []
 
-    def get_reports_by_uid(self, uid: str):
+    async def get_reports_by_uid(self, uid: str):
         """Получаем отчеты пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data and 'reports' in user_data:
-            reports = user_data['reports']
-            if reports is None:
-                reports = []
-            elif not isinstance(reports, list):
-                reports = [reports]
-            print(f"✅ Found {len(reports)} reports for UID: {uid}")
+        snapshot = await self.get_user_snapshot(uid, REPORTS_COLUMNS)
+        if snapshot and 'reports' in snapshot.row:
+            reports = snapshot.reports
+            logger.debug("Found %d reports", len(reports), extra={"uid": uid})
             return reports
-        print(f"❌ No reports found for UID: {uid}")
+        logger.debug("No reports found", extra={"uid": uid})
         return []
 
-    def get_materials_by_uid(self, uid: str):
+    async def get_materials_by_uid(self, uid: str):
         """Получаем материалы пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if user_data and 'materials' in user_data:
-            materials = user_data['materials']
-            if materials is None:
-                materials = []
-            elif not isinstance(materials, list):
-                materials = [materials]
-            print(f"✅ Found {len(materials)} materials for UID: {uid}")
+        snapshot = await self.get_user_snapshot(uid, MATERIALS_COLUMNS)
+        if snapshot and 'materials' in snapshot.row:
+            materials = snapshot.materials
+            logger.debug("Found %d materials", len(materials), extra={"uid": uid})
             return materials
-        print(f"❌ No materials found for UID: {uid}")
+        logger.debug("No materials found", extra={"uid": uid})
         return []
 
-    def get_all_user_data_by_uid(self, uid: str):
-        """Получаем все данные пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if not user_data:
+    async def get_list_page_by_uid(self, uid: str, kind: str, **query) -> dict:
+        """Страница задач, оценок или отчетов с фильтрами и сортировкой (см. ListIndex.query)"""
+        snapshot = await self.get_user_snapshot(uid, (kind,))
+        if not snapshot:
+            logger.debug("No %s found", kind, extra={"uid": uid})
+            return {"items": [], "next_cursor": None, "total": 0}
+        return snapshot.list_index(kind).query(**query)
+
+    async def search_user_data_by_uid(self, uid: str, query: str, kinds=None, limit: int = 20) -> list:
+        """Поиск по задачам, отчетам и материалам пользователя"""
+        snapshot = await self.get_user_snapshot(uid, TASKS_COLUMNS + REPORTS_COLUMNS + MATERIALS_COLUMNS)
+        if not snapshot:
+            return []
+        return snapshot.search_index.search(query, kinds, limit)
+
+    async def get_all_user_data_by_uid(self, uid: str):
+        """Получаем все данные пользователя по UID (одним запросом к user_data)"""
+        snapshot = await self.get_user_snapshot(uid)
+        if not snapshot:
             return {}
         
-        # Собираем все данные в одну структуру
+        schedule_index = snapshot.schedule_index
+        
+        # Собираем все данные в одну структуру из одного снимка
         comprehensive_data = {
             "uid": uid,
-            "profile": self.get_profile_by_uid(uid),
-            "tasks": self.get_tasks_by_uid(uid),
-            "schedule": self.get_schedule_by_uid(uid),
-            "marks": self.get_marks_by_uid(uid),
-            "reports": self.get_reports_by_uid(uid),
-            "materials": self.get_materials_by_uid(uid),
-            "extra_classes": self.get_extra_classes_by_uid(uid),
-            "today_schedule": self.get_today_schedule_by_uid(uid),
-            "tomorrow_schedule": self.get_tomorrow_schedule_by_uid(uid),
-            "yesterday_schedule": self.get_yesterday_schedule_by_uid(uid)
+            "profile": snapshot.profile,
+            "tasks": snapshot.tasks,
+            "schedule": self._schedule_from_snapshot(snapshot),
+            "marks": snapshot.marks,
+            "reports": snapshot.reports,
+            "materials": snapshot.materials,
+            "extra_classes": snapshot.extra_classes,
+            "today_schedule": schedule_index.day_by_offset(0),
+            "tomorrow_schedule": schedule_index.day_by_offset(1),
+            "yesterday_schedule": schedule_index.day_by_offset(-1)
         }
         
         return comprehensive_data
 
-    def get_user_stats_by_uid(self, uid: str):
+    async def get_user_stats_by_uid(self, uid: str):
         """Получаем статистику пользователя по UID"""
-        user_data = self.get_user_data_by_uid(uid)
-        if not user_data:
+        snapshot = await self.get_user_snapshot(
+            uid,
+            PROFILE_COLUMNS + TASKS_COLUMNS + MARKS_COLUMNS + REPORTS_COLUMNS
+            + MATERIALS_COLUMNS + WEEK_SCHEDULE_COLUMNS
+        )
+        if not snapshot:
             return {}
         
-        schedule = self.get_schedule_by_uid(uid)
+        schedule = snapshot.week_schedule
         days_count = len(schedule.get('days', [])) if isinstance(schedule, dict) else 0
         
         return {
             "uid": uid,
-            "tasks_count": len(self.get_tasks_by_uid(uid)),
-            "reports_count": len(self.get_reports_by_uid(uid)),
-            "marks_count": len(self.get_marks_by_uid(uid)),
-            "materials_count": len(self.get_materials_by_uid(uid)),
+            "tasks_count": len(snapshot.tasks),
+            "reports_count": len(snapshot.reports),
+            "marks_count": len(snapshot.marks),
+            "materials_count": len(snapshot.materials),
             "schedule_days_count": days_count,
-            "extra_classes_count": len(self.get_extra_classes_by_uid(uid)),
-            "has_profile": bool(self.get_profile_by_uid(uid)),
-            "last_updated": user_data.get('updated_at')
+            "extra_classes_count": len(snapshot.extra_classes),
+            "has_profile": bool(snapshot.profile),
+            "last_updated": snapshot.updated_at
         }
 
 # Создаем глобальный экземпляр клиента
@@ -1,25 +1,92 @@
 from dotenv import load_dotenv
 from pathlib import Path
+import logging
 import os
 
 # Загружаем .env ПЕРВОЙ СТРОКОЙ
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
-print(f"Environment loaded from: {env_path}")
+from utils.logger import setup_logging, shutdown_logging
 
-from fastapi import FastAPI
+setup_logging()
+logger = logging.getLogger(__name__)
+logger.info("Environment loaded from: %s", env_path)
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 # Импорты
-from routes import tasks, sync, announcements, auth, schedule, users, faculties, rooms, teachers, profile, marks, reports
-from db.supabase_client import supabase_client
+from routes import tasks, sync, announcements, auth, schedule, users, faculties, rooms, teachers, profile, marks, reports, search, health, events
+from db.supabase_client import supabase_client, DataUnavailableError
+from services.scraping_service import sync_orchestrator
+from services.directory_service import directory_service
+from services.retention_service import group_schedule_retention
+from services.event_poller import row_version_poller
+from utils.responses import FastJSONResponse
+from utils.metrics import MetricsMiddleware, metrics_response
+from utils.staleness import StaleMarkerMiddleware
+
+# Прогрев справочников преподавателей и аудиторий в фоне после старта
+DIRECTORY_WARMUP = os.getenv("DIRECTORY_WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Клиент создается без сетевых запросов; ошибка конфигурации не мешает старту -
+    # ее покажет проба готовности
+    try:
+        await supabase_client.connect()
+    except Exception as e:
+        logger.error("Supabase client init failed: %s", e)
+    health.health_checker.start()
+    group_schedule_retention.start()
+    row_version_poller.start()
+    warmup = asyncio.create_task(directory_service.ensure_ready()) if DIRECTORY_WARMUP else None
+
+    yield
+
+    if warmup is not None:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+    await health.health_checker.stop()
+    await group_schedule_retention.stop()
+    await row_version_poller.stop()
+    await sync_orchestrator.stop()
+    await directory_service.stop()
+    # Закрываем общий пул HTTP-соединений к Supabase
+    await supabase_client.aclose()
+    shutdown_logging()
 
 app = FastAPI(
     title="Student Portal Backend API",
     description="API для работы с реальными данными из Supabase",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+# Сжимаем только ответы больше порога: мелкие JSON дешевле отдать как есть
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+if BrotliMiddleware is not None:
+    # brotli для клиентов с Accept-Encoding: br, иначе gzip
+    # Поток событий не сжимаем: сжатие буферизует события (gzip пропускает text/event-stream сам)
+    app.add_middleware(
+        BrotliMiddleware, quality=4, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True,
+        excluded_handlers=[r"^/events/?$"]
+    )
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=6)
+
+# Помечает заголовками ответы, собранные из устаревших данных при недоступной БД
+app.add_middleware(StaleMarkerMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +95,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Добавляется последним - внешний слой, измеряет полное время ответа (включая CORS и preflight)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(DataUnavailableError)
+async def data_unavailable_handler(request: Request, exc: DataUnavailableError):
+    """БД недоступна и в кэшах нет данных: 503 вместо зависания или пустого ответа"""
+    headers = {"Retry-After": str(max(1, round(exc.retry_after)))} if exc.retry_after else None
+    return FastJSONResponse(
+        {"detail": "Data temporarily unavailable, try again later"}, status_code=503, headers=headers
+    )
+
 # Подключаем только основные роуты
 app.include_router(tasks.router)
 app.include_router(sync.router)
@@ -41,6 +119,9 @@ app.include_router(teachers.router)
 app.include_router(profile.router)
 app.include_router(marks.router)
 app.include_router(reports.router)
+app.include_router(search.router)
+app.include_router(health.router)
+app.include_router(events.router)
 
 @app.get("/")
 async def root():
@@ -57,21 +138,7 @@ async def root():
         ]
     }
 
-@app.get("/health")
-async def health_check():
-    """Проверка здоровья сервиса и подключения к БД"""
-    try:
-        # Простая проверка - пытаемся получить данные
-        test_email = "test@example.com"
-        test_result = supabase_client.find_user_by_email(test_email)
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "service": "GUAP Backend API"
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        }
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return metrics_response()
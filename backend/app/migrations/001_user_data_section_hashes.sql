@@ -0,0 +1,4 @@
+-- Хэши содержимого разделов user_data ({"tasks": {"hash": "<sha1>", "stamp": "<tasks_updated_at>"}, ...}).
+-- Синхронизация сравнивает их с новыми данными и пишет только изменившиеся разделы;
+-- хэш учитывается, только пока отметка времени раздела в строке совпадает со stamp.
+ALTER TABLE user_data ADD COLUMN IF NOT EXISTS section_hashes jsonb NOT NULL DEFAULT '{}'::jsonb;
@@ -0,0 +1,15 @@
+-- Общие недельные расписания групп: одна строка на содержимое.
+-- hash - хэш раздела schedule (section_hash), поэтому одинаковые расписания
+-- студентов одной группы хранятся один раз; строки не изменяются.
+CREATE TABLE IF NOT EXISTS group_schedules (
+    hash text PRIMARY KEY,
+    group_name text,
+    year integer,
+    week_number integer,
+    schedule jsonb NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS group_schedules_group_week_idx ON group_schedules (group_name, year, week_number);
+
+-- Ссылка пользователя на общее расписание; week_schedule в такой строке пустой
+ALTER TABLE user_data ADD COLUMN IF NOT EXISTS week_schedule_ref text;
@@ -0,0 +1,19 @@
+-- Очистка group_schedules: расписание пишется заново на каждую неделю (номер
+-- недели входит в хэш), и без очистки таблица только растет.
+-- Удаляются строки старше keep_days, на которые не ссылается ни один пользователь.
+-- Порог по возрасту защищает только что сохраненное расписание, ссылка на
+-- которое еще не записана в user_data.
+CREATE INDEX IF NOT EXISTS user_data_week_schedule_ref_idx ON user_data (week_schedule_ref);
+
+CREATE OR REPLACE FUNCTION prune_group_schedules(keep_days integer DEFAULT 60)
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM group_schedules g
+        WHERE g.created_at < now() - make_interval(days => keep_days)
+          AND NOT EXISTS (SELECT 1 FROM user_data u WHERE u.week_schedule_ref = g.hash)
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM deleted;
+$$;
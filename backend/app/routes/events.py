@@ -0,0 +1,95 @@
+import asyncio
+import os
+from typing import Literal
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+import orjson
+from db.events import user_event_hub
+from services.event_poller import row_version_poller
+from utils.metrics import PUSH_SUBSCRIBERS
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Комментарий-пинг держит соединение через прокси и позволяет заметить отключение клиента
+HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT", "15"))
+# Через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = int(os.getenv("PUSH_RETRY_MS", "5000"))
+
+Section = Literal["profile", "tasks", "marks", "reports", "materials", "schedule"]
+
+
+def _sse(event: str, data: dict, event_id: int = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    uid: str = Query(..., description="UID пользователя"),
+    sections: list[Section] | None = Query(None, description="Разделы; по умолчанию все"),
+    last_event_id: str | None = Header(None, description="id последнего полученного события")
+):
+    """Поток изменений данных пользователя (Server-Sent Events).
+
+    Событие change приходит при изменении раздела user_data: раздел, хэш
+    нового содержимого и время изменения; id события возрастает и служит
+    Last-Event-ID при переподключении. Событие resync - часть событий
+    потеряна, данные нужно перечитать через REST.
+
+    Изменения приходят из записей этого процесса (синхронизация) и из опроса
+    версий строк раз в PUSH_POLL_INTERVAL секунд (записи миниаппа и других
+    реплик) - такие события приходят с задержкой до интервала опроса, а hash
+    у записей миниаппа равен null.
+    """
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+    if not user_event_hub.has_capacity():
+        raise HTTPException(status_code=503, detail="Слишком много открытых потоков, повторите позже")
+
+    async def stream():
+        # Подписка живет ровно столько, сколько генератор: если клиент отключится
+        # до первого чтения, finally все равно ее снимет
+        subscription = user_event_hub.subscribe(uid, sections, last_id)
+        if subscription is None:
+            # Места заняли между проверкой и стартом потока
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            return
+        PUSH_SUBSCRIBERS.inc()
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            yield _sse("ready", {"uid": uid, "sections": sections, "last_event_id": user_event_hub.stats()["last_event_id"]})
+            while True:
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield _sse("resync", {"uid": uid})
+                try:
+                    event_id, event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+                    continue
+                yield _sse("change", {
+                    "uid": event.uid,
+                    "section": event.section,
+                    "hash": event.hash,
+                    "changed_at": event.changed_at
+                }, event_id)
+        finally:
+            user_event_hub.unsubscribe(subscription)
+            PUSH_SUBSCRIBERS.dec()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Запрещаем буферизацию в nginx, иначе события приходят пачками
+        "X-Accel-Buffering": "no"
+    })
+
+
+@router.get("/stats")
+async def get_events_stats():
+    """Открытые потоки событий в этом процессе"""
+    return {"success": True, "stats": {**user_event_hub.stats(), "poller": row_version_poller.stats()}}
@@ -0,0 +1,45 @@
+import os
+from fastapi import APIRouter
+from db.supabase_client import supabase_client
+from utils.health import HealthChecker
+from utils.responses import FastJSONResponse
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+# Проверки запускает lifespan приложения; пробы только читают последний результат.
+# Пока в локальном кэше есть данные, недоступная БД не снимает готовность: сервис
+# отвечает устаревшими данными, а проверка служит пробным вызовом предохранителя.
+# С пустым кэшем отвечать нечем - такой экземпляр выводится из балансировки
+health_checker = HealthChecker(
+    {"database": supabase_client.ping},
+    interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "15")),
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT", "3")),
+    optional=lambda: ("database",) if supabase_client.has_local_data else ()
+)
+
+@router.get("")
+async def health_check():
+    """Проверка здоровья сервиса и подключения к БД (по последней фоновой проверке)"""
+    status = health_checker.status()
+    database = status["checks"].get("database")
+    if not status["ready"]:
+        state = "unhealthy"
+    else:
+        state = "degraded" if status["degraded"] else "healthy"
+    return {
+        "status": state,
+        "database": "connected" if database and database["ok"] else "disconnected",
+        "service": "GUAP Backend API",
+        "error": database["error"] if database else None
+    }
+
+@router.get("/live")
+async def liveness():
+    """Процесс жив и обслуживает запросы; зависимости не проверяются"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness():
+    """Готовность принимать трафик: 503, пока обязательная проверка не прошла или устарела"""
+    status = {**health_checker.status(), "circuit_breaker": supabase_client.breaker_stats()}
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
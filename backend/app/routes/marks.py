@@ -1,19 +1,43 @@
+from typing import Literal
 from fastapi import APIRouter, HTTPException, Query, Depends
-from db.dependencies import get_supabase_client
+from db.dependencies import get_supabase_client, check_user_data_etag
+from db.list_index import LIST_SPECS, InvalidCursor
 
-router = APIRouter(prefix="/marks", tags=["Marks"])
+router = APIRouter(
+    prefix="/marks",
+    tags=["Marks"],
+    dependencies=[Depends(check_user_data_etag)]
+)
 
 @router.get("/")
 async def get_marks(
     uid: str = Query(..., description="user_id пользователя"),
+    semester: list[int] | None = Query(None, description="Номер семестра (можно несколько)"),
+    subject: list[str] | None = Query(None, description="Предмет (можно несколько)"),
+    status: list[str] | None = Query(None, description="Статус контроля: graded, pending..."),
+    sort: str | None = Query(None, description=f"Поле сортировки: {', '.join(LIST_SPECS['marks'].sort_fields)}"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int | None = Query(None, ge=1, le=200, description="Размер страницы; без него - весь список"),
     db = Depends(get_supabase_client)
 ):
-    """Получение оценок пользователя по email"""
-    marks = db.get_marks_by_uid(uid) or []  # Если None, возвращаем пустой список
+    """Получение оценок пользователя с фильтрами и постраничной выдачей"""
+    if sort and sort not in LIST_SPECS["marks"].sort_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort}")
+    try:
+        page = await db.get_list_page_by_uid(
+            uid, "marks", status=status, subject=subject, semester=semester,
+            sort=sort, descending=order == "desc", cursor=cursor, limit=limit
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    marks = page["items"]
     
     return {
         "success": True,
         "marks": marks,
         "marks_count": len(marks),
+        "total": page.get("total"),
+        "next_cursor": page.get("next_cursor"),
         "user_id": uid
-    }
\ No newline at end of file
+    }
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-from db.dependencies import get_supabase_client
+from db.dependencies import get_supabase_client, check_user_data_etag
 
-router = APIRouter(prefix="/profile", tags=["Profile"])
+router = APIRouter(
+    prefix="/profile",
+    tags=["Profile"],
+    dependencies=[Depends(check_user_data_etag)]
+)
 
 @router.get("/")
 async def get_profile(
@@ -9,7 +13,7 @@ async def get_profile(
     db = Depends(get_supabase_client)
 ):
     """Получение профиля пользователя по UID"""
-    profile = db.get_profile_by_uid(uid)
+    profile = await db.get_profile_by_uid(uid)
     
     return {
         "success": True,
@@ -1,19 +1,45 @@
+from datetime import date
+from typing import Literal
 from fastapi import APIRouter, HTTPException, Query, Depends
-from db.dependencies import get_supabase_client
+from db.dependencies import get_supabase_client, check_user_data_etag
+from db.list_index import LIST_SPECS, InvalidCursor
 
-router = APIRouter(prefix="/reports", tags=["Reports"])
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"],
+    dependencies=[Depends(check_user_data_etag)]
+)
 
 @router.get("/")
 async def get_reports(
     uid: str = Query(..., description="user_id пользователя"),
+    status: list[str] | None = Query(None, description="Код статуса (можно несколько)"),
+    subject: list[str] | None = Query(None, description="Предмет (можно несколько)"),
+    date_from: date | None = Query(None, description="Загружен не раньше (YYYY-MM-DD)"),
+    date_to: date | None = Query(None, description="Загружен не позже (YYYY-MM-DD)"),
+    sort: str | None = Query(None, description=f"Поле сортировки: {', '.join(LIST_SPECS['reports'].sort_fields)}"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int | None = Query(None, ge=1, le=200, description="Размер страницы; без него - весь список"),
     db = Depends(get_supabase_client)
 ):
-    """Получение отчеты пользователя по email"""
-    reports = db.get_reports_by_uid(uid) or []  # Если None, возвращаем пустой список
+    """Получение отчетов пользователя с фильтрами и постраничной выдачей"""
+    if sort and sort not in LIST_SPECS["reports"].sort_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort}")
+    try:
+        page = await db.get_list_page_by_uid(
+            uid, "reports", status=status, subject=subject, date_from=date_from, date_to=date_to,
+            sort=sort, descending=order == "desc", cursor=cursor, limit=limit
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    reports = page["items"]
     
     return {
         "success": True,
         "reports": reports,
         "reports_count": len(reports),
+        "total": page.get("total"),
+        "next_cursor": page.get("next_cursor"),
         "user_id": uid
-    }
\ No newline at end of file
+    }
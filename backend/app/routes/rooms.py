@@ -1,18 +1,42 @@
-from fastapi import APIRouter, Query
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from services.directory_service import directory_service
 
 router = APIRouter(prefix="/rooms", tags=["Rooms"])
 
 @router.get("/")
-async def get_rooms(search: str | None = Query(None, description="Поиск по номеру или названию аудитории")):
-    # Возвращает список всех аудиторий, с возможностью поиска
+async def get_rooms(search: str | None = Query(None, max_length=100, description="Поиск по номеру или названию аудитории")):
+    # Возвращает список всех аудиторий из расписаний, с возможностью поиска
+    await directory_service.ensure_ready()
+    rooms = directory_service.rooms.all(search)
+    return {"success": True, "search": search, "rooms": rooms, "rooms_count": len(rooms)}
 
-    if search:
-        return {"message": f"Search results for room '{search}' (stub)"}
-    
-    return {"message": "Rooms endpoint (stub)"}
+@router.get("/free")
+async def get_free_rooms(
+    at: datetime | None = Query(None, description="Момент времени (ISO), по умолчанию - сейчас"),
+    duration: int = Query(1, ge=1, le=720, description="Сколько минут аудитория должна быть свободна"),
+    building: str | None = Query(None, description="Корпус")
+):
+    # Аудитории, в которых по расписаниям нет занятий в интервале [at, at + duration).
+    # estimated - расписаний на неделю этой четности нет, занятость взята из другой недели;
+    # known = false - расписаний нет совсем, свободные аудитории неизвестны
+    await directory_service.ensure_ready()
+    at = at or datetime.now()
+    free = directory_service.rooms.free(at, duration, building)
+    return {
+        "success": True,
+        "at": at.isoformat(),
+        "duration": duration,
+        "building": building,
+        **free,
+        "rooms_count": len(free["rooms"])
+    }
 
 @router.get("/{room_id}")
 async def get_room_by_id(room_id: str):
-    # Возвращает информацию об одной аудитории.
-
-    return {"message": f"Room {room_id} details (stub)"}
+    # Возвращает информацию об аудитории и ее занятость по дням недели
+    await directory_service.ensure_ready()
+    room = directory_service.rooms.get(room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Аудитория не найдена")
+    return {"success": True, "room": room.details()}
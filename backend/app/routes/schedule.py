@@ -1,7 +1,16 @@
+from datetime import date
 from fastapi import APIRouter, HTTPException, Query, Depends
-from db.dependencies import get_supabase_client
+from db.dependencies import get_supabase_client, check_user_data_etag
+from db.supabase_client import DataUnavailableError
 
-router = APIRouter(prefix="/schedule", tags=["Schedule"])
+router = APIRouter(
+    prefix="/schedule",
+    tags=["Schedule"],
+    dependencies=[Depends(check_user_data_etag)]
+)
+
+# Максимальная длина диапазона для /schedule/range (в днях)
+MAX_RANGE_DAYS = 62
 
 @router.get("/")
 async def get_schedule(
@@ -10,21 +19,51 @@ async def get_schedule(
 ):
     """Получение расписания на сегодня, вчера и завтра"""
     try:
-        today_schedule = db.get_today_schedule_by_uid(uid)
-        tomorrow_schedule = db.get_tomorrow_schedule_by_uid(uid)
-        yesterday_schedule = db.get_yesterday_schedule_by_uid(uid)
+        schedule_index = await db.get_schedule_index_by_uid(uid)
         
         return {
             "success": True,
             "uid": uid,
-            "today": today_schedule,
-            "tomorrow": tomorrow_schedule,
-            "yesterday": yesterday_schedule
+            "today": schedule_index.day_by_offset(0),
+            "tomorrow": schedule_index.day_by_offset(1),
+            "yesterday": schedule_index.day_by_offset(-1)
         }
         
+    except DataUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting schedule: {str(e)}")
 
+@router.get("/range")
+async def get_schedule_range(
+    uid: str = Query(..., description="UID пользователя"),
+    date_from: date = Query(..., alias="from", description="Первый день диапазона (YYYY-MM-DD)"),
+    date_to: date = Query(..., alias="to", description="Последний день диапазона (YYYY-MM-DD)"),
+    db = Depends(get_supabase_client)
+):
+    """Получение расписания на произвольный диапазон дат"""
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'")
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must not exceed {MAX_RANGE_DAYS} days")
+
+    try:
+        days = await db.get_schedule_range_by_uid(uid, date_from, date_to)
+        
+        return {
+            "success": True,
+            "uid": uid,
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat(),
+            "days": days,
+            "total_classes": sum(len(day["schedule"]) for day in days)
+        }
+        
+    except DataUnavailableError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting schedule range: {str(e)}")
+
 @router.get("/week")
 async def get_weekly_schedule(
     uid: str = Query(..., description="UID пользователя"),
@@ -33,7 +72,7 @@ async def get_weekly_schedule(
 ):
     """Получение недельного расписания"""
     try:
-        weekly_schedule = db.get_schedule_week_by_uid(uid, week)
+        weekly_schedule = await db.get_schedule_week_by_uid(uid, week)
         
         return {
             "success": True,
@@ -42,6 +81,8 @@ async def get_weekly_schedule(
             "schedule": weekly_schedule
         }
         
+    except DataUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting weekly schedule: {str(e)}")
 
@@ -52,7 +93,7 @@ async def get_today_schedule(
 ):
     """Получение расписания только на сегодня"""
     try:
-        today_schedule = db.get_today_schedule_by_uid(uid)
+        today_schedule = await db.get_today_schedule_by_uid(uid)
         
         return {
             "success": True,
@@ -60,6 +101,8 @@ async def get_today_schedule(
             "schedule": today_schedule
         }
         
+    except DataUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting today's schedule: {str(e)}")
 
@@ -70,7 +113,7 @@ async def get_tomorrow_schedule(
 ):
     """Получение расписания только на завтра"""
     try:
-        tomorrow_schedule = db.get_tomorrow_schedule_by_uid(uid)
+        tomorrow_schedule = await db.get_tomorrow_schedule_by_uid(uid)
         
         return {
             "success": True,
@@ -78,6 +121,8 @@ async def get_tomorrow_schedule(
             "schedule": tomorrow_schedule
         }
         
+    except DataUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting tomorrow's schedule: {str(e)}")
 
@@ -88,7 +133,7 @@ async def get_yesterday_schedule(
 ):
     """Получение расписания только на вчера"""
     try:
-        yesterday_schedule = db.get_yesterday_schedule_by_uid(uid)
+        yesterday_schedule = await db.get_yesterday_schedule_by_uid(uid)
         
         return {
             "success": True,
@@ -96,5 +141,7 @@ async def get_yesterday_schedule(
             "schedule": yesterday_schedule
         }
         
+    except DataUnavailableError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting yesterday's schedule: {str(e)}")
\ No newline at end of file
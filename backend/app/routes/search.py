@@ -0,0 +1,34 @@
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Query, Depends
+from db.dependencies import get_supabase_client, check_user_data_etag
+from db.supabase_client import DataUnavailableError
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"],
+    dependencies=[Depends(check_user_data_etag)]
+)
+
+@router.get("/")
+async def search(
+    uid: str = Query(..., description="UID пользователя"),
+    q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос"),
+    kind: list[Literal["tasks", "reports", "materials"]] | None = Query(None, description="Где искать"),
+    limit: int = Query(20, ge=1, le=100),
+    db = Depends(get_supabase_client)
+):
+    """Поиск по предметам, преподавателям, названиям задач и материалов пользователя"""
+    try:
+        results = await db.search_user_data_by_uid(uid, q, set(kind) if kind else None, limit)
+    except DataUnavailableError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching user data: {str(e)}")
+
+    return {
+        "success": True,
+        "uid": uid,
+        "query": q,
+        "results": results,
+        "results_count": len(results)
+    }
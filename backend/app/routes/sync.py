@@ -1,8 +1,59 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from services.scraping_service import sync_orchestrator, SECTIONS, PRIORITIES
 
 router = APIRouter(prefix="/sync", tags=["Sync"])
 
-@router.post("/")
-async def sync_data():
-    # Здесь потом будет логика синхронизации (например, скрапинг или обновление БД)
-    return {"status": "ok", "message": "Data synchronized successfully"}
\ No newline at end of file
+# Дольше ждать завершения синхронизации внутри HTTP-запроса не имеет смысла
+MAX_WAIT_SECONDS = 120
+
+
+class SyncRequest(BaseModel):
+    uid: str
+    username: str
+    password: str
+    sections: list[str] | None = None
+    priority: Literal["interactive", "background"] = "interactive"
+
+
+@router.post("/", status_code=202)
+async def sync_data(
+    request: SyncRequest,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Сколько секунд ждать завершения")
+):
+    """Ставит синхронизацию данных пользователя с ЛК ГУАП в очередь"""
+    sections = request.sections or list(SECTIONS)
+    unknown = [section for section in sections if section not in SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные разделы: {', '.join(unknown)}. Доступны: {', '.join(SECTIONS)}"
+        )
+
+    job = sync_orchestrator.submit(
+        request.uid, request.username, request.password, sections, PRIORITIES[request.priority]
+    )
+    if wait:
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+
+    return {"success": True, "job": job.to_dict()}
+
+
+@router.get("/jobs/{job_id}")
+async def get_sync_job(job_id: str):
+    """Статус задачи синхронизации"""
+    job = sync_orchestrator.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return {"success": True, "job": job.to_dict()}
+
+
+@router.get("/stats")
+async def get_sync_stats():
+    """Состояние очереди синхронизации"""
+    return {"success": True, "stats": sync_orchestrator.stats()}
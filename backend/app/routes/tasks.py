@@ -1,19 +1,45 @@
+from datetime import date
+from typing import Literal
 from fastapi import APIRouter, HTTPException, Query, Depends
-from db.dependencies import get_supabase_client
+from db.dependencies import get_supabase_client, check_user_data_etag
+from db.list_index import LIST_SPECS, InvalidCursor
 
-router = APIRouter(prefix="/tasks", tags=["Tasks"])
+router = APIRouter(
+    prefix="/tasks",
+    tags=["Tasks"],
+    dependencies=[Depends(check_user_data_etag)]
+)
 
 @router.get("/")
 async def get_tasks(
     uid: str = Query(..., description="UID пользователя"),
+    status: list[str] | None = Query(None, description="Код статуса (можно несколько)"),
+    subject: list[str] | None = Query(None, description="Предмет (можно несколько)"),
+    deadline_from: date | None = Query(None, description="Дедлайн не раньше (YYYY-MM-DD)"),
+    deadline_to: date | None = Query(None, description="Дедлайн не позже (YYYY-MM-DD)"),
+    sort: str | None = Query(None, description=f"Поле сортировки: {', '.join(LIST_SPECS['tasks'].sort_fields)}"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int | None = Query(None, ge=1, le=200, description="Размер страницы; без него - весь список"),
     db = Depends(get_supabase_client)
 ):
-    """Получение задач пользователя по UID"""
-    tasks = db.get_tasks_by_uid(uid)
+    """Получение задач пользователя по UID с фильтрами и постраничной выдачей"""
+    if sort and sort not in LIST_SPECS["tasks"].sort_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort}")
+    try:
+        page = await db.get_list_page_by_uid(
+            uid, "tasks", status=status, subject=subject, date_from=deadline_from, date_to=deadline_to,
+            sort=sort, descending=order == "desc", cursor=cursor, limit=limit
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tasks = page["items"]
     
     return {
         "success": True,
         "tasks": tasks,
         "tasks_count": len(tasks),
+        "total": page.get("total"),
+        "next_cursor": page.get("next_cursor"),
         "uid": uid
-    }
\ No newline at end of file
+    }
@@ -1,15 +1,34 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
+from services.directory_service import directory_service
 
 router = APIRouter(prefix="/teachers", tags=["Teachers"])
 
 @router.get("/")
-async def get_teachers(search:str | None = Query(None, description="Поиск по имени преподавателя")):
-    # Возвращает список преподавателей. Можно искать по имени
+async def get_teachers(
+    search: str | None = Query(None, max_length=100, description="Поиск по имени преподавателя"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500)
+):
+    # Возвращает список преподавателей из расписаний всех пользователей. Можно искать по имени:
+    # каждое слово - префикс фамилии или инициалов, опечатки допускаются
+    await directory_service.ensure_ready()
     if search:
-        return {"message": f"Search results for '{search}' (stub)"}
-    return {"message": "Teachers endpoint (stub)"}
+        teachers = directory_service.teachers.search(search, limit)
+    else:
+        teachers = directory_service.teachers.all(offset, limit)
+    return {
+        "success": True,
+        "search": search,
+        "teachers": teachers,
+        "teachers_count": len(teachers),
+        "total": len(directory_service.teachers)
+    }
 
 @router.get("/{teacher_id}")
-async def get_teacher_by_id(teacher_id:str):
-    # Возвращает информацию о конкретном преподавателе
-    return {"message": f"Teacher {teacher_id} details (stub)"}
+async def get_teacher_by_id(teacher_id: str):
+    # Возвращает информацию о преподавателе: предметы, группы и занятия по дням недели
+    await directory_service.ensure_ready()
+    teacher = directory_service.teachers.get(teacher_id)
+    if teacher is None:
+        raise HTTPException(status_code=404, detail="Преподаватель не найден")
+    return {"success": True, "teacher": teacher.details()}
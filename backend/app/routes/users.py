@@ -1,7 +1,48 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from db.dependencies import get_supabase_client
+from db.supabase_client import BATCH_FIELDS, DataUnavailableError
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# Максимум UID в одном пакетном запросе
+MAX_BATCH_UIDS = 1000
+
+
+class UsersBatchRequest(BaseModel):
+    uids: list[str]
+    fields: list[str] = ["profile", "tomorrow_schedule", "tasks"]
+
+
+@router.post("/batch")
+async def get_users_batch(request: UsersBatchRequest, db = Depends(get_supabase_client)):
+    """Данные для списка UID (для бота и админки) - пачками запросов с фильтром in"""
+    if len(request.uids) > MAX_BATCH_UIDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_BATCH_UIDS} UID за запрос")
+    unknown = [field for field in request.fields if field not in BATCH_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(BATCH_FIELDS)}"
+        )
+
+    try:
+        users = await db.get_users_batch_by_uids(request.uids, request.fields)
+    except DataUnavailableError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting users batch: {str(e)}")
+
+    # UID, по которым БД недоступна и нет последних известных данных
+    unavailable = [uid for uid in dict.fromkeys(request.uids) if uid not in users]
+    return {
+        "success": True,
+        "users": users,
+        "found": sum(1 for data in users.values() if data is not None),
+        "requested": len(users) + len(unavailable),
+        "unavailable": unavailable
+    }
+
 @router.get("/")
 async def get_users():
     # получить список пользователей (для админки)
@@ -0,0 +1,161 @@
+"""Справочники, собранные из расписаний всех пользователей.
+
+Занятия из week_schedule переводятся в недельную сетку (WeeklyClass) и
+считаются по числу расписаний, в которых встречаются: одинаковые занятия
+студентов одной группы дают одну запись. Индексы справочников получают
+только переходы счетчика 0 -> 1 и 1 -> 0, поэтому обновление расписания
+одного пользователя стоит столько, сколько в нем изменилось занятий.
+
+Полный обход user_data выполняется при первом обращении и затем раз в
+DIRECTORY_REFRESH_INTERVAL секунд (записи других сервисов не публикуют
+события); изменения расписания, сохраненные этим процессом, применяются
+сразу по событию из user_data_events.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+
+from db.directory_index import TeacherIndex, RoomIndex, weekly_classes
+from db.events import user_data_events
+from db.models import WEEK_SCHEDULE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryService:
+    def __init__(self, db, refresh_interval: float = 3600.0, page_size: int = 500):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.teachers = TeacherIndex()
+        self.rooms = RoomIndex()
+        self._indexes = (self.teachers, self.rooms)
+        self._contributions = {}  # uid -> frozenset(WeeklyClass)
+        self._counts = Counter()  # WeeklyClass -> число расписаний
+        self._ready = None
+        self._build_lock = None
+        self._refresh_task = None
+        self._subscribed = False
+        self._updated = set()  # UID, обновленные по событию во время текущего полного обхода
+        self._stats = {"full_refreshes": 0, "user_updates": 0, "last_refresh_at": None, "last_refresh_duration": None}
+
+    def _apply(self, uid: str, classes: frozenset):
+        """Заменяет вклад пользователя; индексы получают только изменившиеся занятия"""
+        previous = self._contributions.get(uid, frozenset())
+        if classes == previous:
+            return
+        for item in previous - classes:
+            self._counts[item] -= 1
+            if not self._counts[item]:
+                del self._counts[item]
+                for index in self._indexes:
+                    index.remove(item)
+        for item in classes - previous:
+            self._counts[item] += 1
+            if self._counts[item] == 1:
+                for index in self._indexes:
+                    index.add(item)
+        if classes:
+            self._contributions[uid] = classes
+        else:
+            self._contributions.pop(uid, None)
+
+    async def refresh(self):
+        """Полный обход user_data; пользователи, которых больше нет, удаляются из справочников"""
+        started = time.perf_counter()
+        seen = set()
+        self._updated = set()
+        async for page in self.db.iter_user_data_pages(WEEK_SCHEDULE_COLUMNS, self.page_size):
+            for snapshot in page:
+                seen.add(snapshot.uid)
+                if snapshot.uid in self._updated:
+                    # Страница могла быть прочитана до события - вклад по событию свежее
+                    continue
+                self._apply(snapshot.uid, weekly_classes(snapshot.week_schedule))
+            # Отдаем управление между страницами: разбор страницы не должен блокировать запросы
+            await asyncio.sleep(0)
+        for uid in [uid for uid in self._contributions if uid not in seen and uid not in self._updated]:
+            self._apply(uid, frozenset())
+
+        duration = time.perf_counter() - started
+        self._stats["full_refreshes"] += 1
+        self._stats["last_refresh_at"] = time.time()
+        self._stats["last_refresh_duration"] = round(duration, 3)
+        logger.info(
+            "Directory refreshed", extra={
+                "users": len(seen), "teachers": len(self.teachers), "rooms": len(self.rooms),
+                "classes": len(self._counts), "duration": round(duration, 3)
+            }
+        )
+
+    async def refresh_user(self, uid: str):
+        snapshot = await self.db.get_user_snapshot(uid, WEEK_SCHEDULE_COLUMNS)
+        self._apply(uid, weekly_classes(snapshot.week_schedule) if snapshot else frozenset())
+        self._updated.add(uid)
+        self._stats["user_updates"] += 1
+
+    async def _on_schedule_change(self, event):
+        if self._ready is None or not self._ready.is_set():
+            # До первого полного обхода событие учтет сам обход
+            return
+        await self.refresh_user(event.uid)
+
+    async def ensure_ready(self):
+        """Первый полный обход при первом обращении; дальше - фоновое обновление"""
+        if self._ready is None:
+            self._ready = asyncio.Event()
+            self._build_lock = asyncio.Lock()
+        if self._ready.is_set():
+            return
+        async with self._build_lock:
+            if self._ready.is_set():
+                return
+            if not self._subscribed:
+                user_data_events.subscribe(self._on_schedule_change, sections={"schedule"})
+                self._subscribed = True
+            await self.refresh()
+            self._ready.set()
+            if self.refresh_interval and self._refresh_task is None:
+                self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Directory refresh failed: %s", e)
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        if self._subscribed:
+            user_data_events.unsubscribe(self._on_schedule_change)
+            self._subscribed = False
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "ready": bool(self._ready and self._ready.is_set()),
+            "users": len(self._contributions),
+            "classes": len(self._counts),
+            "teachers": len(self.teachers),
+            "rooms": len(self.rooms),
+        }
+
+
+def _create_directory_service() -> DirectoryService:
+    from db.supabase_client import supabase_client
+
+    return DirectoryService(
+        supabase_client,
+        refresh_interval=float(os.getenv("DIRECTORY_REFRESH_INTERVAL", "3600")),
+        page_size=int(os.getenv("DIRECTORY_PAGE_SIZE", "500"))
+    )
+
+
+directory_service = _create_directory_service()
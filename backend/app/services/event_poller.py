@@ -0,0 +1,118 @@
+"""Опрос версий строк user_data для потока событий (routes/events.py).
+
+save_user_sections публикует изменения только в своем процессе, а миниапп
+пишет разделы прямо в Supabase. Раз в PUSH_POLL_INTERVAL секунд для UID с
+открытыми потоками читаются отметки времени разделов и section_hashes
+(без JSON-колонок); сдвиг отметки раздела публикуется в user_event_hub.
+Изменение, уже опубликованное записью этого процесса, хаб отбрасывает
+по той же отметке changed_at.
+"""
+import asyncio
+import logging
+import os
+
+from db.models import (
+    SECTION_COLUMNS, SECTION_TIMESTAMPS, VERSION_COLUMNS,
+    normalize_stamp, section_stamp_column, trusted_section_hash
+)
+from db.events import SectionChange
+
+logger = logging.getLogger(__name__)
+
+
+class RowVersionPoller:
+    def __init__(self, db, hub, interval: float = 10.0):
+        self.db = db
+        self.hub = hub
+        self.interval = interval
+        self._task = None
+        # uid -> ({колонка времени: отметка}, {раздел: достоверный хэш})
+        self._seen = {}
+        self._stats = {"polls": 0, "published": 0, "last_error": None}
+
+    @staticmethod
+    def _state(row: dict) -> tuple:
+        stamps = {column: normalize_stamp(row.get(column)) for column in VERSION_COLUMNS}
+        hashes = {section: trusted_section_hash(row, section) for section in SECTION_COLUMNS}
+        return stamps, hashes
+
+    @staticmethod
+    def changes(uid: str, previous: tuple, current: tuple, row: dict) -> list:
+        """Изменения разделов между двумя наблюдениями строки"""
+        old_stamps, old_hashes = previous
+        stamps, hashes = current
+        moved = {column for column in VERSION_COLUMNS if stamps[column] != old_stamps[column]}
+        dedicated_moved = any(SECTION_TIMESTAMPS[section] in moved for section in SECTION_TIMESTAMPS)
+        events = []
+        for section in SECTION_COLUMNS:
+            column = section_stamp_column(section)
+            if column not in moved:
+                continue
+            digest = hashes[section]
+            if digest is not None:
+                # Раздел записан бэкендом (любым процессом): хэш достоверен
+                if digest == old_hashes[section]:
+                    continue
+            elif column == "updated_at" and dedicated_moved:
+                # updated_at сдвинула запись раздела со своей отметкой
+                continue
+            # Запись миниаппа: хэш неизвестен, клиент перечитывает раздел
+            events.append(SectionChange(uid, section, digest, row.get(column)))
+        return events
+
+    async def poll_once(self) -> int:
+        uids = self.hub.active_uids()
+        active = set(uids)
+        for uid in [uid for uid in self._seen if uid not in active]:
+            del self._seen[uid]
+        if not uids:
+            return 0
+        rows = await self.db.get_section_stamps(uids)
+        published = 0
+        for uid, row in rows.items():
+            current = self._state(row)
+            previous = self._seen.get(uid)
+            self._seen[uid] = current
+            if previous is None:
+                # Первое наблюдение только запоминается: клиент уже прочитал данные
+                continue
+            for event in self.changes(uid, previous, current, row):
+                self.hub.publish(event)
+                published += 1
+        self._stats["polls"] += 1
+        self._stats["published"] += published
+        return published
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll_once()
+                self._stats["last_error"] = None
+            except Exception as e:
+                self._stats["last_error"] = f"{type(e).__name__}: {e}"
+                logger.warning("Row version poll failed: %s", e)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {**self._stats, "tracked": len(self._seen)}
+
+
+def _create_poller() -> RowVersionPoller:
+    from db.supabase_client import supabase_client
+    from db.events import user_event_hub
+
+    # 0 отключает опрос: в поток попадают только записи этого процесса
+    return RowVersionPoller(supabase_client, user_event_hub, interval=float(os.getenv("PUSH_POLL_INTERVAL", "10")))
+
+
+row_version_poller = _create_poller()
@@ -0,0 +1,376 @@
+"""Рассылка вечерних дайджестов: занятия на завтра и ближайшие дедлайны.
+
+Конвейер: постраничный обход user_data -> сборка дайджестов по снимкам ->
+ограниченная очередь -> пул воркеров с ограничением скорости по каналу и
+повторными попытками -> sink канала (HTTP-вебхук бота или MemorySink в тестах).
+
+Запуск из каталога backend/app:
+    python -m services.notification_service --dry-run
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from db.models import PROFILE_COLUMNS, TASKS_COLUMNS, WEEK_SCHEDULE_COLUMNS, TODAY_SCHEDULE_COLUMNS
+from utils.metrics import NOTIFICATIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = "max"
+
+DIGEST_COLUMNS = PROFILE_COLUMNS + TASKS_COLUMNS + WEEK_SCHEDULE_COLUMNS + TODAY_SCHEDULE_COLUMNS
+
+# Статусы задач, по которым напоминать не нужно (как в DeadlinesSection миниаппа)
+DONE_TASK_STATUSES = {"принят", "ожидает проверки"}
+DONE_TASK_CODES = {"accepted", "checking"}
+
+Notification = namedtuple("Notification", ["uid", "channel", "text", "payload"])
+
+
+class DeliveryError(Exception):
+    """Ошибка доставки; retryable=False - повторять бессмысленно (например, 4xx)"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: float = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class MemorySink:
+    """Sink в памяти для тестов и dry-run; может имитировать сбои первых попыток"""
+
+    def __init__(self, fail_first: int = 0, latency: float = 0.0):
+        self.sent = []
+        self.attempts = 0
+        self.fail_first = fail_first
+        self.latency = latency
+
+    async def send(self, notification: Notification):
+        self.attempts += 1
+        attempt = self.attempts
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if attempt <= self.fail_first:
+            raise DeliveryError("simulated failure")
+        self.sent.append(notification)
+
+    async def aclose(self):
+        pass
+
+
+class HttpSink:
+    """Отправка уведомлений POST-запросом на вебхук (например, бота)"""
+
+    def __init__(self, url: str, http_client: httpx.AsyncClient = None, timeout: float = 10.0):
+        self.url = url
+        self._own_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+
+    async def send(self, notification: Notification):
+        try:
+            response = await self._client.post(self.url, json={
+                "uid": notification.uid,
+                "channel": notification.channel,
+                "text": notification.text,
+                "payload": notification.payload
+            })
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}") from e
+
+        if response.status_code == 429:
+            retry_after = response.headers.get("retry-after")
+            raise DeliveryError(
+                "rate limited",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        if response.status_code >= 500:
+            raise DeliveryError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+
+    async def aclose(self):
+        if self._own_client:
+            await self._client.aclose()
+
+
+class TokenBucket:
+    """Ограничение скорости: rate отправок в секунду с запасом burst"""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _parse_deadline(task: dict):
+    """Дата дедлайна из deadline.date (ISO) или deadline.text (дд.мм.гггг)"""
+    deadline = task.get('deadline')
+    if isinstance(deadline, str):
+        deadline = {"text": deadline}
+    if not isinstance(deadline, dict):
+        return None
+
+    if deadline.get('date'):
+        try:
+            return date.fromisoformat(str(deadline['date'])[:10])
+        except ValueError:
+            pass
+    text = deadline.get('text')
+    if text:
+        try:
+            return datetime.strptime(str(text).split()[0], "%d.%m.%Y").date()
+        except ValueError:
+            return None
+    return None
+
+
+def _is_done(task: dict) -> bool:
+    status = task.get('status')
+    if not isinstance(status, dict):
+        return False
+    return (status.get('code') in DONE_TASK_CODES
+            or str(status.get('text', '')).lower() in DONE_TASK_STATUSES)
+
+
+def _task_name(task: dict) -> str:
+    inner = task.get('task')
+    if isinstance(inner, dict):
+        return inner.get('name', '')
+    return task.get('name', '')
+
+
+def build_digest(snapshot, day_offset: int = 1, deadline_days: int = 3, today: date = None):
+    """
+    Дайджест пользователя: занятия на день со смещением day_offset и
+    несданные задачи с дедлайном в ближайшие deadline_days дней.
+    None - если сообщать нечего.
+    """
+    today = today or date.today()
+    day = snapshot.schedule_index.day(today + timedelta(days=day_offset))
+
+    due_tasks = []
+    last_day = today + timedelta(days=deadline_days)
+    for task in snapshot.tasks:
+        if not isinstance(task, dict) or _is_done(task):
+            continue
+        deadline = _parse_deadline(task)
+        if deadline is not None and today <= deadline <= last_day:
+            due_tasks.append({
+                "name": _task_name(task),
+                "subject": (task.get('subject') or {}).get('name', '') if isinstance(task.get('subject'), dict) else '',
+                "deadline": deadline.isoformat()
+            })
+    due_tasks.sort(key=lambda item: item["deadline"])
+
+    if not day["schedule"] and not due_tasks:
+        return None
+    return {
+        "date": day["date"],
+        "date_dd_mm": day["date_dd_mm"],
+        "day_name": day["day_name"],
+        "classes": day["schedule"],
+        "tasks": due_tasks,
+        "full_name": snapshot.profile.get('full_name', '') if isinstance(snapshot.profile, dict) else ''
+    }
+
+
+def format_digest(digest: dict) -> str:
+    lines = []
+    if digest["classes"]:
+        lines.append(f"Занятия на {digest['date_dd_mm']} ({digest['day_name']}):")
+        for item in digest["classes"]:
+            place = " ".join(part for part in (item.get('building'), item.get('location')) if part)
+            lines.append(
+                f"• {item.get('timeRange', '')} {item.get('subject', '')}"
+                + (f" [{item.get('type')}]" if item.get('type') else "")
+                + (f", {place}" if place else "")
+            )
+    else:
+        lines.append(f"На {digest['date_dd_mm']} занятий нет.")
+
+    if digest["tasks"]:
+        lines.append("")
+        lines.append("Ближайшие дедлайны:")
+        for task in digest["tasks"]:
+            deadline = date.fromisoformat(task["deadline"]).strftime("%d.%m")
+            lines.append(f"• {deadline} - {task['name']}" + (f" ({task['subject']})" if task['subject'] else ""))
+    return "\n".join(lines)
+
+
+class NotificationService:
+    """Рассылка уведомлений пулом воркеров с ограничением скорости и повторами"""
+
+    def __init__(
+        self,
+        db,
+        sinks: dict,
+        workers: int = 32,
+        rate_limits: dict = None,
+        max_retries: int = 3,
+        retry_base_delay: float = 1.0,
+        page_size: int = 200
+    ):
+        self.db = db
+        self.sinks = sinks
+        self.workers = workers
+        self.buckets = {
+            channel: TokenBucket(rate) for channel, rate in (rate_limits or {}).items()
+        }
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.page_size = page_size
+
+    async def _deliver(self, notification: Notification, stats: dict):
+        sink = self.sinks[notification.channel]
+        bucket = self.buckets.get(notification.channel)
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                await sink.send(notification)
+                stats["sent"] += 1
+                NOTIFICATIONS.labels(notification.channel, "sent").inc()
+                return
+            except DeliveryError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    stats["failed"] += 1
+                    NOTIFICATIONS.labels(notification.channel, "failed").inc()
+                    logger.warning(
+                        "Notification delivery failed: %s", e,
+                        extra={"uid": notification.uid, "channel": notification.channel, "attempts": attempt + 1}
+                    )
+                    return
+                stats["retries"] += 1
+                NOTIFICATIONS.labels(notification.channel, "retried").inc()
+                await asyncio.sleep(e.retry_after or self.retry_base_delay * 2 ** attempt)
+
+    async def _worker(self, queue: asyncio.Queue, stats: dict):
+        while True:
+            notification = await queue.get()
+            try:
+                if notification is None:
+                    return
+                await self._deliver(notification, stats)
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error("Notification worker error: %s", e, extra={"uid": notification.uid})
+            finally:
+                queue.task_done()
+
+    async def send_daily_digests(self, day_offset: int = 1, channel: str = DEFAULT_CHANNEL, deadline_days: int = 3) -> dict:
+        """Дайджест на завтра (day_offset=1) всем пользователям; возвращает статистику"""
+        stats = {"users": 0, "digests": 0, "duplicates": 0, "sent": 0, "failed": 0, "retries": 0}
+        started = time.perf_counter()
+        today = date.today()
+
+        # Ограниченная очередь: постраничная загрузка ждет воркеров, память не растет
+        queue = asyncio.Queue(maxsize=self.workers * 4)
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.workers)]
+        # Один дайджест на UID за рассылку, даже если строка пришла повторно
+        queued = set()
+        try:
+            async for snapshots in self.db.iter_user_data_pages(DIGEST_COLUMNS, self.page_size):
+                for snapshot in snapshots:
+                    if snapshot.uid in queued:
+                        stats["duplicates"] += 1
+                        continue
+                    queued.add(snapshot.uid)
+                    stats["users"] += 1
+                    digest = build_digest(snapshot, day_offset, deadline_days, today)
+                    if digest is None:
+                        continue
+                    stats["digests"] += 1
+                    await queue.put(Notification(snapshot.uid, channel, format_digest(digest), digest))
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        stats["elapsed"] = round(time.perf_counter() - started, 3)
+        logger.info("Daily digests finished", extra=stats)
+        return stats
+
+
+def create_notification_service(db, dry_run: bool = False) -> NotificationService:
+    """Сервис с настройками из окружения: NOTIFY_WEBHOOK_URL, NOTIFY_WORKERS, NOTIFY_RATE_LIMIT.
+
+    Без NOTIFY_WEBHOOK_URL работает только dry_run: иначе рассылка молча
+    собиралась бы в памяти и терялась.
+    """
+    webhook_url = os.getenv("NOTIFY_WEBHOOK_URL")
+    if dry_run:
+        sink = MemorySink()
+    elif webhook_url:
+        sink = HttpSink(webhook_url)
+    else:
+        raise ValueError("NOTIFY_WEBHOOK_URL is not set; use --dry-run to collect digests without sending")
+    return NotificationService(
+        db,
+        sinks={DEFAULT_CHANNEL: sink},
+        workers=int(os.getenv("NOTIFY_WORKERS", "32")),
+        rate_limits={DEFAULT_CHANNEL: float(os.getenv("NOTIFY_RATE_LIMIT", "30"))},
+        max_retries=int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+    )
+
+
+async def _run(args):
+    from db.supabase_client import supabase_client
+
+    service = create_notification_service(supabase_client, args.dry_run)
+    try:
+        stats = await service.send_daily_digests(day_offset=args.day_offset)
+        print(stats)
+        if args.dry_run:
+            for notification in service.sinks[DEFAULT_CHANNEL].sent[:args.show]:
+                print(f"\n--- {notification.uid}\n{notification.text}")
+    finally:
+        for sink in service.sinks.values():
+            await sink.aclose()
+        await supabase_client.aclose()
+
+
+def main(argv=None):
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent.parent.parent / '.env')
+    from utils.logger import setup_logging, shutdown_logging
+
+    parser = argparse.ArgumentParser(description="Рассылка дайджестов на завтра")
+    parser.add_argument("--dry-run", action="store_true", help="не отправлять, собрать в памяти")
+    parser.add_argument("--day-offset", type=int, default=1)
+    parser.add_argument("--show", type=int, default=3, help="сколько дайджестов вывести в dry-run")
+    args = parser.parse_args(argv)
+    if not args.dry_run and not os.getenv("NOTIFY_WEBHOOK_URL"):
+        parser.error("NOTIFY_WEBHOOK_URL не задан; для проверки без отправки используйте --dry-run")
+
+    setup_logging()
+    try:
+        asyncio.run(_run(args))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
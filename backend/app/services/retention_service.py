@@ -0,0 +1,66 @@
+"""Периодическая очистка общих расписаний групп (group_schedules).
+
+Строки group_schedules неизменяемы и создаются на каждую неделю каждой
+группы; раз в GROUP_SCHEDULE_PRUNE_INTERVAL секунд удаляются строки старше
+GROUP_SCHEDULE_RETENTION_DAYS дней, на которые больше никто не ссылается.
+Очистка идемпотентна, поэтому одновременный запуск на нескольких репликах безопасен.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class GroupScheduleRetention:
+    def __init__(self, db, keep_days: int = 60, interval: float = 86400.0):
+        self.db = db
+        self.keep_days = keep_days
+        self.interval = interval
+        self._task = None
+        self._stats = {"runs": 0, "deleted": 0, "last_error": None}
+
+    async def run_once(self) -> int:
+        deleted = await self.db.prune_group_schedules(self.keep_days)
+        self._stats["runs"] += 1
+        self._stats["deleted"] += deleted
+        if deleted:
+            logger.info("Pruned group schedules", extra={"deleted": deleted, "keep_days": self.keep_days})
+        return deleted
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+                self._stats["last_error"] = None
+            except Exception as e:
+                self._stats["last_error"] = f"{type(e).__name__}: {e}"
+                logger.error("Group schedule pruning failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.keep_days > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+def _create_retention() -> GroupScheduleRetention:
+    from db.supabase_client import supabase_client
+
+    return GroupScheduleRetention(
+        supabase_client,
+        # 0 отключает очистку
+        keep_days=int(os.getenv("GROUP_SCHEDULE_RETENTION_DAYS", "60")),
+        interval=float(os.getenv("GROUP_SCHEDULE_PRUNE_INTERVAL", "86400"))
+    )
+
+
+group_schedule_retention = _create_retention()
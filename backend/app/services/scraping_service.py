@@ -1 +1,356 @@
-# для вызова js-скрипта
\ No newline at end of file
+# для вызова js-скрипта
+"""Оркестратор синхронизации данных из ЛК ГУАП через Node-парсер.
+
+Каждый запрос к /api/scrape/* парсера поднимает headless-браузер, поэтому:
+- одновременно работает не больше SYNC_WORKERS задач;
+- повторный запрос для UID с незавершенной задачей не создает новую, а
+  дополняет существующую (разделы объединяются, приоритет повышается);
+- интерактивные синхронизации обслуживаются раньше фоновых;
+- временные ошибки парсера повторяются с экспоненциальной задержкой.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "background": PRIORITY_BACKGROUND}
+
+QUEUED, RUNNING, RETRYING, DONE, FAILED = "queued", "running", "retrying", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING, RETRYING)
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat()
+
+
+def _week_schedule_columns(result: dict) -> dict:
+    today = date.today()
+    week_number = today.isocalendar()[1]
+    return {
+        "week_schedule": {
+            **result["schedule"],
+            "metadata": {
+                "week_number": week_number,
+                "year": today.year,
+                "is_even_week": week_number % 2 == 0,
+                "schedule_updated_at": _now_iso()
+            }
+        },
+        "current_week_number": week_number,
+        "current_week_year": today.year,
+        "schedule_updated_at": _now_iso()
+    }
+
+
+# Раздел -> (эндпоинт парсера, ключ результата, колонки user_data для сохранения).
+# Формат колонок совпадает с тем, что сохраняют сервисы миниаппа.
+SECTIONS = {
+    "profile": (
+        "/api/scrape/profile", "profile",
+        lambda result: {"profile": result["profile"], "updated_at": _now_iso()}
+    ),
+    "tasks": (
+        "/api/scrape/tasks", "tasks",
+        lambda result: {"tasks": result["tasks"], "tasks_updated_at": _now_iso(), "updated_at": _now_iso()}
+    ),
+    "reports": (
+        "/api/scrape/reports", "reports",
+        lambda result: {"reports": result["reports"], "reports_updated_at": _now_iso(), "updated_at": _now_iso()}
+    ),
+    "schedule": ("/api/scrape/schedule", "schedule", _week_schedule_columns),
+}
+
+
+class SyncError(Exception):
+    """Ошибка синхронизации; retryable=False - повтор не поможет (неверный логин и т.п.)"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class SyncJob:
+    """Задача синхронизации одного пользователя; учетные данные не попадают в статус"""
+
+    def __init__(self, uid: str, username: str, password: str, sections: list, priority: int):
+        self.id = uuid.uuid4().hex
+        self.uid = uid
+        self.username = username
+        self.password = password
+        self.sections = list(dict.fromkeys(sections))
+        self.priority = priority
+        self.status = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.results = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.next_attempt_at = None
+        self.coalesced = 0
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "uid": self.uid,
+            "status": self.status,
+            "priority": "interactive" if self.priority == PRIORITY_INTERACTIVE else "background",
+            "sections": self.sections,
+            "results": self.results,
+            "attempts": self.attempts,
+            "coalesced": self.coalesced,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "next_attempt_at": self.next_attempt_at
+        }
+
+
+class SyncOrchestrator:
+    """Очередь синхронизаций с приоритетами, пулом воркеров и дедупликацией по UID"""
+
+    def __init__(
+        self,
+        parser_url: str,
+        db=None,
+        workers: int = 2,
+        max_attempts: int = 4,
+        backoff_base: float = 2.0,
+        backoff_max: float = 120.0,
+        http_client: httpx.AsyncClient = None,
+        history_size: int = 1000
+    ):
+        self.parser_url = parser_url.rstrip("/") if parser_url else parser_url
+        self.db = db
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.history_size = history_size
+        self._http_client = http_client
+        self._queue = None
+        self._counter = itertools.count()
+        self._tasks = []
+        self._retry_tasks = set()
+        self._active = {}  # uid -> SyncJob в очереди, в работе или ожидающая повтора
+        self._jobs = OrderedDict()  # job_id -> SyncJob, включая завершенные
+        self._stats = {"submitted": 0, "coalesced": 0, "done": 0, "failed": 0, "retries": 0}
+
+    def _ensure_started(self):
+        # Очередь и воркеры создаются в работающем event loop при первой задаче
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(180.0, connect=10.0))
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info("Sync orchestrator started", extra={"workers": self.workers})
+
+    async def stop(self):
+        tasks = self._tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _enqueue(self, job: SyncJob):
+        job.status = QUEUED
+        job.next_attempt_at = None
+        self._queue.put_nowait((job.priority, next(self._counter), job))
+
+    def submit(self, uid: str, username: str, password: str, sections: list = None,
+               priority: int = PRIORITY_BACKGROUND) -> SyncJob:
+        """Ставит синхронизацию в очередь или присоединяется к незавершенной задаче UID"""
+        self._ensure_started()
+        sections = sections or list(SECTIONS)
+        self._stats["submitted"] += 1
+
+        job = self._active.get(uid)
+        if job is not None:
+            job.coalesced += 1
+            self._stats["coalesced"] += 1
+            job.username, job.password = username, password
+            # Работающий воркер подхватит добавленные разделы: он обходит этот же список
+            job.sections.extend(section for section in sections if section not in job.sections)
+            if priority < job.priority:
+                job.priority = priority
+                if job.status == QUEUED:
+                    # Старая запись в очереди будет пропущена по несовпадению приоритета
+                    self._queue.put_nowait((job.priority, next(self._counter), job))
+            logger.debug("Sync request coalesced", extra={"uid": uid, "job_id": job.id})
+            return job
+
+        job = SyncJob(uid, username, password, sections, priority)
+        self._active[uid] = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history_size:
+            _, old = next(iter(self._jobs.items()))
+            if old.status in ACTIVE_STATUSES:
+                break
+            self._jobs.popitem(last=False)
+        self._enqueue(job)
+        logger.info("Sync job queued", extra={"uid": uid, "job_id": job.id, "sections": job.sections})
+        return job
+
+    def get_job(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "workers": self.workers,
+            "queued": sum(1 for job in self._active.values() if job.status == QUEUED),
+            "running": sum(1 for job in self._active.values() if job.status == RUNNING),
+            "retrying": sum(1 for job in self._active.values() if job.status == RETRYING)
+        }
+
+    async def _worker(self):
+        while True:
+            priority, _, job = await self._queue.get()
+            try:
+                # Устаревшие записи: задача уже взята или ей повысили приоритет
+                if job.status != QUEUED or priority != job.priority:
+                    continue
+                await self._run(job)
+            except Exception as e:
+                logger.error("Sync worker error: %s", e, extra={"uid": job.uid, "job_id": job.id})
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: SyncJob):
+        job.status = RUNNING
+        job.attempts += 1
+        job.started_at = job.started_at or time.time()
+        section = None
+        try:
+            for section in job.sections:
+                if job.results.get(section) in ("ok", "unchanged"):
+                    continue
+                job.results[section] = await self._sync_section(job, section)
+        except Exception as e:
+            error = e
+            if not isinstance(error, SyncError):
+                # Непредвиденный сбой (ошибка в разборе ответа и т.п.) - через обычный повтор
+                logger.exception("Unexpected sync error", extra={"uid": job.uid, "job_id": job.id})
+                if section is not None:
+                    job.results[section] = "error"
+                error = SyncError(f"{section}: unexpected error: {type(e).__name__}: {e}")
+            job.error = str(error)
+            if error.retryable and job.attempts < self.max_attempts:
+                self._schedule_retry(job)
+            else:
+                self._finish(job, FAILED)
+        else:
+            self._finish(job, DONE)
+        finally:
+            # Задача не должна остаться RUNNING в _active (например, при отмене воркера):
+            # иначе новые запросы присоединялись бы к ней, а пароль оставался в памяти
+            if job.status == RUNNING:
+                job.error = job.error or "sync interrupted"
+                self._finish(job, FAILED)
+
+    def _schedule_retry(self, job: SyncJob):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+        delay *= random.uniform(0.8, 1.2)
+        job.status = RETRYING
+        job.next_attempt_at = time.time() + delay
+        self._stats["retries"] += 1
+        logger.warning(
+            "Sync job retry in %.1fs: %s", delay, job.error,
+            extra={"uid": job.uid, "job_id": job.id, "attempts": job.attempts}
+        )
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            if job.status == RETRYING:
+                self._enqueue(job)
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _finish(self, job: SyncJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.next_attempt_at = None
+        job.password = None
+        if self._active.get(job.uid) is job:
+            del self._active[job.uid]
+        self._stats[status] += 1
+        job.done.set()
+        logger.info(
+            "Sync job finished", extra={
+                "uid": job.uid, "job_id": job.id, "status": status, "attempts": job.attempts,
+                "duration": round(job.finished_at - job.started_at, 3)
+            }
+        )
+
+    async def _sync_section(self, job: SyncJob, section: str) -> str:
+        endpoint, key, to_columns = SECTIONS[section]
+        payload = {"username": job.username, "password": job.password}
+        if section == "schedule":
+            iso_year, iso_week, _ = date.today().isocalendar()
+            payload.update({"year": iso_year, "week": iso_week})
+
+        try:
+            response = await self._http_client.post(f"{self.parser_url}{endpoint}", json=payload)
+        except httpx.HTTPError as e:
+            job.results[section] = "error"
+            raise SyncError(f"{section}: parser unavailable: {type(e).__name__}") from e
+
+        if response.status_code >= 500 or response.status_code == 429:
+            job.results[section] = "error"
+            raise SyncError(f"{section}: parser HTTP {response.status_code}")
+        try:
+            result = response.json() if response.content else {}
+        except ValueError as e:
+            job.results[section] = "error"
+            raise SyncError(f"{section}: parser returned invalid JSON") from e
+        if not isinstance(result, dict):
+            job.results[section] = "error"
+            raise SyncError(f"{section}: parser returned {type(result).__name__} instead of an object")
+        if response.status_code >= 400 or not result.get("success") or result.get(key) is None:
+            job.results[section] = "error"
+            raise SyncError(f"{section}: {result.get('message') or 'parser returned no data'}", retryable=False)
+
+        if self.db is None:
+            return "ok"
+        columns = to_columns(result)
+        # Пишутся только разделы, содержимое которых изменилось
+        try:
+            changed = await self.db.save_user_sections(job.uid, {section: columns})
+        except Exception as e:
+            # Сбой БД не должен оставлять задачу в RUNNING: повторяем с отсрочкой
+            raise SyncError(f"{section}: database write failed: {type(e).__name__}: {e}") from e
+        return "ok" if changed else "unchanged"
+
+
+def _create_orchestrator() -> SyncOrchestrator:
+    from db.supabase_client import supabase_client
+
+    return SyncOrchestrator(
+        os.getenv("PARSER_SERVICE_URL", "http://localhost:3001"),
+        db=supabase_client,
+        workers=int(os.getenv("SYNC_WORKERS", "2")),
+        max_attempts=int(os.getenv("SYNC_MAX_ATTEMPTS", "4")),
+        backoff_base=float(os.getenv("SYNC_BACKOFF_BASE", "2"))
+    )
+
+
+sync_orchestrator = _create_orchestrator()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+
+from utils.metrics import CIRCUIT_STATE, CIRCUIT_REJECTED
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Вызов не выполнялся: зависимость считается недоступной"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} unavailable (circuit open), retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def is_availability_error(error: Exception) -> bool:
+    """Ошибки, говорящие о недоступности БД, а не о неверном запросе.
+
+    APIError с кодом 5xx (HTTP) или SQLSTATE классов 5x (нехватка ресурсов,
+    отмена по таймауту, системные ошибки) считается отказом; 4xx, уникальные
+    ключи и ошибки PostgREST в запросе - нет.
+    """
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIError):
+        return error.code is None or str(error.code).startswith("5")
+    return False
+
+
+class CircuitBreaker:
+    """Предохранитель: после failure_threshold отказов подряд вызовы сразу
+    отклоняются recovery_timeout секунд, затем один пробный вызов (half-open)
+    решает, закрыть предохранитель или открыть снова.
+
+    Каждый вызов ограничен call_timeout, поэтому даже до срабатывания
+    зависшая БД не держит запрос дольше этого времени.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        call_timeout: float = 5.0,
+        is_failure=is_availability_error
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.call_timeout = call_timeout
+        self.is_failure = is_failure
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        CIRCUIT_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    async def call(self, fn, *args, **kwargs):
+        state = self.state
+        probe = False
+        if state == OPEN or (state == HALF_OPEN and self._probe_in_flight):
+            CIRCUIT_REJECTED.labels(self.name).inc()
+            raise CircuitOpenError(self.name, self.retry_after())
+        if state == HALF_OPEN:
+            probe = self._probe_in_flight = True
+
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), timeout=self.call_timeout)
+        except Exception as e:
+            if self.is_failure(e):
+                self._record_failure(e)
+            elif probe:
+                # Осмысленный ответ БД (пусть и ошибка запроса) - она доступна
+                self._record_success()
+            raise
+        finally:
+            if probe:
+                self._probe_in_flight = False
+        self._record_success()
+        return result
+
+    def _record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit %s closed", self.name)
+            CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[CLOSED])
+        self.failures = 0
+        self.opened_at = None
+
+    def _record_failure(self, error: Exception):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(
+                    "Circuit %s opened after %d failures: %s", self.name, self.failures, type(error).__name__
+                )
+            # Неудачная проба в half-open снова открывает предохранитель на полный срок
+            self.opened_at = time.monotonic()
+            CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[OPEN])
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 3)
+        }
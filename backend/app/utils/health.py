@@ -0,0 +1,90 @@
+"""Фоновая проверка зависимостей для проб живости и готовности.
+
+Проверки выполняются раз в interval секунд в фоновой задаче, а пробы
+отдают последний результат: частые запросы оркестратора не создают
+нагрузку на БД и не ждут медленной зависимости.
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HealthChecker:
+    """checks - {имя: корутинная функция без аргументов}; исключение или таймаут - проверка не прошла.
+
+    optional - проверки, отказ которых не снимает готовность, а только переводит
+    статус в degraded (сервис продолжает отвечать, например, из кэша); коллекция
+    имен или функция, возвращающая ее, - тогда набор вычисляется при каждом status().
+    """
+
+    def __init__(
+        self, checks: dict, interval: float = 15.0, timeout: float = 3.0, max_age: float = None, optional=()
+    ):
+        self.checks = checks
+        self.optional = optional
+        self.interval = interval
+        self.timeout = timeout
+        # Результат старше max_age не считается подтверждением готовности
+        self.max_age = max_age if max_age is not None else interval * 3
+        self.started_at = time.time()
+        self._results = {}
+        self._checked_at = None
+        self._task = None
+
+    async def _run_check(self, name: str, check) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), timeout=self.timeout)
+            ok, error = True, None
+        except asyncio.TimeoutError:
+            ok, error = False, f"timeout after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        return {"ok": ok, "error": error, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    async def run_checks(self):
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(name, self.checks[name]) for name in names))
+        for name, result in zip(names, results):
+            previous = self._results.get(name)
+            if previous is not None and previous["ok"] != result["ok"]:
+                log = logger.info if result["ok"] else logger.warning
+                log("Health check %s: %s", name, "ok" if result["ok"] else result["error"])
+            self._results[name] = result
+        self._checked_at = time.time()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.error("Health checker error: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> dict:
+        """Последний результат проверок; ready - обязательные прошли и результат свежий"""
+        age = time.time() - self._checked_at if self._checked_at else None
+        stale = age is None or age > self.max_age
+        failed = [name for name, result in self._results.items() if not result["ok"]]
+        optional = set(self.optional() if callable(self.optional) else self.optional)
+        return {
+            "ready": not stale and all(name in optional for name in failed),
+            "degraded": bool(failed),
+            "stale": stale,
+            "checked_at": self._checked_at,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "checks": self._results,
+        }
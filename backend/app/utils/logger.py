@@ -0,0 +1,108 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+# Поля записи, которые есть у любого LogRecord; все остальное - пользовательский extra
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+_listener = None
+
+
+class SuccessSampler(logging.Filter):
+    """Пропускает только долю сообщений успешного пути (extra={"sampled": True})"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class UidTraceFilter(logging.Filter):
+    """DEBUG-сообщения пропускаются только для UID из LOG_TRACE_UIDS ("*" - для всех).
+
+    Без списка UID фильтр ничего не отбрасывает: DEBUG определяет LOG_LEVEL.
+    """
+
+    def __init__(self, uids: set):
+        super().__init__()
+        self.uids = uids
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not self.uids:
+            return True
+        return "*" in self.uids or getattr(record, "uid", None) in self.uids
+
+
+class StructuredFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Настраивает логирование через очередь: запись в stdout идет в отдельном потоке.
+
+    LOG_LEVEL - уровень (INFO по умолчанию), LOG_FORMAT - json или text,
+    LOG_SUCCESS_SAMPLE_RATE - доля логируемых сообщений успешного пути,
+    LOG_TRACE_UIDS - UID через запятую, для которых пишутся DEBUG-сообщения
+    (если список задан, DEBUG остальных UID отбрасывается даже при LOG_LEVEL=DEBUG).
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    trace_uids = {uid.strip() for uid in os.getenv("LOG_TRACE_UIDS", "").split(",") if uid.strip()}
+    level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+    if trace_uids:
+        level = logging.DEBUG
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        stream_handler.setFormatter(StructuredFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Фильтры работают до постановки в очередь, отброшенные записи не стоят I/O
+    queue_handler.addFilter(SuccessSampler(float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", "0.1"))))
+    if trace_uids:
+        queue_handler.addFilter(UidTraceFilter(trace_uids))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    # httpx пишет строку на каждый HTTP-запрос к Supabase уровнем INFO
+    for noisy in ("httpx", "httpcore", "hpack"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся в очереди записи и останавливает поток логирования"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,151 @@
+import time
+
+from fastapi import Response
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+HTTP_RESPONSES = Counter(
+    "http_responses_total",
+    "Количество HTTP-ответов по маршруту и статусу",
+    ["method", "route", "status"]
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP-запросы в обработке",
+    ["method"]
+)
+
+DB_CALL_DURATION = Histogram(
+    "supabase_call_duration_seconds",
+    "Длительность запроса к Supabase (PostgREST)",
+    ["table", "operation", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+DB_CALL_ROWS = Histogram(
+    "supabase_call_rows",
+    "Количество строк в ответе Supabase",
+    ["table", "operation"],
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+)
+
+NOTIFICATIONS = Counter(
+    "notifications_total",
+    "Уведомления по каналу и результату доставки",
+    ["channel", "status"]
+)
+
+PUSH_SUBSCRIBERS = Gauge(
+    "push_subscribers",
+    "Открытые потоки событий (SSE)"
+)
+PUSH_EVENTS = Counter(
+    "push_events_total",
+    "События изменений данных для подписчиков по результату (delivered, dropped)",
+    ["result"]
+)
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Вызовы загрузок через single-flight: leader - выполнил запрос, coalesced - дождался чужого",
+    ["operation", "result"]
+)
+
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Состояние предохранителя: 0 - closed, 1 - half-open, 2 - open",
+    ["name"]
+)
+CIRCUIT_REJECTED = Counter(
+    "circuit_breaker_rejected_total",
+    "Вызовы, отклоненные открытым предохранителем",
+    ["name"]
+)
+STALE_RESPONSES = Counter(
+    "stale_responses_total",
+    "Ответы из устаревших данных при недоступной БД по источнику (memory, local)",
+    ["source"]
+)
+
+
+class CacheCollector:
+    """Отдает статистику зарегистрированных кэшей (hits/misses/size) в момент сбора"""
+
+    def __init__(self):
+        self.caches = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Попадания в кэш", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Промахи кэша", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Записей в кэше", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        return [hits, misses, size]
+
+
+_cache_collector = CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def register_cache(name: str, cache):
+    """Подключает кэш с методом stats() к /metrics"""
+    _cache_collector.caches[name] = cache
+
+
+async def timed_execute(query, table: str, operation: str):
+    """Выполняет запрос PostgREST, записывая длительность, статус и число строк"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = await query.execute()
+        status = "ok"
+        rows = response.data if isinstance(response.data, list) else [response.data]
+        DB_CALL_ROWS.labels(table, operation).observe(len(rows))
+        return response
+    finally:
+        DB_CALL_DURATION.labels(table, operation, status).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность по шаблону маршрута, статусы и запросы в обработке"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.labels(method).dec()
+            # Шаблон пути (/schedule/range), а не фактический URL - ограниченная кардинальность
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(time.perf_counter() - start)
+            HTTP_RESPONSES.labels(method, route_path, str(status_code)).inc()
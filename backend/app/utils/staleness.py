@@ -0,0 +1,50 @@
+from contextvars import ContextVar
+
+# Изменяемый словарь на запрос: аксессоры отмечают в нем, что данные устаревшие.
+# Сам ContextVar задается middleware, а изменения словаря видны ему и после
+# выполнения обработчика в скопированном контексте.
+_request_staleness = ContextVar("request_staleness", default=None)
+
+
+def mark_stale(age: float, source: str):
+    """Ответ текущего запроса собран из данных возрастом age секунд (БД недоступна)"""
+    holder = _request_staleness.get()
+    if holder is not None:
+        holder["age"] = max(holder.get("age", 0.0), age)
+        holder["source"] = source
+
+
+class StaleMarkerMiddleware:
+    """ASGI-middleware: помечает заголовками ответы, собранные из устаревших данных.
+
+    X-Data-Stale: 1, Age - возраст данных в секундах и Warning: 110 (RFC 7234),
+    чтобы клиент мог показать, что расписание может быть неактуальным.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        holder = {}
+        token = _request_staleness.set(holder)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and "age" in holder:
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-data-stale", b"1"),
+                    (b"x-data-source", holder["source"].encode()),
+                    (b"age", str(int(holder["age"])).encode()),
+                    (b"warning", b'110 - "Response is Stale"'),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_staleness.reset(token)
@@ -0,0 +1,207 @@
+"""Локальная замена PostgREST-эндпоинтов Supabase для бенчмарков.
+
+Работает как httpx.MockTransport внутри процесса: сервисы используют настоящий
+supabase-клиент, а запросы /rest/v1/<table> обслуживаются из памяти.
+Поддерживается подмножество PostgREST, которое используют сервисы:
+select-проекция, фильтры eq/neq/gt/gte/lt/lte/in/is, order, limit/offset,
+insert/upsert/update/delete и уникальные ограничения.
+"""
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+
+_OPERATORS = {
+    "eq": lambda value, arg: value is not None and str(value) == arg,
+    "neq": lambda value, arg: value is None or str(value) != arg,
+    "gt": lambda value, arg: value is not None and str(value) > arg,
+    "gte": lambda value, arg: value is not None and str(value) >= arg,
+    "lt": lambda value, arg: value is not None and str(value) < arg,
+    "lte": lambda value, arg: value is not None and str(value) <= arg,
+    "is": lambda value, arg: (value is None) if arg == "null" else str(value).lower() == arg,
+}
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _parse_in_list(arg: str) -> set:
+    """Разбор in.(a,"b c",d) с учетом кавычек"""
+    items, current, quoted = [], "", False
+    for char in arg.strip("()"):
+        if char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    items.append(current)
+    return set(items)
+
+
+def _row_filter(column: str, expression: str):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, arg = expression.partition(".")
+
+    if operator == "in":
+        values = _parse_in_list(arg)
+        check = lambda row: row.get(column) is not None and str(row.get(column)) in values
+    else:
+        compare = _OPERATORS[operator]
+        check = lambda row: compare(row.get(column), arg)
+
+    return (lambda row: not check(row)) if negate else check
+
+
+class FakePostgrest:
+    """In-memory PostgREST: таблицы - списки словарей"""
+
+    def __init__(self, latency: float = 0.0, unique: dict = None):
+        self.tables = {}
+        self.latency = latency
+        # {"appointments": [("psychologist_name", "appointment_time")]}
+        self.unique = unique or {}
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self._next_id = 1
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.bytes_sent = 0
+
+    def seed(self, table: str, rows: list):
+        self.tables.setdefault(table, []).extend(rows)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.url.path
+        if "/rest/v1/" not in path:
+            return httpx.Response(404, json={"message": "not found"})
+        table = path.split("/rest/v1/", 1)[1].strip("/")
+        self.calls[(table, request.method)] += 1
+
+        params = request.url.params
+        filters = [
+            _row_filter(column, expression)
+            for column, expression in params.multi_items()
+            if column not in _RESERVED_PARAMS
+        ]
+        rows = self.tables.setdefault(table, [])
+
+        if request.method == "GET":
+            result, total = self._select(rows, filters, params)
+            return self._respond(200, result, total)
+
+        if request.method == "POST":
+            body = json.loads(request.content or b"[]")
+            payload = body if isinstance(body, list) else [body]
+            prefer = request.headers.get("prefer", "")
+            if "merge-duplicates" in prefer or "ignore-duplicates" in prefer:
+                conflict = (params.get("on_conflict") or "id").split(",")
+                return self._upsert(table, rows, payload, conflict, ignore="ignore-duplicates" in prefer)
+            return self._insert(table, rows, payload)
+
+        if request.method == "PATCH":
+            changes = json.loads(request.content or b"{}")
+            matched = [row for row in rows if all(check(row) for check in filters)]
+            for row in matched:
+                row.update(changes)
+            return self._respond(200, matched, len(matched))
+
+        if request.method == "DELETE":
+            matched = [row for row in rows if all(check(row) for check in filters)]
+            self.tables[table] = [row for row in rows if row not in matched]
+            return self._respond(200, matched, len(matched))
+
+        return httpx.Response(405, json={"message": "method not allowed"})
+
+    def _select(self, rows, filters, params):
+        result = [row for row in rows if all(check(row) for check in filters)]
+        total = len(result)
+
+        order = params.get("order")
+        if order:
+            for clause in reversed(order.split(",")):
+                column, _, direction = clause.partition(".")
+                result.sort(
+                    key=lambda row: (row.get(column) is None, str(row.get(column))),
+                    reverse=direction.startswith("desc")
+                )
+
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        result = result[offset:offset + int(limit)] if limit else result[offset:]
+
+        select = params.get("select", "*")
+        if select != "*":
+            columns = select.split(",")
+            result = [{column: row.get(column) for column in columns} for row in result]
+        return result, total
+
+    def _violates_unique(self, table, rows, row):
+        for columns in self.unique.get(table, []):
+            key = tuple(row.get(column) for column in columns)
+            if any(tuple(existing.get(column) for column in columns) == key for existing in rows):
+                return columns
+        return None
+
+    def _insert(self, table, rows, payload):
+        for row in payload:
+            violated = self._violates_unique(table, rows, row)
+            if violated:
+                return httpx.Response(409, json={
+                    "code": "23505",
+                    "message": f'duplicate key value violates unique constraint "{table}_{"_".join(violated)}_key"',
+                    "details": None,
+                    "hint": None
+                })
+        inserted = []
+        for row in payload:
+            row = {"id": self._next_id, **row}
+            self._next_id += 1
+            rows.append(row)
+            inserted.append(row)
+        return self._respond(201, inserted, len(inserted))
+
+    def _upsert(self, table, rows, payload, conflict, ignore: bool = False):
+        result = []
+        for row in payload:
+            key = tuple(row.get(column) for column in conflict)
+            existing = next(
+                (item for item in rows if tuple(item.get(column) for column in conflict) == key),
+                None
+            )
+            if existing is not None:
+                if not ignore:
+                    existing.update(row)
+                    result.append(existing)
+            else:
+                row = {"id": self._next_id, **row}
+                self._next_id += 1
+                rows.append(row)
+                result.append(row)
+        return self._respond(201, result, len(result))
+
+    def _respond(self, status: int, rows: list, total: int) -> httpx.Response:
+        body = json.dumps(rows, ensure_ascii=False).encode()
+        self.bytes_sent += len(body)
+        return httpx.Response(
+            status,
+            content=body,
+            headers={
+                "content-type": "application/json",
+                "content-range": f"0-{max(total - 1, 0)}/{total}"
+            }
+        )
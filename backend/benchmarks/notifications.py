@@ -0,0 +1,58 @@
+"""Бенчмарк рассылки дайджестов на FakePostgrest и MemorySink.
+
+Запуск из каталога backend:
+    python -m benchmarks.notifications --users 5000 --workers 64 --rate 500
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.seed import make_user_rows
+from benchmarks.run import BACKEND_DIR, _configure_env
+
+
+async def bench(args):
+    _configure_env()
+    sys.path.insert(0, str(BACKEND_DIR / "app"))
+    from db.supabase_client import SupabaseClient, create_http_client
+    from services.notification_service import NotificationService, MemorySink, DEFAULT_CHANNEL
+
+    fake = FakePostgrest(latency=args.latency_ms / 1000)
+    fake.seed("user_data", make_user_rows(args.users, seed=args.seed))
+    db = SupabaseClient(http_client=create_http_client(fake.transport()))
+    sink = MemorySink(fail_first=args.fail_first, latency=args.sink_latency_ms / 1000)
+    service = NotificationService(
+        db,
+        sinks={DEFAULT_CHANNEL: sink},
+        workers=args.workers,
+        rate_limits={DEFAULT_CHANNEL: args.rate} if args.rate else None,
+        retry_base_delay=0.01,
+        page_size=args.page_size
+    )
+
+    stats = await service.send_daily_digests()
+    await db.aclose()
+    print(
+        f"users={stats['users']} digests={stats['digests']} sent={stats['sent']} failed={stats['failed']} "
+        f"retries={stats['retries']} elapsed={stats['elapsed']}s "
+        f"users/s={stats['users'] / stats['elapsed']:.0f} db_calls={fake.total_calls} "
+        f"db_MB={fake.bytes_sent / 1024 / 1024:.1f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0, help="отправок в секунду на канал, 0 - без ограничения")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="задержка одного запроса к БД")
+    parser.add_argument("--sink-latency-ms", type=float, default=20.0, help="задержка одной отправки")
+    parser.add_argument("--fail-first", type=int, default=0, help="сколько первых отправок завершить ошибкой")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(bench(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
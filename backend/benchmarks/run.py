@@ -0,0 +1,405 @@
+"""Нагрузочный бенчмарк сервисов на локальной замене Supabase.
+
+Приложения FastAPI запускаются в процессе (httpx.ASGITransport), запросы к
+PostgREST обслуживает FakePostgrest с заданной задержкой. Для каждого
+эндпоинта выводятся req/s, p50/p99 латентности, число запросов к БД и объем
+данных из БД на один HTTP-запрос.
+
+Запуск из каталога backend:
+    python -m benchmarks.run backend --users 500 --requests 2000 --concurrency 1,16,64
+    python -m benchmarks.run psychologist --history-weeks 104
+    python -m benchmarks.run serialization
+    python -m benchmarks.run projection --latency-ms 2
+    python -m benchmarks.run all
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.seed import make_user_rows, make_appointments, share_group_schedules
+from benchmarks.seed import make_week_schedule, make_tasks, make_reports
+
+# Формат JWT нужен только для валидации ключа в supabase-клиенте
+FAKE_SERVICE_KEY = "bench.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.signature"
+
+
+def _configure_env(cold: bool = False):
+    os.environ["SUPABASE_URL"] = "http://supabase.bench"
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = FAKE_SERVICE_KEY
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Локальный кэш снимков - во временном каталоге, а не в app/data
+    os.environ.setdefault("LOCAL_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "snapshots.sqlite3"))
+    if cold:
+        # Нулевой размер кэша: каждый запрос идет в БД
+        os.environ["USER_CACHE_SIZE"] = "0"
+
+
+def load_backend(fake: FakePostgrest, cold: bool = False):
+    _configure_env(cold)
+    sys.path.insert(0, str(BACKEND_DIR / "app"))
+    main = importlib.import_module("main")
+    from db.supabase_client import supabase_client, create_http_client
+    supabase_client._http_client = create_http_client(fake.transport())
+    return main.app
+
+
+def load_psychologist(fake: FakePostgrest):
+    _configure_env()
+    sys.path.insert(0, str(BACKEND_DIR / "psychologist_service"))
+    main = importlib.import_module("main")
+    repository = importlib.import_module("repository")
+    repository._http_client = repository.create_http_client(fake.transport())
+    return main.app
+
+
+def backend_scenarios(uids: list):
+    today = date.today()
+    week_from = (today - timedelta(days=today.weekday())).isoformat()
+    week_to = (today - timedelta(days=today.weekday()) + timedelta(days=6)).isoformat()
+    return [
+        ("GET /tasks/", lambda rng: ("GET", f"/tasks/?uid={rng.choice(uids)}", None)),
+        ("GET /marks/", lambda rng: ("GET", f"/marks/?uid={rng.choice(uids)}", None)),
+        ("GET /reports/", lambda rng: ("GET", f"/reports/?uid={rng.choice(uids)}", None)),
+        ("GET /profile/", lambda rng: ("GET", f"/profile/?uid={rng.choice(uids)}", None)),
+        ("GET /schedule/", lambda rng: ("GET", f"/schedule/?uid={rng.choice(uids)}", None)),
+        ("GET /schedule/week", lambda rng: ("GET", f"/schedule/week?uid={rng.choice(uids)}", None)),
+        ("GET /schedule/range", lambda rng: (
+            "GET", f"/schedule/range?uid={rng.choice(uids)}&from={week_from}&to={week_to}", None
+        )),
+        ("GET /teachers/?search=", lambda rng: (
+            "GET", f"/teachers/?search={rng.choice(['Иван', 'петр', 'Кузнецва', 'смирнов д'])}", None
+        )),
+        ("GET /rooms/free", lambda rng: (
+            "GET", f"/rooms/free?at={week_from}T{rng.choice(['09:45', '11:30', '13:10', '16:00'])}&duration=90", None
+        )),
+        ("POST /users/batch x200", lambda rng: ("POST", "/users/batch", {
+            "uids": rng.sample(uids, min(200, len(uids))),
+            "fields": ["profile", "tomorrow_schedule", "tasks"]
+        })),
+    ]
+
+
+def psychologist_scenarios(schedule: dict, uids: list):
+    names = list(schedule)
+    weekday_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+    def working_day(rng, name):
+        while True:
+            day = date.today() + timedelta(days=rng.randint(0, 27))
+            if weekday_names[day.weekday()] in schedule[name]:
+                return day
+
+    def booking(rng):
+        name = rng.choice(names)
+        day = working_day(rng, name)
+        start, end = rng.choice(schedule[name][weekday_names[day.weekday()]])
+        hour = rng.randrange(start.hour, end.hour)
+        return ("POST", "/appointments", {
+            "user_id": rng.choice(uids),
+            "psychologist_name": name,
+            "appointment_time": f"{day.isoformat()}T{hour:02d}:00:00",
+        })
+
+    def slots(rng):
+        name = rng.choice(names)
+        return ("GET", "/available_slots", {"psychologist_name": name, "date": working_day(rng, name).isoformat()})
+
+    def day_schedule(rng):
+        name = rng.choice(names)
+        return ("GET", f"/schedule/{name}", {"date": working_day(rng, name).isoformat()})
+
+    return [
+        ("GET /available_slots", slots),
+        ("GET /schedule/{name}", day_schedule),
+        ("GET /next_available", lambda rng: ("GET", "/next_available", {"days": 28, "limit": 10})),
+        ("GET /next_available?name", lambda rng: (
+            "GET", "/next_available", {"psychologist_name": rng.choice(names), "days": 28, "limit": 10}
+        )),
+        ("GET /appointments/{user_id}", lambda rng: ("GET", f"/appointments/{rng.choice(uids)}", None)),
+        ("POST /appointments", booking),
+    ]
+
+
+async def _send(client, method, path, payload):
+    if method == "GET" and isinstance(payload, dict):
+        return await client.get(path, params=payload)
+    if method == "GET":
+        return await client.get(path)
+    return await client.post(path, json=payload)
+
+
+async def run_scenario(client, fake, make_request, total: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    requests = [make_request(rng) for _ in range(total)]
+
+    async def call(request):
+        response = await _send(client, *request)
+        return response.status_code
+
+    return await measure(fake, call, requests, concurrency)
+
+
+async def measure(fake, call, requests: list, concurrency: int) -> dict:
+    """Выполняет call(request) для каждого запроса; call возвращает код статуса"""
+    total = len(requests)
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(request):
+        async with semaphore:
+            start = time.perf_counter()
+            status = await call(request)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    fake.reset_stats()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "rps": total / elapsed,
+        "p50": quantiles[49] * 1000,
+        "p99": quantiles[98] * 1000,
+        "db_calls": fake.total_calls / total,
+        "db_kb": fake.bytes_sent / total / 1024,
+        "statuses": statuses,
+    }
+
+
+async def run_contention(client, fake, schedule: dict, uids: list, args):
+    """Все запросы одновременно бронируют один и тот же свободный слот: успешным должен быть ровно один"""
+    weekday_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    name = next(iter(schedule))
+    # За пределами окна случайных бронирований (28 дней), чтобы слот был свободен
+    day = date.today() + timedelta(days=60)
+    while weekday_names[day.weekday()] not in schedule[name]:
+        day += timedelta(days=1)
+    start, _ = schedule[name][weekday_names[day.weekday()]][0]
+
+    def booking(rng):
+        return ("POST", "/appointments", {
+            "user_id": rng.choice(uids),
+            "psychologist_name": name,
+            "appointment_time": f"{day.isoformat()}T{start.hour:02d}:00:00",
+        })
+
+    result = await run_scenario(client, fake, booking, args.requests, args.requests, args.seed)
+    if result["statuses"].get(200, 0) != 1:
+        print(f"WARNING: слот {day} {start} забронирован {result['statuses'].get(200, 0)} раз", file=sys.stderr)
+    return ("POST /appointments one slot", args.requests, result)
+
+
+def print_report(title: str, rows: list):
+    print(f"\n{title}")
+    header = f"{'endpoint':<30} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'db/req':>7} {'dbKB/req':>9}  statuses"
+    print(header)
+    print("-" * len(header))
+    for name, concurrency, result in rows:
+        statuses = ",".join(f"{code}:{count}" for code, count in sorted(result["statuses"].items()))
+        print(
+            f"{name:<30} {concurrency:>5} {result['rps']:>9.1f} {result['p50']:>8.2f} {result['p99']:>8.2f} "
+            f"{result['db_calls']:>7.2f} {result['db_kb']:>9.1f}  {statuses}"
+        )
+
+
+async def bench(service: str, args):
+    fake = FakePostgrest(
+        latency=args.latency_ms / 1000,
+        unique={"appointments": [("psychologist_name", "appointment_time")]}
+    )
+    user_rows = make_user_rows(args.users, seed=args.seed)
+    uids = [row["user_id"] for row in user_rows]
+    if args.group_schedules:
+        fake.seed("group_schedules", share_group_schedules(user_rows))
+    fake.seed("user_data", user_rows)
+    fake.seed("users", [{"UID": uid} for uid in uids])
+
+    if service == "backend":
+        app = load_backend(fake, args.cold)
+        scenarios = backend_scenarios(uids)
+    else:
+        app = load_psychologist(fake)
+        schedule = importlib.import_module("service").psychologists_schedule
+        fake.seed("appointments", make_appointments(schedule, args.users, args.history_weeks, seed=args.seed))
+        scenarios = psychologist_scenarios(schedule, uids)
+
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario[0]]
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name, make_request in scenarios:
+            # Прогрев: инициализация клиента Supabase и JIT-кэшей
+            await run_scenario(client, fake, make_request, min(20, args.requests), 4, args.seed + 1)
+            for concurrency in args.concurrency:
+                result = await run_scenario(client, fake, make_request, args.requests, concurrency, args.seed)
+                rows.append((name, concurrency, result))
+
+        if service == "psychologist" and (not args.only or args.only in "POST /appointments one slot"):
+            rows.append(await run_contention(client, fake, schedule, uids, args))
+
+    print_report(
+        f"{service}: users={args.users} requests={args.requests} db_latency={args.latency_ms}ms"
+        + (" cold" if args.cold else "")
+        + (" group_schedules" if args.group_schedules else ""),
+        rows
+    )
+
+
+async def bench_projection(args):
+    """Чтение user_data только колонок эндпоинта против select("*"), без кэша снимков:
+    объем ответа БД и латентность с разбором JSON"""
+    fake = FakePostgrest(latency=args.latency_ms / 1000)
+    user_rows = make_user_rows(args.users, seed=args.seed)
+    uids = [row["user_id"] for row in user_rows]
+    fake.seed("user_data", user_rows)
+    load_backend(fake, cold=True)
+    from db import models
+    from db.supabase_client import supabase_client
+
+    endpoints = [
+        ("/profile", models.PROFILE_COLUMNS),
+        ("/tasks", models.TASKS_COLUMNS),
+        ("/marks", models.MARKS_COLUMNS),
+        ("/reports", models.REPORTS_COLUMNS),
+        ("/schedule/week", models.WEEK_SCHEDULE_COLUMNS),
+    ]
+    rng = random.Random(args.seed)
+    requests = [rng.choice(uids) for _ in range(args.requests)]
+    rows = []
+    for concurrency in args.concurrency:
+        for name, columns in endpoints:
+            for label, projection in (("select *", None), ("projection", columns)):
+                async def call(uid, projection=projection):
+                    # None - select("*"), как до перехода на проекции
+                    return 200 if await supabase_client._load_user_data(uid, projection) else 404
+
+                await measure(fake, call, requests[:20], 4)
+                rows.append((f"{name} {label}", concurrency, await measure(fake, call, requests, concurrency)))
+    print_report(f"projection: users={args.users} requests={args.requests} db_latency={args.latency_ms}ms", rows)
+    await supabase_client.aclose()
+
+
+def _call_ms(fn, rounds: int = 5, number: int = 20) -> float:
+    """Медиана времени одного вызова fn в мс по rounds замерам из number вызовов"""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return statistics.median(timings) * 1000
+
+
+def serialization_payloads(seed: int) -> list:
+    rng = random.Random(seed)
+    monday = date.today() - timedelta(days=date.today().weekday())
+    return [
+        ("/schedule/week", {"success": True, "schedule": make_week_schedule(rng, "4031", monday)}),
+        ("/tasks x300", {"success": True, "tasks": make_tasks(rng, 300)}),
+        ("/reports x300", {"success": True, "reports": make_reports(rng, 300)}),
+    ]
+
+
+def bench_serialization(args):
+    """Кодирование ответов: стандартный json (JSONResponse FastAPI) против orjson
+    (FastJSONResponse приложения) и объем после сжатия с настройками main.py"""
+    import gzip
+    import json
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    def stdlib(payload):
+        return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def fast(payload):
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+    # enc+ - вместе с jsonable_encoder, который FastAPI вызывает перед render для dict из маршрута
+    print("\nserialization: медиана 5 замеров по 20 вызовов, время в мс")
+    header = (
+        f"{'payload':<16} {'KB':>7} {'json ms':>8} {'orjson ms':>10} {'x':>5} "
+        f"{'enc+json':>9} {'enc+orjson':>11} {'gzip KB':>8} {'br KB':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, payload in serialization_payloads(args.seed):
+        body = fast(payload)
+        if json.loads(stdlib(payload)) != orjson.loads(body):
+            print(f"WARNING: {name}: json и orjson дают разные документы", file=sys.stderr)
+        json_ms = _call_ms(lambda: stdlib(payload))
+        orjson_ms = _call_ms(lambda: fast(payload))
+        encoded_json_ms = _call_ms(lambda: stdlib(jsonable_encoder(payload)))
+        encoded_orjson_ms = _call_ms(lambda: fast(jsonable_encoder(payload)))
+        gzip_kb = len(gzip.compress(body, compresslevel=6)) / 1024
+        brotli_kb = f"{len(brotli.compress(body, quality=4)) / 1024:.1f}" if brotli else "-"
+        print(
+            f"{name:<16} {len(body) / 1024:>7.1f} {json_ms:>8.3f} {orjson_ms:>10.3f} {json_ms / orjson_ms:>5.1f} "
+            f"{encoded_json_ms:>9.3f} {encoded_orjson_ms:>11.3f} {gzip_kb:>8.1f} {brotli_kb:>7}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["backend", "psychologist", "serialization", "projection", "all"])
+    parser.add_argument("--users", type=int, default=200, help="количество строк user_data")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument(
+        "--concurrency", default="32",
+        type=lambda value: [int(item) for item in value.split(",")],
+        help="одновременных запросов; список через запятую для проверки масштабирования"
+    )
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="задержка одного запроса к БД")
+    parser.add_argument("--history-weeks", type=int, default=52, help="недель истории записей к психологам")
+    parser.add_argument(
+        "--group-schedules", action="store_true",
+        help="хранить расписания в group_schedules (ссылки из user_data)"
+    )
+    parser.add_argument("--cold", action="store_true", help="отключить кэши снимков пользователей")
+    parser.add_argument("--only", help="запускать только сценарии, содержащие подстроку")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.service == "all":
+        # Каждый сервис - в своем процессе: у них общие имена модулей (main) и метрик
+        for service in ("backend", "psychologist", "serialization", "projection"):
+            forwarded = [arg for arg in (argv or sys.argv[1:]) if arg != "all"]
+            subprocess.run([sys.executable, "-m", "benchmarks.run", service, *forwarded], cwd=BACKEND_DIR, check=True)
+        return
+    if args.service == "serialization":
+        bench_serialization(args)
+        return
+    if args.service == "projection":
+        asyncio.run(bench_projection(args))
+        return
+    asyncio.run(bench(args.service, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Генерация реалистичных строк user_data и appointments для бенчмарков.
+
+Структура документов повторяет то, что сохраняют парсер и миниапп:
+week_schedule с днями и занятиями, задачи, оценки, отчеты и профиль.
+"""
+import hashlib
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+SUBJECTS = [
+    "Математический анализ", "Линейная алгебра", "Физика", "Программирование",
+    "Базы данных", "Операционные системы", "Теория вероятностей", "Английский язык",
+    "Электротехника", "Дискретная математика", "Компьютерные сети", "Философия",
+]
+TEACHERS = [
+    ("Иванов И.И.", "доцент"), ("Петрова А.С.", "профессор"), ("Сидоров П.П.", "ст. преподаватель"),
+    ("Кузнецова Е.В.", "доцент"), ("Смирнов Д.А.", "ассистент"), ("Попова М.Н.", "доцент"),
+]
+BUILDINGS = ["Б.Морская 67", "Гастелло 15", "Ленсовета 14"]
+TIME_RANGES = ["9:30-11:00", "11:10-12:40", "13:00-14:30", "15:00-16:30", "16:40-18:10", "18:30-20:00"]
+CLASS_TYPES = ["Л", "ПР", "ЛР"]
+DAY_NAMES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+TASK_STATUSES = [("accepted", "принят"), ("pending", "ожидает проверки"), ("rejected", "отклонен"), ("new", "не загружен")]
+
+
+def make_week_schedule(rng: random.Random, group: str, monday: date) -> dict:
+    days = []
+    for offset in range(6):
+        day_date = monday + timedelta(days=offset)
+        pairs = sorted(rng.sample(range(1, len(TIME_RANGES) + 1), rng.randint(2, 4)))
+        classes = []
+        for pair in pairs:
+            teacher, info = rng.choice(TEACHERS)
+            classes.append({
+                "pairNumber": str(pair),
+                "timeRange": TIME_RANGES[pair - 1],
+                "type": rng.choice(CLASS_TYPES),
+                "subject": rng.choice(SUBJECTS),
+                "teacher": teacher,
+                "teacherInfo": info,
+                "group": group,
+                "building": rng.choice(BUILDINGS),
+                "location": f"{rng.randint(1, 5)}{rng.randint(10, 40)}",
+            })
+        days.append({
+            "date": day_date.strftime("%d.%m"),
+            "fullDate": day_date.isoformat(),
+            "dayName": DAY_NAMES[offset],
+            "order": offset + 1,
+            "classes": classes,
+        })
+
+    iso_year, iso_week, _ = monday.isocalendar()
+    return {
+        "days": days,
+        "extraClasses": [],
+        "metadata": {
+            "week_number": iso_week,
+            "year": iso_year,
+            "is_even_week": iso_week % 2 == 0,
+            "schedule_updated_at": datetime.now().isoformat(),
+        },
+    }
+
+
+def make_tasks(rng: random.Random, count: int) -> list:
+    tasks = []
+    for number in range(1, count + 1):
+        teacher, _ = rng.choice(TEACHERS)
+        code, text = rng.choice(TASK_STATUSES)
+        deadline = date.today() + timedelta(days=rng.randint(-60, 60))
+        tasks.append({
+            "task": {
+                "id": str(100000 + number),
+                "number": number,
+                "name": f"Лабораторная работа №{number}",
+                "type": "Лабораторная работа",
+                "link": f"https://pro.guap.ru/inside/student/tasks/{100000 + number}",
+            },
+            "subject": {"name": rng.choice(SUBJECTS), "link": ""},
+            "teacher": {"full_name": teacher, "link": ""},
+            "deadline": {"date": deadline.isoformat(), "text": deadline.strftime("%d.%m.%Y")},
+            "score": {"achieved": rng.randint(0, 10), "max": 10},
+            "status": {"code": code, "text": text, "additional_text": ""},
+        })
+    return tasks
+
+
+def make_marks(rng: random.Random, count: int) -> list:
+    marks = []
+    for _ in range(count):
+        semester = rng.randint(1, 8)
+        value = rng.choice([None, 3, 4, 5])
+        marks.append({
+            "subject": {"name": rng.choice(SUBJECTS), "url": "", "code": ""},
+            "semester": {"number": semester, "text": f"{semester} семестр"},
+            "control": {
+                "type": None,
+                "typeText": rng.choice(["Экзамен", "Зачет", "Дифф. зачет"]),
+                "value": value,
+                "text": str(value) if value else "нет",
+                "status": "graded" if value else "pending",
+            },
+            "credits": {"value": rng.randint(2, 6), "text": ""},
+            "teachers": [{"name": rng.choice(TEACHERS)[0]}],
+        })
+    return marks
+
+
+def make_reports(rng: random.Random, count: int) -> list:
+    reports = []
+    for number in range(1, count + 1):
+        teacher, _ = rng.choice(TEACHERS)
+        code, text = rng.choice(TASK_STATUSES[:3])
+        uploaded = date.today() - timedelta(days=rng.randint(0, 120))
+        reports.append({
+            "task": {"id": str(200000 + number), "number": number, "name": f"Отчет по лабораторной №{number}",
+                     "type": "Отчет", "link": ""},
+            "teacher": {"full_name": teacher, "link": ""},
+            "load_date": {"date": uploaded.isoformat(), "text": uploaded.strftime("%d.%m.%Y")},
+            "score": {"achieved": rng.randint(0, 10), "max": 10, "is_empty": False},
+            "status": {"code": code, "text": text, "additional_text": ""},
+            "attachments": {"download_url": "", "has_attachment": True},
+        })
+    return reports
+
+
+def make_user_rows(count: int, seed: int = 42, tasks: int = 60, marks: int = 40, reports: int = 50) -> list:
+    """Строки user_data: студенты распределены по группам по 25 человек"""
+    rng = random.Random(seed)
+    monday = date.today() - timedelta(days=date.today().weekday())
+    group_schedules = {}
+    rows = []
+    stamp = datetime.now().isoformat()
+
+    for index in range(count):
+        group = f"{4000 + index // 25}"
+        if group not in group_schedules:
+            group_schedules[group] = make_week_schedule(rng, group, monday)
+        week_schedule = group_schedules[group]
+        today_day = next((day for day in week_schedule["days"] if day["fullDate"] == date.today().isoformat()), None)
+
+        rows.append({
+            "id": index + 1,
+            "user_id": f"00000000-0000-4000-8000-{index:012d}",
+            "profile": {
+                "full_name": f"Студент {index}",
+                "group": group,
+                "student_id": f"{2020000 + index}",
+                "study_form": "очная",
+                "institute": "Институт №4",
+            },
+            "week_schedule": week_schedule,
+            "today_schedule": {
+                "date": date.today().isoformat(),
+                "date_dd_mm": date.today().strftime("%d.%m"),
+                "day_name": DAY_NAMES[date.today().weekday()],
+                "day_of_week": date.today().weekday(),
+                "schedule": today_day["classes"] if today_day else [],
+                "has_schedule": bool(today_day),
+                "metadata": week_schedule["metadata"],
+            },
+            "tasks": make_tasks(rng, tasks),
+            "marks": make_marks(rng, marks),
+            "reports": make_reports(rng, reports),
+            "materials": [],
+            "updated_at": stamp,
+            "schedule_updated_at": stamp,
+            "tasks_updated_at": stamp,
+            "reports_updated_at": stamp,
+        })
+    return rows
+
+
+def share_group_schedules(rows: list) -> list:
+    """Переводит строки на общие расписания групп: week_schedule -> week_schedule_ref.
+
+    Возвращает строки group_schedules; today_schedule остается в строках как есть.
+    """
+    shared = {}
+    for row in rows:
+        schedule = row["week_schedule"]
+        digest = hashlib.sha1(json.dumps(schedule, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+        shared.setdefault(digest, {
+            "hash": digest,
+            "group_name": row["profile"]["group"],
+            "year": schedule["metadata"]["year"],
+            "week_number": schedule["metadata"]["week_number"],
+            "schedule": schedule,
+        })
+        row["week_schedule"] = None
+        row["week_schedule_ref"] = digest
+    return list(shared.values())
+
+
+def make_appointments(schedule: dict, users: int, weeks: int, seed: int = 42) -> list:
+    """История записей к психологам: заполненные рабочие часы за прошедшие недели"""
+    rng = random.Random(seed)
+    weekday_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    start = date.today() - timedelta(weeks=weeks)
+    rows = []
+    for offset in range(weeks * 7):
+        day = start + timedelta(days=offset)
+        for psychologist, template in schedule.items():
+            for start_time, end_time in template.get(weekday_names[day.weekday()], []):
+                for hour in range(start_time.hour, end_time.hour):
+                    if rng.random() < 0.7:
+                        rows.append({
+                            "user_id": f"00000000-0000-4000-8000-{rng.randrange(users):012d}",
+                            "psychologist_name": psychologist,
+                            "appointment_time": datetime.combine(day, time(hour, 0)).isoformat(),
+                            "notes": None,
+                        })
+    return rows
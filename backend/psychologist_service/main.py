@@ -1,18 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from schemas import AppointmentCreate
 from service import create_appointment, get_user_appointments
-from service import get_available_slots, get_schedule_for_psychologist
+from service import get_available_slots, get_schedule_for_psychologist, find_next_available
+from repository import close_supabase, SlotTakenError
+from metrics import MetricsMiddleware, metrics_response
 from datetime import datetime
 from fastapi import Query
 
 
-app = FastAPI(title="Psychologist Appointment Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_supabase()
+
+
+app = FastAPI(title="Psychologist Appointment Service", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return metrics_response()
 
 @app.post("/appointments")
 async def post_appointment(appointment: AppointmentCreate):
     try:
         new_appt = await create_appointment(appointment.dict())
         return {"message": "Запись создана", "appointment": new_appt}
+    except SlotTakenError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except Exception as e:
@@ -49,3 +67,27 @@ async def psychologist_schedule(psychologist_name: str, date: str = Query(...)):
         return {"schedule": schedule}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/next_available")
+async def next_available(
+    psychologist_name: str | None = Query(None),
+    date_from: str | None = Query(None, alias="from"),
+    days: int = Query(14, ge=1, le=92),
+    limit: int = Query(5, ge=1, le=100)
+):
+    """
+    Ближайшие свободные слоты одного или всех психологов в окне дат
+    """
+    try:
+        not_before = datetime.fromisoformat(date_from) if date_from else datetime.now()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Некорректная дата from")
+    if not_before.tzinfo is not None:
+        # Слоты считаются в локальном времени сервиса без зоны
+        not_before = not_before.astimezone().replace(tzinfo=None)
+    try:
+        slots = await find_next_available(psychologist_name, not_before, days, limit)
+        return {"slots": slots}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
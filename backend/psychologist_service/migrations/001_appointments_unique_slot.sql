@@ -0,0 +1,38 @@
+-- Один слот психолога может быть занят только одной записью.
+-- Индекс также обслуживает выборку записей психолога за день (gte/lt по appointment_time).
+--
+-- Выполнять вне транзакции (psql -f без --single-transaction; в SQL Editor
+-- Supabase - без BEGIN): CREATE INDEX CONCURRENTLY внутри транзакции не работает.
+--
+-- Если построение индекса прервалось (например, между очисткой и построением
+-- успел появиться новый дубль), остается индекс в состоянии INVALID, и
+-- IF NOT EXISTS его пропустит. Проверка:
+--   SELECT indisvalid FROM pg_index WHERE indexrelid = 'appointments_psychologist_slot_key'::regclass;
+-- Тогда выполнить DROP INDEX CONCURRENTLY appointments_psychologist_slot_key;
+-- и запустить файл заново.
+
+-- 1. Дубли слота, накопившиеся до индекса: остается самая ранняя запись,
+--    остальные переносятся в appointments_duplicates, чтобы с пользователями
+--    можно было связаться.
+CREATE TABLE IF NOT EXISTS appointments_duplicates (LIKE appointments);
+
+WITH ranked AS (
+    SELECT ctid,
+           row_number() OVER (
+               PARTITION BY psychologist_name, appointment_time
+               ORDER BY created_at, id
+           ) AS position
+    FROM appointments
+),
+removed AS (
+    DELETE FROM appointments a
+    USING ranked r
+    WHERE a.ctid = r.ctid AND r.position > 1
+    RETURNING a.*
+)
+INSERT INTO appointments_duplicates
+SELECT * FROM removed;
+
+-- 2. Уникальный индекс без блокировки записи в таблицу
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS appointments_psychologist_slot_key
+    ON appointments (psychologist_name, appointment_time);
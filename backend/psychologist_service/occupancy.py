@@ -0,0 +1,99 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+
+def hour_bit(hour: int) -> int:
+    return 1 << hour
+
+
+def is_occupied(bitmap: int, hour: int) -> bool:
+    return bool(bitmap & hour_bit(hour))
+
+
+def local_time(value) -> datetime:
+    """Время записи в локальной зоне сервиса без tzinfo.
+
+    Слоты и маски занятости считаются в локальном времени, а timestamptz
+    из БД приходит с зоной (+00:00): без приведения час и день сдвигаются.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def bitmap_from_appointments(appointments: list) -> int:
+    """Битовая маска занятых часов дня: бит N - занят час N:00"""
+    bitmap = 0
+    for appt in appointments:
+        bitmap |= hour_bit(local_time(appt["appointment_time"]).hour)
+    return bitmap
+
+
+class OccupancyCache:
+    """
+    Кэш занятости по ключу (психолог, день) -> битовая маска часов.
+    Записи, созданные этим процессом, отмечаются сразу; TTL ограничивает
+    время, на которое можно пропустить записи других инстансов.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, psychologist_name: str, day: date) -> int | None:
+        key = (psychologist_name, day)
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, psychologist_name: str, day: date, bitmap: int):
+        key = (psychologist_name, day)
+        self._data[key] = (bitmap, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def mark(self, psychologist_name: str, appointment_time: datetime):
+        """Отмечает час занятым; если дня нет в кэше, он загрузится при следующем чтении"""
+        appointment_time = local_time(appointment_time)
+        key = (psychologist_name, appointment_time.date())
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data[key] = (entry[0] | hour_bit(appointment_time.hour), entry[1])
+
+    def invalidate(self, psychologist_name: str, day: date):
+        self._data.pop((psychologist_name, day), None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+occupancy_cache = OccupancyCache(
+    maxsize=int(os.getenv("OCCUPANCY_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("OCCUPANCY_CACHE_TTL", "60"))
+)
@@ -1,28 +1,138 @@
 import os
-from supabase import create_client, Client
+import asyncio
+import httpx
+from datetime import datetime
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
+from metrics import timed_execute
+from singleflight import SingleFlight
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# Код ошибки PostgreSQL unique_violation
+UNIQUE_VIOLATION = "23505"
+
+
+class SlotTakenError(Exception):
+    """Слот психолога уже занят (в т.ч. нарушение уникального индекса в БД)"""
+
+# Общий пул keep-alive соединений и асинхронный клиент создаются лениво,
+# т.к. acreate_client требует запущенного event loop
+_http_client: httpx.AsyncClient | None = None
+_supabase: AsyncClient | None = None
+_supabase_lock = asyncio.Lock()
+
+
+def create_http_client(transport=None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50")),
+            max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(float(os.getenv("SUPABASE_TIMEOUT", "10"))),
+        transport=transport
+    )
+
+
+async def get_supabase() -> AsyncClient:
+    global _http_client, _supabase
+    if _supabase is None:
+        async with _supabase_lock:
+            if _supabase is None:
+                if _http_client is None:
+                    _http_client = create_http_client()
+                _supabase = await acreate_client(
+                    SUPABASE_URL,
+                    SUPABASE_SERVICE_ROLE_KEY,
+                    options=AsyncClientOptions(httpx_client=_http_client)
+                )
+    return _supabase
+
+
+async def close_supabase():
+    global _http_client, _supabase
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _supabase = None
+
+
+# Одновременные одинаковые чтения записей выполняются одним запросом
+_reads = SingleFlight("appointments")
+
 
 async def insert_appointment(data: dict):
-    result = supabase.table("appointments").insert(data).execute()
+    supabase = await get_supabase()
+    try:
+        result = await timed_execute(supabase.table("appointments").insert(data), "appointments", "insert")
+    except APIError as e:
+        # Слот заняли параллельно (другой инстанс сервиса) - решает уникальный индекс
+        if e.code == UNIQUE_VIOLATION:
+            _reads.forget()
+            raise SlotTakenError("Данное время уже занято") from e
+        raise
     if hasattr(result, "error") and result.error:
         raise Exception(result.error)
+    # Чтения, начатые до вставки, не должны отдавать старые данные новым вызовам
+    _reads.forget()
     return result.data[0]
 
 async def get_appointments_by_user(user_id: str):
-    result = supabase.table("appointments").select("*").eq("user_id", user_id).execute()
+    return await _reads.do(("user", user_id), _get_appointments_by_user, user_id)
+
+async def _get_appointments_by_user(user_id: str):
+    supabase = await get_supabase()
+    result = await timed_execute(
+        supabase.table("appointments").select("*").eq("user_id", user_id), "appointments", "select"
+    )
     if hasattr(result, "error") and result.error:
         raise Exception(result.error)
     return result.data
 
-async def get_appointments_by_psychologist(psychologist_name: str):
-    result = supabase.table("appointments").select("*").eq("psychologist_name", psychologist_name).execute()
+async def get_appointments_by_psychologist_range(psychologist_name: str, start: datetime, end: datetime):
+    return await _reads.do(
+        ("psychologist_range", psychologist_name, start, end),
+        _get_appointments_by_psychologist_range, psychologist_name, start, end
+    )
+
+async def _get_appointments_by_psychologist_range(psychologist_name: str, start: datetime, end: datetime):
+    """Записи психолога в полуинтервале [start, end); фильтр выполняется в БД"""
+    supabase = await get_supabase()
+    result = await timed_execute(
+        supabase.table("appointments")
+        .select("appointment_time")
+        .eq("psychologist_name", psychologist_name)
+        .gte("appointment_time", start.isoformat())
+        .lt("appointment_time", end.isoformat()),
+        "appointments", "select_range"
+    )
+    if hasattr(result, "error") and result.error:
+        raise Exception(result.error)
+    return result.data
+
+async def get_appointments_in_range(start: datetime, end: datetime, psychologist_names: list | None = None):
+    return await _reads.do(
+        ("range", start, end, tuple(psychologist_names) if psychologist_names else None),
+        _get_appointments_in_range, start, end, psychologist_names
+    )
+
+async def _get_appointments_in_range(start: datetime, end: datetime, psychologist_names: list | None = None):
+    """Записи всех (или перечисленных) психологов в полуинтервале [start, end) одним запросом"""
+    supabase = await get_supabase()
+    query = (
+        supabase.table("appointments")
+        .select("psychologist_name,appointment_time")
+        .gte("appointment_time", start.isoformat())
+        .lt("appointment_time", end.isoformat())
+    )
+    if psychologist_names:
+        query = query.in_("psychologist_name", psychologist_names)
+    result = await timed_execute(query, "appointments", "select_range")
     if hasattr(result, "error") and result.error:
         raise Exception(result.error)
     return result.data
@@ -1,5 +1,13 @@
-from datetime import datetime, time, timedelta
-from repository import insert_appointment, get_appointments_by_psychologist, get_appointments_by_user
+import asyncio
+import heapq
+import itertools
+import weakref
+from datetime import date, datetime, time, timedelta
+from repository import insert_appointment, get_appointments_by_psychologist_range, get_appointments_by_user
+from repository import get_appointments_in_range
+from repository import SlotTakenError
+from occupancy import occupancy_cache, bitmap_from_appointments, is_occupied, hour_bit, local_time
+from metrics import register_cache
 
 psychologists_schedule = {
     "Клепов Дмитрий Олегович": {
@@ -14,6 +22,108 @@ psychologists_schedule = {
     }
 }
 
+register_cache("occupancy", occupancy_cache)
+
+# Блокировки бронирования по (психолог, день); освобождаются вместе с последним ожидающим
+_booking_locks = weakref.WeakValueDictionary()
+
+
+def _booking_lock(psychologist_name: str, day: date) -> asyncio.Lock:
+    key = (psychologist_name, day)
+    lock = _booking_locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _booking_locks[key] = lock
+    return lock
+
+async def get_occupied_hours(psychologist_name: str, day: date) -> int:
+    """
+    Битовая маска занятых часов психолога за день.
+    Из БД читаются только записи этого дня, результат кэшируется.
+    """
+    bitmap = occupancy_cache.get(psychologist_name, day)
+    if bitmap is None:
+        day_start = datetime.combine(day, time(0, 0))
+        appointments = await get_appointments_by_psychologist_range(
+            psychologist_name, day_start, day_start + timedelta(days=1)
+        )
+        bitmap = bitmap_from_appointments(appointments)
+        occupancy_cache.set(psychologist_name, day, bitmap)
+    return bitmap
+
+
+async def load_occupancy_window(psychologist_names: list, first_day: date, days: int) -> dict:
+    """
+    Маски занятости {(психолог, день): маска} для окна дат.
+    Недостающие в кэше дни загружаются одним запросом на все окно.
+    """
+    window = [first_day + timedelta(days=offset) for offset in range(days)]
+    occupancy = {}
+    missing = False
+    for name in psychologist_names:
+        schedule = psychologists_schedule[name]
+        for day in window:
+            if day.strftime("%A") not in schedule:
+                continue
+            bitmap = occupancy_cache.get(name, day)
+            if bitmap is None:
+                missing = True
+            occupancy[(name, day)] = bitmap
+
+    if missing:
+        window_start = datetime.combine(first_day, time(0, 0))
+        appointments = await get_appointments_in_range(
+            window_start, window_start + timedelta(days=days), psychologist_names
+        )
+        loaded = dict.fromkeys(occupancy, 0)
+        for appt in appointments:
+            appt_time = local_time(appt["appointment_time"])
+            key = (appt["psychologist_name"], appt_time.date())
+            if key in loaded:
+                loaded[key] |= hour_bit(appt_time.hour)
+        for (name, day), bitmap in loaded.items():
+            occupancy_cache.set(name, day, bitmap)
+        occupancy = loaded
+    return occupancy
+
+
+def _free_slots(psychologist_name: str, occupancy: dict, window: list, not_before: datetime):
+    """Свободные слоты психолога по возрастанию времени"""
+    schedule = psychologists_schedule[psychologist_name]
+    for day in window:
+        bitmap = occupancy.get((psychologist_name, day))
+        if bitmap is None:
+            continue
+        for start, end in schedule[day.strftime("%A")]:
+            for hour in range(start.hour, end.hour):
+                slot = datetime.combine(day, time(hour, 0))
+                if slot >= not_before and not is_occupied(bitmap, hour):
+                    yield slot, psychologist_name
+
+
+async def find_next_available(psychologist_name: str | None, not_before: datetime, days: int, limit: int):
+    """
+    Первые limit свободных слотов одного или всех психологов, начиная с not_before.
+    Занятость окна загружается одним запросом, слоты психологов сливаются по времени.
+    """
+    if psychologist_name is None:
+        names = list(psychologists_schedule)
+    elif psychologist_name in psychologists_schedule:
+        names = [psychologist_name]
+    else:
+        return []
+
+    first_day = not_before.date()
+    window = [first_day + timedelta(days=offset) for offset in range(days)]
+    occupancy = await load_occupancy_window(names, first_day, days)
+
+    merged = heapq.merge(*(_free_slots(name, occupancy, window, not_before) for name in names))
+    return [
+        {"psychologist_name": name, "time": slot.isoformat()}
+        for slot, name in itertools.islice(merged, limit)
+    ]
+
+
 async def get_available_slots(psychologist_name: str, date: datetime):
     """
     Возвращает список доступных часов для записи на конкретного психолога в конкретный день.
@@ -23,18 +133,12 @@ async def get_available_slots(psychologist_name: str, date: datetime):
     if not schedule or weekday not in schedule:
         return []  # психолог не работает в этот день
 
-    # Получаем все записи психолога на этот день
-    existing_appointments = await get_appointments_by_psychologist(psychologist_name)
-    occupied_hours = set()
-    for appt in existing_appointments:
-        appt_time = datetime.fromisoformat(appt["appointment_time"])
-        if appt_time.date() == date.date():
-            occupied_hours.add(appt_time.hour)
+    occupied = await get_occupied_hours(psychologist_name, date.date())
 
     available_slots = []
     for start, end in schedule[weekday]:
         for hour in range(start.hour, end.hour):
-            if hour not in occupied_hours:
+            if not is_occupied(occupied, hour):
                 slot = datetime.combine(date.date(), time(hour, 0))
                 available_slots.append(slot.isoformat())
 
@@ -49,24 +153,19 @@ async def get_schedule_for_psychologist(psychologist_name: str, date: datetime):
     if not schedule or weekday not in schedule:
         return []
 
-    existing_appointments = await get_appointments_by_psychologist(psychologist_name)
-    occupied_hours = set()
-    for appt in existing_appointments:
-        appt_time = datetime.fromisoformat(appt["appointment_time"])
-        if appt_time.date() == date.date():
-            occupied_hours.add(appt_time.hour)
+    occupied = await get_occupied_hours(psychologist_name, date.date())
 
     slots = []
     for start, end in schedule[weekday]:
         for hour in range(start.hour, end.hour):
             slots.append({
                 "time": datetime.combine(date.date(), time(hour, 0)).isoformat(),
-                "occupied": hour in occupied_hours
+                "occupied": is_occupied(occupied, hour)
             })
     return slots
 
 
-def validate_schedule(psychologist_name: str, appointment_time: datetime, existing_appointments: list):
+def validate_schedule(psychologist_name: str, appointment_time: datetime, occupied: int):
     weekday = appointment_time.strftime("%A")
     schedule = psychologists_schedule.get(psychologist_name)
     if not schedule or weekday not in schedule:
@@ -81,22 +180,40 @@ def validate_schedule(psychologist_name: str, appointment_time: datetime, existi
     if not allowed:
         raise ValueError(f"{psychologist_name} работает только в отрезках {schedule[weekday]}")
 
-    for appt in existing_appointments:
-        if datetime.fromisoformat(appt["appointment_time"]) == appointment_time:
-            raise ValueError("Данное время уже занято")
+    if is_occupied(occupied, appointment_time.hour):
+        raise SlotTakenError("Данное время уже занято")
 
 async def create_appointment(data: dict):
-    # Проверка времени и расписания
-    existing = await get_appointments_by_psychologist(data["psychologist_name"])
-    appointment_time = data["appointment_time"]
-    if isinstance(appointment_time, str):
-        appointment_time = datetime.fromisoformat(appointment_time)
-    validate_schedule(data["psychologist_name"], appointment_time, existing)
-
-    # Конвертируем datetime в ISO, чтобы Supabase принял
-    data["appointment_time"] = appointment_time.isoformat()
-
-    return await insert_appointment(data)
+    """
+    Атомарное бронирование слота.
+    Внутри процесса запросы на один день психолога сериализуются, поэтому
+    проигравшие получают отказ по маске занятости без обращения к БД.
+    Между инстансами сервиса уникальность гарантирует индекс
+    (psychologist_name, appointment_time) в БД.
+    """
+    appointment_time = local_time(data["appointment_time"])
+    psychologist_name = data["psychologist_name"]
+    day = appointment_time.date()
+
+    # Быстрая проверка по закэшированной маске до ожидания блокировки;
+    # при промахе маску загрузит первый запрос под блокировкой
+    occupied = occupancy_cache.get(psychologist_name, day)
+    validate_schedule(psychologist_name, appointment_time, occupied or 0)
+
+    async with _booking_lock(psychologist_name, day):
+        occupied = await get_occupied_hours(psychologist_name, day)
+        validate_schedule(psychologist_name, appointment_time, occupied)
+
+        # Конвертируем datetime в ISO, чтобы Supabase принял
+        data["appointment_time"] = appointment_time.isoformat()
+        try:
+            appointment = await insert_appointment(data)
+        except SlotTakenError:
+            # Маска устарела: слот занят другим инстансом
+            occupancy_cache.invalidate(psychologist_name, day)
+            raise
+        occupancy_cache.mark(psychologist_name, appointment_time)
+    return appointment
 
 async def get_user_appointments(user_id: str):
     return await get_appointments_by_user(user_id)
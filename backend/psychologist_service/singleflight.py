@@ -0,0 +1,48 @@
+import asyncio
+
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых запросов.
+
+    Первый вызов с ключом запускает загрузку отдельной задачей, остальные
+    до ее завершения ждут тот же результат (или то же исключение). Отмена
+    одного из ожидающих (клиент закрыл соединение) не отменяет загрузку
+    для остальных. Результат общий для всех ожидающих - его не изменяют.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is not None:
+            SINGLEFLIGHT_CALLS.labels(self.name, "coalesced").inc()
+            return await asyncio.shield(task)
+
+        SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc()
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._done(key, done))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Исключение уже получили ожидающие; если все отменились - не ругаемся в лог
+            task.exception()
+
+    def forget(self, match=None):
+        """Новые вызовы не присоединяются к уже идущим загрузкам (после записи).
+
+        match - функция от ключа; без нее забываются все ключи. Уже ожидающие
+        получат результат своей загрузки.
+        """
+        for key in [key for key in self._calls if match is None or match(key)]:
+            del self._calls[key]
@@ -0,0 +1,9 @@
+"""Тесты psychologist_service запускаются отдельно от тестов backend (из этого каталога):
+оба сервиса регистрируют одинаковые метрики в общем реестре prometheus_client."""
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+# FakePostgrest и загрузка приложения - из backend/benchmarks
+sys.path.insert(0, str(SERVICE_DIR.parent))
+sys.path.insert(0, str(SERVICE_DIR))
@@ -0,0 +1,60 @@
+"""Запросы репозитория не блокируют event loop: одновременные чтения идут
+параллельно по общему пулу соединений, а не по очереди."""
+import asyncio
+import sys
+import time
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.run import load_psychologist
+
+LATENCY = 0.05
+REQUESTS = 20
+
+
+class CountingPostgrest(FakePostgrest):
+    """FakePostgrest, который считает одновременно обрабатываемые запросы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().handle(request)
+        finally:
+            self.in_flight -= 1
+
+
+def test_concurrent_reads_overlap():
+    fake = CountingPostgrest(latency=LATENCY)
+    fake.seed("appointments", [
+        {"id": number, "user_id": f"user-{number}", "psychologist_name": "Клепов Дмитрий Олегович",
+         "appointment_time": f"2025-09-02T{16 + number % 4}:00:00"}
+        for number in range(REQUESTS)
+    ])
+    load_psychologist(fake)
+    repository = sys.modules["repository"]
+    repository._supabase = None
+
+    async def scenario():
+        # Первый запрос создает клиент Supabase; в замер не входит
+        await repository.get_appointments_by_user("warmup")
+        fake.peak = 0
+        fake.reset_stats()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            repository.get_appointments_by_user(f"user-{number}") for number in range(REQUESTS)
+        ))
+        elapsed = time.perf_counter() - started
+        await repository.close_supabase()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(scenario())
+    assert [len(result) for result in results] == [1] * REQUESTS
+    assert fake.total_calls == REQUESTS
+    assert fake.peak == REQUESTS
+    assert elapsed < REQUESTS * LATENCY / 4
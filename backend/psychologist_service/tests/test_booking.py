@@ -0,0 +1,96 @@
+"""Конкурентное бронирование в psychologist_service на FakePostgrest с уникальным индексом слота."""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.run import load_psychologist
+
+
+@pytest.fixture
+def service():
+    fake = FakePostgrest(latency=0.002, unique={"appointments": [("psychologist_name", "appointment_time")]})
+    app = load_psychologist(fake)
+    # Клиент Supabase создается заново поверх HTTP-клиента этого FakePostgrest
+    sys.modules["repository"]._supabase = None
+    modules = SimpleNamespace(service=sys.modules["service"], occupancy=sys.modules["occupancy"])
+    yield fake, app, modules
+    modules.occupancy.occupancy_cache.clear()
+
+
+@pytest.fixture
+def moscow_tz(monkeypatch):
+    """Локальная зона сервиса UTC+3 (без перехода на летнее время)"""
+    monkeypatch.setenv("TZ", "Europe/Moscow")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def free_slot(schedule: dict) -> tuple:
+    name = next(iter(schedule))
+    day = date.today() + timedelta(days=30)
+    while day.strftime("%A") not in schedule[name]:
+        day += timedelta(days=1)
+    start, _ = schedule[name][day.strftime("%A")][0]
+    return name, f"{day.isoformat()}T{start.hour:02d}:00:00"
+
+
+async def book_concurrently(app, name: str, slot: str, count: int) -> list:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/appointments", json={
+                "user_id": f"user-{number}", "psychologist_name": name, "appointment_time": slot
+            })
+            for number in range(count)
+        ))
+    return sorted(response.status_code for response in responses)
+
+
+def test_one_slot_booked_once(service):
+    fake, app, modules = service
+    name, slot = free_slot(modules.service.psychologists_schedule)
+
+    statuses = asyncio.run(book_concurrently(app, name, slot, 20))
+
+    assert statuses == [200] + [409] * 19
+    assert len(fake.tables["appointments"]) == 1
+
+
+def test_slot_taken_by_other_instance_is_409(service):
+    fake, app, modules = service
+    name, slot = free_slot(modules.service.psychologists_schedule)
+    day = date.fromisoformat(slot[:10])
+
+    # Маска занятости закэширована до записи другого инстанса: спасает уникальный индекс
+    asyncio.run(modules.service.get_occupied_hours(name, day))
+    fake.seed("appointments", [{"id": 999, "user_id": "other", "psychologist_name": name, "appointment_time": slot}])
+
+    statuses = asyncio.run(book_concurrently(app, name, slot, 5))
+
+    assert statuses == [409] * 5
+    assert len(fake.tables["appointments"]) == 1
+
+
+def test_offset_timestamps_mark_local_hour(service, moscow_tz):
+    fake, app, modules = service
+    name, slot = free_slot(modules.service.psychologists_schedule)
+    day = date.fromisoformat(slot[:10])
+    hour = int(slot[11:13])
+    # timestamptz из БД приходит в UTC: локальный час N:00 - это (N-3):00+00:00
+    stored = f"{slot[:10]}T{hour - 3:02d}:00:00+00:00"
+
+    assert modules.occupancy.bitmap_from_appointments([{"appointment_time": stored}]) == 1 << hour
+
+    fake.seed("appointments", [{"id": 1, "user_id": "other", "psychologist_name": name, "appointment_time": stored}])
+    occupancy = asyncio.run(modules.service.load_occupancy_window([name], day, 1))
+    assert occupancy[(name, day)] == 1 << hour
+
+    statuses = asyncio.run(book_concurrently(app, name, slot, 1))
+    assert statuses == [409]
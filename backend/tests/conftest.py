@@ -0,0 +1,13 @@
+"""Тесты backend: модули app импортируются так же, как при запуске из app/ (db, utils, services)."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "app"))
+
+# Локальный кэш снимков - во временном каталоге, а не в app/data
+os.environ.setdefault("LOCAL_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="tests-"), "snapshots.sqlite3"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
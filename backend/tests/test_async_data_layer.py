@@ -0,0 +1,61 @@
+"""Запросы к БД не блокируют event loop: одновременные чтения идут параллельно
+по общему пулу соединений, а не по очереди."""
+import asyncio
+import time
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.run import _configure_env
+from benchmarks.seed import make_user_rows
+
+LATENCY = 0.05
+REQUESTS = 20
+
+
+class CountingPostgrest(FakePostgrest):
+    """FakePostgrest, который считает одновременно обрабатываемые запросы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().handle(request)
+        finally:
+            self.in_flight -= 1
+
+
+def test_concurrent_reads_overlap():
+    _configure_env()
+    from db.models import TASKS_COLUMNS
+    from db.supabase_client import SupabaseClient, create_http_client
+
+    async def scenario():
+        fake = CountingPostgrest(latency=LATENCY)
+        rows = make_user_rows(REQUESTS + 1, tasks=5, marks=0, reports=0)
+        fake.seed("user_data", rows)
+        client = SupabaseClient(create_http_client(fake.transport()))
+        try:
+            # Первый запрос создает клиент Supabase; в замер не входит
+            await client.get_user_snapshot(rows[0]["user_id"], TASKS_COLUMNS)
+            fake.peak = 0
+            fake.reset_stats()
+
+            started = time.perf_counter()
+            snapshots = await asyncio.gather(*(
+                client.get_user_snapshot(row["user_id"], TASKS_COLUMNS) for row in rows[1:]
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.aclose()
+        return fake, snapshots, elapsed
+
+    fake, snapshots, elapsed = asyncio.run(scenario())
+    assert all(snapshot is not None for snapshot in snapshots)
+    assert fake.total_calls == REQUESTS
+    # Все запросы одновременно в полете, время - порядка одной задержки, а не суммы
+    assert fake.peak == REQUESTS
+    assert elapsed < REQUESTS * LATENCY / 4
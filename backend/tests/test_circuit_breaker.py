@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Подменяется только время предохранителя: часы event loop идут как обычно
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+async def fail():
+    raise httpx.ConnectError("connection refused")
+
+
+async def ok():
+    return "ok"
+
+
+async def bad_request():
+    raise APIError({"code": "42703", "message": "column does not exist"})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_opens_after_threshold_and_rejects(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=30)
+    for _ in range(3):
+        with pytest.raises(httpx.ConnectError):
+            run(breaker.call(fail))
+    assert breaker.state == OPEN
+
+    called = []
+
+    async def tracked():
+        called.append(True)
+
+    with pytest.raises(CircuitOpenError) as info:
+        run(breaker.call(tracked))
+    assert not called
+    assert info.value.retry_after == pytest.approx(30)
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    with pytest.raises(httpx.ConnectError):
+        run(breaker.call(fail))
+    assert run(breaker.call(ok)) == "ok"
+    with pytest.raises(httpx.ConnectError):
+        run(breaker.call(fail))
+    assert breaker.state == CLOSED
+
+
+def test_query_errors_do_not_open(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(APIError):
+        run(breaker.call(bad_request))
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+    with pytest.raises(httpx.ConnectError):
+        run(breaker.call(fail))
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+
+    # Неудачная проба открывает предохранитель на полный срок
+    with pytest.raises(httpx.ConnectError):
+        run(breaker.call(fail))
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == pytest.approx(10)
+
+    clock.now += 10
+    assert run(breaker.call(ok)) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+    with pytest.raises(httpx.ConnectError):
+        run(breaker.call(fail))
+    clock.now += 10
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_probe():
+            await release.wait()
+            return "probe"
+
+        probe = asyncio.create_task(breaker.call(slow_probe))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        release.set()
+        return await probe
+
+    assert run(scenario()) == "probe"
+    assert breaker.state == CLOSED
+
+
+def test_call_timeout_counts_as_failure(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, call_timeout=0.01)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        run(breaker.call(hang))
+    assert breaker.state == OPEN
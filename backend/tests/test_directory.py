@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from db.directory_index import teacher_id, room_id
+from services.directory_service import DirectoryService
+
+MONDAY = date(2025, 9, 1)
+
+
+def schedule(*classes) -> dict:
+    return {"days": [{
+        "date": MONDAY.strftime("%d.%m"),
+        "fullDate": MONDAY.isoformat(),
+        "dayName": "Пн",
+        "classes": [
+            {
+                "pairNumber": "1", "timeRange": "9:30-11:00", "type": "Л", "subject": subject,
+                "teacher": teacher, "teacherInfo": "доцент", "group": group,
+                "building": "Гастелло 15", "location": location,
+            }
+            for subject, teacher, group, location in classes
+        ],
+    }]}
+
+
+MATH = ("Математика", "Иванов И.И.", "4031", "101")
+PHYSICS = ("Физика", "Петрова А.С.", "4032", "202")
+
+
+class FakeDB:
+    def __init__(self, rows: dict):
+        self.rows = rows
+
+    async def iter_user_data_pages(self, columns, page_size):
+        yield [SimpleNamespace(uid=uid, week_schedule=week) for uid, week in self.rows.items()]
+
+    async def get_user_snapshot(self, uid, columns):
+        if uid not in self.rows:
+            return None
+        return SimpleNamespace(uid=uid, week_schedule=self.rows[uid])
+
+
+def test_shared_classes_counted_once_and_kept_until_last_user():
+    # Два студента одной группы с одинаковым занятием и студент другой группы
+    db = FakeDB({"a": schedule(MATH), "b": schedule(MATH), "c": schedule(PHYSICS)})
+    directory = DirectoryService(db, refresh_interval=0)
+    asyncio.run(directory.ensure_ready())
+
+    math_teacher = directory.teachers.get(teacher_id("Иванов И.И."))
+    assert math_teacher.summary()["classes_per_week"] == 1
+    assert directory.stats()["classes"] == 2
+    assert len(directory.rooms) == 2
+
+    # Один из двух студентов сменил расписание: занятие остается, пока есть второй
+    db.rows["a"] = schedule(PHYSICS)
+    asyncio.run(directory.refresh_user("a"))
+    assert directory.teachers.get(teacher_id("Иванов И.И.")) is not None
+
+    db.rows["b"] = schedule(PHYSICS)
+    asyncio.run(directory.refresh_user("b"))
+    assert directory.teachers.get(teacher_id("Иванов И.И.")) is None
+    assert directory.rooms.get(room_id("Гастелло 15", "101")) is None
+    assert directory.stats()["classes"] == 1
+    asyncio.run(directory.stop())
+
+
+def test_full_refresh_drops_removed_users():
+    db = FakeDB({"a": schedule(MATH), "c": schedule(PHYSICS)})
+    directory = DirectoryService(db, refresh_interval=0)
+    asyncio.run(directory.ensure_ready())
+    del db.rows["a"]
+    asyncio.run(directory.refresh())
+
+    assert [teacher["name"] for teacher in directory.teachers.all()] == ["Петрова А.С."]
+    assert directory.stats()["users"] == 1
+    asyncio.run(directory.stop())
+
+
+def test_room_busy_during_class():
+    directory = DirectoryService(FakeDB({"a": schedule(MATH, PHYSICS)}), refresh_interval=0)
+    asyncio.run(directory.ensure_ready())
+
+    during = directory.rooms.free(datetime(2025, 9, 1, 10, 0))
+    after = directory.rooms.free(datetime(2025, 9, 1, 11, 0))
+    assert during["rooms"] == []
+    assert [room["location"] for room in after["rooms"]] == ["101", "202"]
+    assert after["known"] and not after["estimated"]
+    asyncio.run(directory.stop())
+
+
+def test_other_week_parity_used_as_estimate():
+    # Расписание есть только на четную неделю 01.09.2025; 08.09.2025 - нечетная
+    directory = DirectoryService(FakeDB({"a": schedule(MATH)}), refresh_interval=0)
+    asyncio.run(directory.ensure_ready())
+
+    free = directory.rooms.free(datetime(2025, 9, 8, 10, 0))
+    assert free["week_parity"] == "odd" and free["schedule_parity"] == "even"
+    assert free["estimated"]
+    assert free["rooms"] == []
+    asyncio.run(directory.stop())
+
+
+def test_no_schedules_is_unknown_not_all_free():
+    db = FakeDB({"a": schedule(MATH)})
+    directory = DirectoryService(db, refresh_interval=0)
+    asyncio.run(directory.ensure_ready())
+    del db.rows["a"]
+    asyncio.run(directory.refresh())
+    assert directory.rooms.free(datetime(2025, 9, 1, 10, 0)) == {
+        "week_parity": "even", "schedule_parity": None, "known": False, "estimated": False, "rooms": []
+    }
+    asyncio.run(directory.stop())
@@ -0,0 +1,48 @@
+import asyncio
+
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.run import _configure_env
+from benchmarks.seed import make_user_rows
+
+REF = "week_schedule_ref"
+
+
+def save_schedule(monkeypatch, inline: bool):
+    _configure_env()
+    from db import supabase_client as module
+    from db.models import WEEK_SCHEDULE_COLUMNS
+    from db.supabase_client import SupabaseClient, create_http_client
+
+    monkeypatch.setattr(module, "SCHEDULE_INLINE_COPY", inline)
+    fake = FakePostgrest()
+    row = make_user_rows(1, tasks=0, marks=0, reports=0)[0]
+    schedule = {**row["week_schedule"], "days": row["week_schedule"]["days"][:1]}
+    row[REF] = "stale-ref"
+    fake.seed("user_data", [row])
+
+    async def scenario():
+        client = SupabaseClient(create_http_client(fake.transport()))
+        try:
+            changed = await client.save_user_sections(row["user_id"], {"schedule": {"week_schedule": schedule}})
+            snapshot = await client.get_user_snapshot(row["user_id"], WEEK_SCHEDULE_COLUMNS)
+        finally:
+            await client.aclose()
+        return changed, snapshot
+
+    changed, snapshot = asyncio.run(scenario())
+    assert changed == ["schedule"]
+    assert snapshot.week_schedule == schedule
+    return fake, fake.tables["user_data"][0]
+
+
+def test_inline_copy_skips_group_schedules(monkeypatch):
+    fake, stored = save_schedule(monkeypatch, inline=True)
+    assert fake.calls[("group_schedules", "POST")] == 0
+    assert stored[REF] is None
+    assert stored["week_schedule"] is not None
+
+
+def test_reference_only_stores_schedule_once(monkeypatch):
+    fake, stored = save_schedule(monkeypatch, inline=False)
+    assert [row["hash"] for row in fake.tables["group_schedules"]] == [stored[REF]]
+    assert stored["week_schedule"] is None
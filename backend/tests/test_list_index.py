@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+import pytest
+
+from db.list_index import ListIndex, InvalidCursor
+
+
+def make_task(number: int, deadline: date, subject: str = "Математика", status: str = "accepted") -> dict:
+    return {
+        "task": {"name": f"Задание {number}", "number": number},
+        "subject": {"name": subject},
+        "status": {"code": status},
+        "deadline": {"date": deadline.isoformat()},
+    }
+
+
+def numbers(page: dict) -> list:
+    return [item["task"]["number"] for item in page["items"]]
+
+
+def walk(index: ListIndex, **query) -> list:
+    seen = []
+    cursor = None
+    while True:
+        page = index.query(cursor=cursor, **query)
+        seen.extend(numbers(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+START = date(2025, 9, 1)
+TASKS = [make_task(number, START + timedelta(days=number)) for number in range(1, 26)]
+
+
+def test_pages_cover_list_once():
+    index = ListIndex("tasks", TASKS)
+    assert walk(index, sort="deadline", limit=7) == list(range(1, 26))
+    assert walk(index, sort="deadline", descending=True, limit=7) == list(range(25, 0, -1))
+
+
+def test_total_only_on_first_page():
+    index = ListIndex("tasks", TASKS)
+    first = index.query(sort="deadline", limit=10)
+    assert first["total"] == 25
+    assert "total" not in index.query(sort="deadline", limit=10, cursor=first["next_cursor"])
+
+
+def test_cursor_stable_across_inserts():
+    first = ListIndex("tasks", TASKS).query(sort="deadline", limit=10)
+    assert numbers(first) == list(range(1, 11))
+
+    # Новая версия данных: задания добавлены перед курсором (в начало списка) и после него
+    inserted = [make_task(100, START), make_task(101, START + timedelta(days=15, hours=0))]
+    updated = ListIndex("tasks", [inserted[0]] + TASKS + [inserted[1]])
+    rest = []
+    cursor = first["next_cursor"]
+    while cursor:
+        page = updated.query(sort="deadline", limit=10, cursor=cursor)
+        rest.extend(numbers(page))
+        cursor = page["next_cursor"]
+
+    # Продолжение начинается сразу после последнего показанного элемента:
+    # без повторов и пропусков, задание до курсора в продолжение не попадает
+    assert 100 not in rest
+    assert 101 in rest
+    assert sorted(set(rest) - {101}) == list(range(11, 26))
+    assert len(rest) == len(set(rest))
+
+
+def test_filters_are_case_insensitive_and_combined():
+    items = [
+        make_task(1, START, subject="Физика", status="accepted"),
+        make_task(2, START, subject="физика", status="rejected"),
+        make_task(3, START, subject="Математика", status="rejected"),
+    ]
+    index = ListIndex("tasks", items)
+    assert numbers(index.query(subject=["ФИЗИКА"])) == [1, 2]
+    assert numbers(index.query(subject=["физика"], status=["rejected"])) == [2]
+    assert numbers(index.query(date_from=START + timedelta(days=1))) == []
+
+
+def test_cursor_for_other_sort_rejected():
+    cursor = ListIndex("tasks", TASKS).query(sort="deadline", limit=5)["next_cursor"]
+    with pytest.raises(InvalidCursor):
+        ListIndex("tasks", TASKS).query(sort="name", cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        ListIndex("tasks", TASKS).query(sort="deadline", cursor="not-a-cursor")
+
+
+def test_reports_subject_filter():
+    reports = [
+        {"task": {"name": "Отчет 1"}, "subject": {"name": "Физика"}, "status": {"code": "accepted"}},
+        {"task": {"name": "Отчет 2"}, "subject": {"name": "Химия"}, "status": {"code": "accepted"}},
+    ]
+    page = ListIndex("reports", reports).query(subject=["физика"])
+    assert [item["task"]["name"] for item in page["items"]] == ["Отчет 1"]
+
+
+def test_default_sort_cursor_stable_across_front_insert():
+    first = ListIndex("tasks", TASKS).query(limit=8)
+    assert numbers(first) == list(range(1, 9))
+
+    # Парсер добавил два новых задания в начало списка между запросами страниц
+    updated = ListIndex("tasks", [make_task(100, START), make_task(101, START)] + TASKS)
+    second = updated.query(limit=8, cursor=first["next_cursor"])
+    assert numbers(second) == list(range(9, 17))
+
+    descending = ListIndex("tasks", TASKS).query(limit=8, descending=True)
+    assert numbers(updated.query(limit=8, descending=True, cursor=descending["next_cursor"])) == list(range(17, 9, -1))
@@ -0,0 +1,21 @@
+import logging
+
+from utils.logger import UidTraceFilter
+
+
+def record(level: int, uid: str = None) -> logging.LogRecord:
+    return logging.makeLogRecord({"levelno": level, "uid": uid})
+
+
+def test_without_trace_uids_level_decides():
+    trace = UidTraceFilter(set())
+    assert trace.filter(record(logging.DEBUG))
+    assert trace.filter(record(logging.DEBUG, uid="a"))
+
+
+def test_trace_uids_restrict_debug_only():
+    trace = UidTraceFilter({"a"})
+    assert trace.filter(record(logging.DEBUG, uid="a"))
+    assert not trace.filter(record(logging.DEBUG, uid="b"))
+    assert trace.filter(record(logging.INFO, uid="b"))
+    assert UidTraceFilter({"*"}).filter(record(logging.DEBUG, uid="b"))
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+
+from db.models import UserSnapshot
+from services import notification_service
+from services.notification_service import (
+    DEFAULT_CHANNEL, MemorySink, NotificationService, TokenBucket, create_notification_service
+)
+
+
+class FakeUserData:
+    """Страницы user_data из готовых строк (как iter_user_data_pages)"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def iter_user_data_pages(self, columns, page_size):
+        for page in self.pages:
+            yield [UserSnapshot(row["user_id"], row) for row in page]
+
+
+def _row(uid: str) -> dict:
+    return {
+        "user_id": uid,
+        "profile": {"full_name": f"Студент {uid}"},
+        "tasks": [{
+            "task": {"name": "Лабораторная 1"},
+            "subject": {"name": "Физика"},
+            "deadline": {"date": date.today().isoformat()},
+            "status": {"code": "new", "text": "новое"}
+        }],
+        "week_schedule": None,
+        "today_schedule": None
+    }
+
+
+def _service(pages, sink, **kwargs) -> NotificationService:
+    return NotificationService(FakeUserData(pages), sinks={DEFAULT_CHANNEL: sink}, **kwargs)
+
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=1)
+        started = time.perf_counter()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # Первый токен из запаса, остальные пять - по одному на 1/50 с
+    assert asyncio.run(scenario()) >= 5 / 50 * 0.9
+
+
+def test_rate_limit_applies_to_channel():
+    sink = MemorySink()
+    service = _service([[_row(f"u{i}") for i in range(6)]], sink, workers=6, rate_limits={DEFAULT_CHANNEL: 5})
+
+    started = time.perf_counter()
+    stats = asyncio.run(service.send_daily_digests())
+    elapsed = time.perf_counter() - started
+
+    assert stats["sent"] == 6
+    # Запас бакета - 5 токенов, шестая отправка ждет 1/5 с
+    assert elapsed >= 1 / 5 * 0.9
+
+
+def test_duplicate_rows_get_one_digest():
+    sink = MemorySink()
+    pages = [[_row("a"), _row("b")], [_row("b"), _row("c")], [_row("a")]]
+    stats = asyncio.run(_service(pages, sink, workers=4).send_daily_digests())
+
+    assert sorted(notification.uid for notification in sink.sent) == ["a", "b", "c"]
+    assert stats["users"] == 3
+    assert stats["duplicates"] == 2
+    assert stats["sent"] == 3
+
+
+def test_failed_attempts_are_retried():
+    sink = MemorySink(fail_first=2)
+    stats = asyncio.run(_service([[_row("a")]], sink, workers=1, retry_base_delay=0.001).send_daily_digests())
+
+    assert stats["retries"] == 2
+    assert stats["sent"] == 1
+    assert stats["failed"] == 0
+    assert "Лабораторная 1" in sink.sent[0].text
+
+
+def test_retries_exhausted_counts_failure():
+    sink = MemorySink(fail_first=10)
+    stats = asyncio.run(
+        _service([[_row("a")]], sink, workers=1, max_retries=2, retry_base_delay=0.001).send_daily_digests()
+    )
+
+    assert stats["sent"] == 0
+    assert stats["failed"] == 1
+    assert sink.attempts == 3
+
+
+def test_webhook_required_without_dry_run(monkeypatch):
+    monkeypatch.delenv("NOTIFY_WEBHOOK_URL", raising=False)
+
+    with pytest.raises(ValueError):
+        create_notification_service(FakeUserData([]))
+    assert isinstance(create_notification_service(FakeUserData([]), dry_run=True).sinks[DEFAULT_CHANNEL], MemorySink)
+
+
+def test_cli_refuses_to_run_without_webhook(monkeypatch):
+    import dotenv
+
+    monkeypatch.delenv("NOTIFY_WEBHOOK_URL", raising=False)
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda *args, **kwargs: None)
+    monkeypatch.setattr(notification_service, "_run", None)
+
+    with pytest.raises(SystemExit) as error:
+        notification_service.main([])
+    assert error.value.code == 2
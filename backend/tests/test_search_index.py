@@ -0,0 +1,41 @@
+from db.search_index import SearchIndex, tokenize
+
+TASKS = [
+    {"task": {"name": "Лабораторная работа по численным методам", "type": "ЛР"},
+     "subject": {"name": "Вычислительная математика"}, "teacher": {"full_name": "Иванов Петр"}},
+    {"task": {"name": "Курсовой проект"}, "subject": {"name": "Базы данных"},
+     "teacher": {"full_name": "Семёнова Анна"}},
+]
+REPORTS = [
+    {"task": {"name": "Отчет по лабораторной работе"}, "subject": {"name": "Физика"}},
+]
+MATERIALS = [
+    {"name": "Методичка по базам данных", "subject": {"name": "Базы данных"}},
+]
+
+
+def build() -> SearchIndex:
+    return SearchIndex.build({"tasks": TASKS, "reports": REPORTS, "materials": MATERIALS})
+
+
+def test_tokenize_normalizes_case_yo_and_endings():
+    assert tokenize("Семёнова") == tokenize("СЕМЕНОВА")
+    assert tokenize("Лабораторные работы") == tokenize("лабораторная работа")
+
+
+def test_all_words_must_match():
+    results = build().search("лабораторная физика")
+    assert [(hit["kind"], hit["position"]) for hit in results] == [("reports", 0)]
+
+
+def test_prefix_match_and_title_ranked_higher():
+    results = build().search("баз")
+    assert [(hit["kind"], hit["position"]) for hit in results] == [("materials", 0), ("tasks", 1)]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_kinds_filter_and_empty_query():
+    index = build()
+    assert [hit["kind"] for hit in index.search("лаборатор", kinds={"tasks"})] == ["tasks"]
+    assert index.search("   ") == []
+    assert index.search("несуществующее") == []
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("a", load, "a") for _ in range(10)), flight.do("b", load, "b"))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert sorted(calls) == ["a", "b"]
+    assert all(result is results[0] for result in results[:10])
+    assert results[10] == {"key": "b"}
+    assert len(flight) == 0
+
+
+def test_error_shared_and_not_cached():
+    attempts = []
+
+    async def load():
+        attempts.append(True)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("a", load) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            await flight.do("a", load)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_load():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def load():
+            started.set()
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("a", load))
+        await started.wait()
+        second = asyncio.create_task(flight.do("a", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_forget_starts_new_load():
+    loads = []
+
+    async def scenario():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def load(value):
+            loads.append(value)
+            await release.wait()
+            return value
+
+        old = asyncio.create_task(flight.do("a", load, "old"))
+        await asyncio.sleep(0)
+        # Запись после начала чтения: новые вызовы не должны получить старые данные
+        flight.forget()
+        new = asyncio.create_task(flight.do("a", load, "new"))
+        await asyncio.sleep(0)
+        release.set()
+        return await old, await new
+
+    assert asyncio.run(scenario()) == ("old", "new")
+    assert loads == ["old", "new"]